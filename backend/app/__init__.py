@@ -8,6 +8,13 @@ def create_app():
     app = Flask(__name__)
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret')
 
+    from app.profiling import init_profiling
+    from app.metrics import init_metrics
+    init_profiling(app)
+    from app.serialization import init_serialization
+    init_serialization(app)
+    init_metrics(app)
+
     CORS(app, resources={
         r"/*": {
             "origins": "*",
@@ -22,16 +29,48 @@ def create_app():
     from app.routes.auth import auth_bp
     from app.routes.users import users_bp
     from app.routes.interviews import interviews_bp
+    from app.routes.bootstrap import bootstrap_bp
     app.register_blueprint(auth_bp)
     app.register_blueprint(users_bp)
     app.register_blueprint(interviews_bp)
+    app.register_blueprint(bootstrap_bp)
 
-    from app.database import Base, engine, migrate_user_settings, migrate_interview_sessions, migrate_remove_session_columns
+    from app.database import (
+        Base, engine, migrate_user_settings, migrate_users, migrate_password_resets, migrate_session_results, migrate_interview_sessions, migrate_interview_answers,
+        migrate_remove_session_columns, migrate_unique_answers, migrate_indexes,
+    )
     with app.app_context():
         Base.metadata.create_all(bind=engine)
         migrate_user_settings()
+        migrate_users()
+        migrate_password_resets()
+        migrate_session_results()
         migrate_interview_sessions()
+        migrate_interview_answers()
         migrate_remove_session_columns()
+        migrate_unique_answers()
+        migrate_indexes()
+
+    from app.conditional import init_conditional
+    init_conditional()
+    from app.search import init_search
+    init_search()
+    from app.session_lifecycle import init_session_lifecycle
+    init_session_lifecycle()
+    from app.score_ranking import init_score_ranking
+    init_score_ranking()
+    from app.idempotency import init_idempotency
+    init_idempotency()
+    from app.routes.interviews.answer_service import init_answer_uploads
+    init_answer_uploads()
+    from app.storage import init_storage
+    init_storage(app)
+    from app.passwords import init_passwords
+    init_passwords(app)
+    from app.tokens import init_tokens
+    init_tokens()
+    from app.password_resets import init_password_resets
+    init_password_resets()
 
     @app.route("/")
     def index():
@@ -42,52 +81,16 @@ def create_app():
         <main><h1>Interview_practice_with_AI</h1><p style=\"margin:8px 0 0\">Back-end đang chạy 🚀</p></main>
         </html>"""
 
-    @app.route("/health")
-    def health_check():
-        """Health check endpoint để kiểm tra trạng thái API"""
-        try:
-            # Kiểm tra database connection
-            from app.database import check_connection
-            db_status = check_connection()
-            
-            # Kiểm tra environment variables
-            env_status = {
-                'GEMINI_API_KEY': bool(os.getenv('GEMINI_API_KEY')),
-                'SUPABASE_URL': bool(os.getenv('SUPABASE_URL')),
-                'SUPABASE_KEY': bool(os.getenv('SUPABASE_KEY')),
-            }
-            
-            # Kiểm tra Gemini API
-            gemini_status = False
-            try:
-                import requests
-                api_key = os.getenv('GEMINI_API_KEY')
-                if api_key:
-                    response = requests.get(
-                        "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro",
-                        params={"key": api_key},
-                        timeout=5
-                    )
-                    gemini_status = response.status_code == 200
-            except:
-                pass
-            
-            return jsonify({
-                'status': 'healthy' if db_status and all(env_status.values()) else 'degraded',
-                'timestamp': '2024-01-01T00:00:00Z',
-                'services': {
-                    'database': db_status,
-                    'gemini_api': gemini_status,
-                    'environment': env_status
-                },
-                'version': '1.0.0'
-            }), 200 if db_status else 503
-            
-        except Exception as e:
-            return jsonify({
-                'status': 'unhealthy',
-                'error': str(e),
-                'timestamp': '2024-01-01T00:00:00Z'
-            }), 500
+    from app.utils import ops_only
+
+    @app.route("/ai/usage")
+    @ops_only
+    def ai_usage():
+        """Per-key / per-model Gemini counters for capacity planning."""
+        from app.gemini_router import get_gemini_router
+        return jsonify(get_gemini_router().snapshot())
+
+    from app.health import init_health
+    init_health(app)
 
     return app
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""Progress analytics over a user's answer scores, computed with NumPy.
+
+``load_scores`` fetches every answer of the user inside the time window in
+one query and turns the columns into arrays (missing scores become NaN). The
+derived series are vectorized:
+
+- rolling average of the overall score over the last ``ROLLING_WINDOW`` answers;
+- per-dimension trend (overall, speaking, content, relevance) as the least-squares
+  slope of score against time, in points per week;
+- per-field count, mean and percentiles;
+- weekly buckets (answers, sessions, average score) from Monday to Monday.
+"""
+import os
+import logging
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except Exception as e:
+    logging.warning(f"NumPy not available, progress analytics disabled: {e}")
+    np = None
+
+from sqlalchemy import select
+
+from app.database import InterviewSession, InterviewAnswer
+
+ROLLING_WINDOW = int(os.getenv("PROGRESS_ROLLING_WINDOW", "5"))
+PERCENTILES = (25, 50, 75, 90)
+DIMENSIONS = ('score', 'speaking', 'content', 'relevance')
+UNKNOWN_FIELD = 'Không xác định'
+
+SECONDS_PER_DAY = 86400
+SECONDS_PER_WEEK = 7 * SECONDS_PER_DAY
+# Slopes smaller than this (points per week, or per session) count as stable
+TREND_THRESHOLD = 0.1
+
+
+def trend_direction(slope):
+    if slope is None or abs(slope) < TREND_THRESHOLD:
+        return 'stable'
+    return 'improving' if slope > 0 else 'declining'
+
+
+def available():
+    return np is not None
+
+
+def load_scores(db, user_id, since):
+    """Arrays of the user's answers since ``since``, oldest first.
+
+    Returns a dict with ``t`` (epoch seconds), ``scores`` (n x 4, columns in
+    ``DIMENSIONS`` order, NaN where missing), ``fields`` and ``sessions``.
+    """
+    rows = db.execute(
+        select(
+            InterviewAnswer.created_at,
+            InterviewAnswer.score,
+            InterviewAnswer.speaking_score,
+            InterviewAnswer.content_score,
+            InterviewAnswer.relevance_score,
+            InterviewSession.field,
+            InterviewAnswer.session_id,
+        )
+        .join(InterviewSession, InterviewSession.id == InterviewAnswer.session_id)
+        .where(InterviewSession.user_id == user_id, InterviewAnswer.created_at >= since)
+        .order_by(InterviewAnswer.created_at, InterviewAnswer.id)
+    ).all()
+    if not rows:
+        return {
+            't': np.empty(0), 'scores': np.empty((0, len(DIMENSIONS))),
+            'fields': np.empty(0, dtype=object), 'sessions': np.empty(0, dtype=np.int64),
+        }
+    created, score, speaking, content, relevance, fields, sessions = zip(*rows)
+    return {
+        't': np.array(created, dtype='datetime64[s]').astype(np.int64).astype(float),
+        'scores': np.array([score, speaking, content, relevance], dtype=float).T,
+        'fields': np.array([f or UNKNOWN_FIELD for f in fields], dtype=object),
+        'sessions': np.array(sessions, dtype=np.int64),
+    }
+
+
+def rolling_average(values, window=ROLLING_WINDOW):
+    """Mean of each value and the ``window - 1`` before it (fewer at the start)."""
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+def least_squares_slopes(t, values):
+    """Slope of each column of ``values`` against ``t``, ignoring NaN; NaN below two points."""
+    present = ~np.isnan(values)
+    weights = present.astype(float)
+    y = np.where(present, values, 0.0)
+    # Centre t: the normal equations lose precision on raw epoch seconds
+    x = (t - t.mean())[:, None] if len(t) else t[:, None]
+    n = weights.sum(axis=0)
+    sx = (weights * x).sum(axis=0)
+    sy = y.sum(axis=0)
+    sxx = (weights * x * x).sum(axis=0)
+    sxy = (x * y).sum(axis=0)
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = (n * sxy - sx * sy) / denominator
+    return np.where((n >= 2) & (denominator > 0), slopes, np.nan)
+
+
+def field_percentiles(fields, scores):
+    """``{field: {count, average, p25, p50, p75, p90}}`` over the non-NaN ``scores``."""
+    present = ~np.isnan(scores)
+    fields, scores = fields[present], scores[present]
+    if not len(scores):
+        return {}
+    names, groups = np.unique(fields.astype(str), return_inverse=True)
+    order = np.lexsort((scores, groups))
+    bounds = np.cumsum(np.bincount(groups, minlength=len(names)))[:-1]
+    result = {}
+    for name, group in zip(names, np.split(scores[order], bounds)):
+        entry = {'count': int(len(group)), 'average': round(float(group.mean()), 2)}
+        for p, value in zip(PERCENTILES, np.percentile(group, PERCENTILES)):
+            entry[f'p{p}'] = round(float(value), 2)
+        result[str(name)] = entry
+    return result
+
+
+def weekly_buckets(t, scores, sessions, since, now):
+    """One bucket per calendar week (Monday start) from ``since`` to ``now``, empty weeks included."""
+    first_monday = datetime.combine((since - timedelta(days=since.weekday())).date(), datetime.min.time())
+    origin = (first_monday - datetime(1970, 1, 1)).total_seconds()
+    n_weeks = int((now - first_monday).total_seconds() // SECONDS_PER_WEEK) + 1
+    week = np.clip(((t - origin) // SECONDS_PER_WEEK).astype(np.int64), 0, n_weeks - 1)
+
+    answers = np.bincount(week, minlength=n_weeks)
+    present = ~np.isnan(scores)
+    scored = np.bincount(week[present], minlength=n_weeks)
+    totals = np.bincount(week[present], weights=scores[present], minlength=n_weeks)
+    # Distinct (week, session) pairs, counted per week
+    pairs = np.unique(np.stack([week, sessions]), axis=1) if len(week) else np.empty((2, 0), dtype=np.int64)
+    session_counts = np.bincount(pairs[0], minlength=n_weeks)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        averages = totals / scored
+    return [
+        {
+            'week_start': (first_monday + timedelta(weeks=i)).date().isoformat(),
+            'answers': int(answers[i]),
+            'sessions': int(session_counts[i]),
+            'average_score': round(float(averages[i]), 2) if scored[i] else None,
+        }
+        for i in range(n_weeks)
+    ]
+
+
+def progress_report(db, user_id, days, now=None):
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=days)
+    data = load_scores(db, user_id, since)
+    t, scores = data['t'], data['scores']
+    overall = scores[:, 0]
+
+    scored = ~np.isnan(overall)
+    rolling = rolling_average(overall[scored]) if scored.any() else np.empty(0)
+    points = [
+        {
+            'date': datetime.utcfromtimestamp(ts).isoformat(),
+            'score': round(float(score), 2),
+            'average': round(float(avg), 2),
+        }
+        for ts, score, avg in zip(t[scored], overall[scored], rolling)
+    ]
+
+    slopes = least_squares_slopes(t, scores) * SECONDS_PER_WEEK
+    trends = {}
+    for i, name in enumerate(DIMENSIONS):
+        column = scores[:, i]
+        per_week = None if np.isnan(slopes[i]) else round(float(slopes[i]), 3)
+        trends[name] = {
+            'slope_per_week': per_week,
+            'direction': trend_direction(per_week),
+            'average': round(float(np.nanmean(column)), 2) if (~np.isnan(column)).any() else None,
+        }
+
+    return {
+        'window_days': days,
+        'since': since.isoformat(),
+        'answer_count': int(len(t)),
+        'session_count': int(len(np.unique(data['sessions']))),
+        'rolling_average': {'window': ROLLING_WINDOW, 'points': points},
+        'trends': trends,
+        'fields': field_percentiles(data['fields'], overall),
+        'weekly': weekly_buckets(t, overall, data['sessions'], since, now),
+    }
@@ -0,0 +1,155 @@
+"""Optional audio preprocessing before answer upload and transcription.
+
+ffmpeg decodes the recording to 16 kHz mono PCM. An energy-based voice activity
+detector (NumPy) trims leading and trailing silence. The result is re-encoded to
+Opus, which is far smaller than the phone's container, and transcription time
+scales with duration. When ffmpeg or NumPy is missing, the stage is disabled
+(``AUDIO_PREPROCESS=0``) or anything fails, the original audio is used unchanged.
+"""
+import os
+import shutil
+import logging
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import numpy as np
+except Exception as e:
+    logging.warning(f"NumPy not available, audio preprocessing disabled: {e}")
+    np = None
+
+from app.metrics import audio_duration, audio_bytes, audio_preprocess
+
+logger = logging.getLogger(__name__)
+
+PREPROCESS_ENABLED = os.getenv("AUDIO_PREPROCESS", "1") != "0"
+FFMPEG_BIN = os.getenv("FFMPEG_BIN") or shutil.which("ffmpeg")
+FFMPEG_TIMEOUT = float(os.getenv("AUDIO_FFMPEG_TIMEOUT", "60"))
+SAMPLE_RATE = 16000
+OPUS_BITRATE = os.getenv("AUDIO_OPUS_BITRATE", "24k")
+
+FRAME_MS = 30
+# Speech kept around the first / last voiced frame so word onsets are not clipped
+PAD_MS = int(os.getenv("AUDIO_VAD_PAD_MS", "300"))
+# A frame is voiced when its RMS exceeds the noise floor by this factor (and the absolute minimum)
+VAD_NOISE_FACTOR = float(os.getenv("AUDIO_VAD_NOISE_FACTOR", "3.0"))
+VAD_MIN_RMS = float(os.getenv("AUDIO_VAD_MIN_RMS", "200"))
+
+
+def preprocess_available():
+    return PREPROCESS_ENABLED and np is not None and bool(FFMPEG_BIN)
+
+
+def _run_ffmpeg(args, stdin=None):
+    proc = subprocess.run(
+        [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", *args],
+        input=stdin, capture_output=True, timeout=FFMPEG_TIMEOUT,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.decode(errors='replace')[:300]}")
+    return proc.stdout
+
+
+def decode_pcm(path):
+    """Decode any container ffmpeg understands to 16 kHz mono int16 samples."""
+    raw = _run_ffmpeg(["-i", path, "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "pipe:1"])
+    return np.frombuffer(raw, dtype=np.int16)
+
+
+def voiced_bounds(samples):
+    """Return ``(start, end)`` sample indices of the voiced region, or None if none is found."""
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return None
+    frames = samples[:n_frames * frame].astype(np.float32).reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    noise_floor = np.percentile(rms, 10)
+    threshold = max(noise_floor * VAD_NOISE_FACTOR, VAD_MIN_RMS)
+    voiced = np.flatnonzero(rms > threshold)
+    if voiced.size == 0:
+        return None
+    pad = SAMPLE_RATE * PAD_MS // 1000
+    start = max(int(voiced[0]) * frame - pad, 0)
+    end = min((int(voiced[-1]) + 1) * frame + pad, len(samples))
+    return start, end
+
+
+def encode_opus(samples, out_path):
+    _run_ffmpeg(["-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+                 "-c:a", "libopus", "-b:a", OPUS_BITRATE, "-application", "voip", "-y", out_path],
+                stdin=samples.tobytes())
+
+
+def preprocess_file(src_path, out_path):
+    """Trim, resample and re-encode ``src_path`` into ``out_path``; returns the audio meta."""
+    original_bytes = os.path.getsize(src_path)
+    samples = decode_pcm(src_path)
+    original_duration = len(samples) / SAMPLE_RATE
+    bounds = voiced_bounds(samples)
+    if bounds is not None:
+        samples = samples[bounds[0]:bounds[1]]
+    encode_opus(samples, out_path)
+    meta = {
+        'processed': True,
+        'codec': 'opus',
+        'sample_rate': SAMPLE_RATE,
+        'original_duration': round(original_duration, 2),
+        'processed_duration': round(len(samples) / SAMPLE_RATE, 2),
+        'original_bytes': original_bytes,
+        'processed_bytes': os.path.getsize(out_path),
+        'speech_detected': bounds is not None,
+    }
+    audio_duration.observe(meta['original_duration'], stage='original')
+    audio_duration.observe(meta['processed_duration'], stage='processed')
+    audio_bytes.observe(meta['original_bytes'], stage='original')
+    audio_bytes.observe(meta['processed_bytes'], stage='processed')
+    return meta
+
+
+def _file_size(audio):
+    if isinstance(audio, str):
+        return os.path.getsize(audio)
+    audio.seek(0, 2)
+    size = audio.tell()
+    audio.seek(0)
+    return size
+
+
+@contextmanager
+def prepared_audio(audio):
+    """Yield ``(source, meta)`` for upload: the processed file path, or the original
+    ``audio`` (path or file object) with ``meta['processed'] = False`` on fallback.
+    Temporary files are removed on exit.
+    """
+    if not preprocess_available():
+        audio_preprocess.inc(outcome='skipped')
+        yield audio, {'processed': False, 'original_bytes': _file_size(audio)}
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="answer-audio-")
+    try:
+        src_path = audio
+        if not isinstance(audio, str):
+            src_path = os.path.join(work_dir, "source")
+            audio.seek(0)
+            with open(src_path, "wb") as fh:
+                shutil.copyfileobj(audio, fh)
+            audio.seek(0)
+        out_path = os.path.join(work_dir, "answer.ogg")
+        try:
+            meta = preprocess_file(src_path, out_path)
+        except Exception as e:
+            logger.warning(f"Audio preprocessing failed, uploading original: {e}")
+            audio_preprocess.inc(outcome='failed')
+            yield audio, {'processed': False, 'original_bytes': _file_size(audio), 'error': str(e)[:200]}
+            return
+        audio_preprocess.inc(outcome='processed')
+        logger.info(
+            f"🎚️ Audio preprocessed: {meta['original_duration']}s/{meta['original_bytes']}B -> "
+            f"{meta['processed_duration']}s/{meta['processed_bytes']}B"
+        )
+        yield out_path, meta
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
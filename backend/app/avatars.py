@@ -0,0 +1,157 @@
+"""Avatar pipeline: decode, fix EXIF orientation, center-crop and re-encode to fixed WebP sizes.
+
+The request only spools the upload; decoding, resizing and storing run on a worker pool,
+and the user keeps the previous avatar meanwhile. Once every variant is stored,
+``users.avatar_url`` points at the largest one and ``users.avatar_variants`` holds
+``{size: url}``. Each upload carries a version (``time_ns`` at upload) and the switch is
+a conditional UPDATE on ``users.avatar_version``, so of two quick uploads the newer one
+wins whichever finishes last. Without Pillow the original image is stored as before.
+"""
+import os
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except Exception as e:
+    logging.warning(f"Pillow not available, avatars are stored unprocessed: {e}")
+    Image = None
+
+from sqlalchemy import update, or_
+
+from app.database import get_session, User
+from app.storage import get_storage
+from app.conditional import bump_versions
+
+logger = logging.getLogger(__name__)
+
+AVATAR_FOLDER = os.getenv("CLOUDINARY_AVATAR_FOLDER") or "avatars"
+AVATAR_SIZES = tuple(sorted(int(s) for s in os.getenv("AVATAR_SIZES", "64,128,512").split(",")))
+AVATAR_QUALITY = int(os.getenv("AVATAR_WEBP_QUALITY", "80"))
+MAX_AVATAR_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(10 * 1024 * 1024)))
+# Refuse decompression bombs before allocating the full bitmap
+MAX_AVATAR_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS", str(40_000_000)))
+
+_avatar_executor = ThreadPoolExecutor(max_workers=int(os.getenv("AVATAR_WORKERS", "2")),
+                                      thread_name_prefix="avatar")
+
+
+def processing_available():
+    return Image is not None
+
+
+def variant_key(user_id, token, size):
+    return f"{AVATAR_FOLDER}/avatar_{user_id}_{token}_{size}.webp"
+
+
+def variant_urls(user_id, token):
+    storage = get_storage()
+    return {str(size): storage.url_for(variant_key(user_id, token, size), 'image/webp') for size in AVATAR_SIZES}
+
+
+def render_variants(data):
+    """Return ``{size: webp_bytes}`` for a square, orientation-corrected avatar."""
+    with Image.open(BytesIO(data)) as img:
+        if img.width * img.height > MAX_AVATAR_PIXELS:
+            raise ValueError(f"Image too large: {img.width}x{img.height}")
+        # Let the JPEG decoder downscale by a power of two while decoding
+        img.draft('RGB', (AVATAR_SIZES[-1] * 2, AVATAR_SIZES[-1] * 2))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        side = min(img.size)
+        square = ImageOps.fit(img, (side, side), method=Image.Resampling.LANCZOS)
+    variants = {}
+    current = square
+    # Largest first, each step resized from the previous one
+    for size in reversed(AVATAR_SIZES):
+        if current.width > size:
+            current = current.resize((size, size), Image.Resampling.LANCZOS)
+        buf = BytesIO()
+        current.save(buf, 'WEBP', quality=AVATAR_QUALITY, method=4)
+        variants[size] = buf.getvalue()
+    return variants
+
+
+def set_avatar(db, user_id, version, avatar_url, variants):
+    """Point the user at a new avatar unless a newer one is already set; True if it was applied."""
+    applied = db.execute(
+        update(User)
+        .where(User.id == user_id, or_(User.avatar_version.is_(None), User.avatar_version < version))
+        .values(avatar_url=avatar_url, avatar_variants=variants, avatar_version=version)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if applied:
+        # Bulk UPDATE skips the flush listener; invalidate the user's cached responses
+        bump_versions(db, user_ids=[user_id])
+    db.commit()
+    return applied == 1
+
+
+def process_avatar(user_id, token, version, spool_path, urls):
+    """Worker: render and store the variants, then point the user at them."""
+    try:
+        with open(spool_path, 'rb') as fh:
+            data = fh.read()
+        variants = render_variants(data)
+        storage = get_storage()
+        for size, payload in variants.items():
+            # Wait for the upload: the URLs must resolve before the user is switched to them
+            storage.save(variant_key(user_id, token, size), BytesIO(payload), 'image/webp', wait=True)
+        logger.info(f"🖼️ Avatar {token} for user {user_id}: "
+                    f"{len(data)}B -> {', '.join(f'{s}px={len(p)}B' for s, p in sorted(variants.items()))}")
+    except Exception as e:
+        logger.error(f"Avatar processing for user {user_id} failed: {e}")
+        return
+    finally:
+        os.remove(spool_path)
+
+    db = get_session()
+    try:
+        if not set_avatar(db, user_id, version, urls[str(AVATAR_SIZES[-1])], urls):
+            logger.info(f"Avatar {token} for user {user_id} superseded by a newer upload")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Saving avatar variants for user {user_id} failed: {e}")
+    finally:
+        db.close()
+
+
+def _run(user_id, token, version, spool_path, urls):
+    try:
+        process_avatar(user_id, token, version, spool_path, urls)
+    except Exception as e:
+        logger.error(f"Background avatar job for user {user_id} failed: {e}")
+
+
+def check_image(upload):
+    """Cheap header-only check so obviously invalid uploads fail in the request; raises ValueError."""
+    upload.seek(0)
+    try:
+        with Image.open(upload) as img:
+            width, height = img.size
+    except Exception as e:
+        raise ValueError(f"Not an image: {e}")
+    finally:
+        upload.seek(0)
+    if width * height > MAX_AVATAR_PIXELS:
+        raise ValueError(f"Image too large: {width}x{height}")
+
+
+def submit_avatar(user_id, upload):
+    """Spool ``upload`` and queue processing; returns the upload's version."""
+    check_image(upload)
+    token = uuid.uuid4().hex[:8]
+    fd, spool_path = tempfile.mkstemp(prefix="avatar-")
+    with os.fdopen(fd, 'wb') as fh:
+        upload.seek(0)
+        shutil.copyfileobj(upload, fh)
+    # Computed in the request so local-storage URLs carry the request host
+    urls = variant_urls(user_id, token)
+    version = time.time_ns()
+    _avatar_executor.submit(_run, user_id, token, version, spool_path, urls)
+    return version
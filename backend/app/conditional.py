@@ -0,0 +1,132 @@
+"""Conditional GET for read endpoints, driven by per-user and per-session version counters.
+
+``users.content_version`` and ``interview_sessions.content_version`` are bumped in the
+same transaction as any ORM write to a user's profile, sessions, questions, answers or
+notes (a flush listener on ``SessionLocal``). Bulk UPDATEs bypass the listener and must
+bump the counters themselves (see the session sweeper).
+
+``conditional_get`` builds a weak ETag from the counter before the view runs, so a
+matching ``If-None-Match`` returns 304 without querying or serializing anything. The
+user counter is already loaded by ``token_required``; the session counter costs one
+primary-key lookup.
+"""
+import os
+import time
+import hashlib
+from functools import wraps
+
+from flask import request, make_response
+from sqlalchemy import event, select, update, or_
+
+from app.database import (
+    SessionLocal, User, InterviewSession, InterviewQuestion, InterviewAnswer, QuestionNote,
+)
+from app.metrics import conditional_requests
+
+# Change to invalidate every cached copy after a response format change
+ETAG_SALT = os.getenv("ETAG_SALT", "1")
+
+USER = 'user'
+SESSION = 'session'
+
+
+def _touched(db):
+    """User ids and session ids whose visible data changes in this flush."""
+    user_ids, session_ids = set(), set()
+    for obj in list(db.new) + list(db.dirty) + list(db.deleted):
+        if obj in db.dirty and not db.is_modified(obj):
+            continue
+        if isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, InterviewSession):
+            user_ids.add(obj.user_id)
+            session_ids.add(obj.id)
+        elif isinstance(obj, (InterviewQuestion, InterviewAnswer)):
+            session_ids.add(obj.session_id)
+        elif isinstance(obj, QuestionNote):
+            user_ids.add(obj.user_id)
+    user_ids.discard(None)
+    session_ids.discard(None)
+    return user_ids, session_ids
+
+
+def bump_versions(conn, user_ids=(), session_ids=()):
+    """Increment the counters of ``user_ids``, ``session_ids`` and the owners of those sessions."""
+    user_ids, session_ids = list(user_ids), list(session_ids)
+    if session_ids:
+        conn.execute(
+            update(InterviewSession)
+            .where(InterviewSession.id.in_(session_ids))
+            .values(content_version=InterviewSession.content_version + 1)
+        )
+    if user_ids or session_ids:
+        owners = select(InterviewSession.user_id).where(InterviewSession.id.in_(session_ids))
+        conn.execute(
+            update(User)
+            .where(or_(User.id.in_(user_ids), User.id.in_(owners)))
+            # Keep updated_at: this is bookkeeping, not a profile change
+            .values(content_version=User.content_version + 1, updated_at=User.updated_at)
+        )
+
+
+def _bump_on_flush(db, flush_context):
+    user_ids, session_ids = _touched(db)
+    if user_ids or session_ids:
+        bump_versions(db.connection(), user_ids, session_ids)
+
+
+def _session_version(user_id, session_id):
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            select(InterviewSession.user_id, InterviewSession.content_version)
+            .where(InterviewSession.id == session_id)
+        ).first()
+    finally:
+        db.close()
+    if row is None or row.user_id != user_id:
+        return None
+    return row.content_version
+
+
+def conditional_get(scope=USER, refresh_every=None):
+    """Serve 304 for an unchanged resource; apply below ``@token_required``.
+
+    ``scope`` picks the counter: ``'user'`` or ``'session'`` (the view takes
+    ``session_id``). ``refresh_every`` (seconds) also rolls the ETag over time, for
+    payloads with relative dates such as "Hôm qua".
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user, *args, **kwargs):
+            if scope == SESSION:
+                version = _session_version(current_user.id, kwargs['session_id'])
+            else:
+                version = current_user.content_version
+            if version is None:
+                # Not found or not owned; let the view answer
+                return f(current_user, *args, **kwargs)
+
+            key = f"{ETAG_SALT}|{request.full_path}"
+            if refresh_every:
+                key += f"|{int(time.time() // refresh_every)}"
+            etag = f"{scope}-{current_user.id}-{version}-{hashlib.sha1(key.encode()).hexdigest()[:12]}"
+
+            if request.if_none_match.contains_weak(etag):
+                conditional_requests.inc(endpoint=request.endpoint, outcome='not_modified')
+                resp = make_response('', 304)
+            else:
+                conditional_requests.inc(endpoint=request.endpoint, outcome='full')
+                resp = make_response(f(current_user, *args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp
+        return decorated
+    return decorator
+
+
+def init_conditional():
+    if not event.contains(SessionLocal, 'after_flush', _bump_on_flush):
+        event.listen(SessionLocal, 'after_flush', _bump_on_flush)
@@ -1,9 +1,11 @@
 # database.py (Fixed to be compatible with frontend requirements)
 import os
+from datetime import datetime, timedelta
 from sqlalchemy import (
     create_engine,
     Column,
     Integer,
+    BigInteger,
     String,
     Boolean,
     Text,
@@ -37,11 +39,17 @@ class User(Base):
     email = Column(String(255), unique=True, nullable=False, index=True)
     password_hash = Column(String(255), nullable=False)
     avatar_url = Column(String(255))
+    # {"64": url, "128": url, "512": url} written by app/avatars.py
+    avatar_variants = Column(JSON)
+    # time_ns of the upload currently shown; a slower, older upload never replaces a newer one
+    avatar_version = Column(BigInteger)
     profession = Column(String(255))
     experience_level = Column(String(100))
     provider = Column(String(50))
     provider_id = Column(String(255))
     email_verified_at = Column(DateTime)
+    # Bumped on every write to the user's profile, sessions, answers or notes (app/conditional.py)
+    content_version = Column(Integer, nullable=False, server_default=text("0"))
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -67,6 +75,8 @@ class InterviewSession(Base):
     started_at = Column(DateTime, server_default=func.now())
     created_at = Column(DateTime, server_default=func.now())  # Added for frontend compatibility
     expires_at = Column(DateTime)
+    # Bumped on every write to the session, its questions or answers (app/conditional.py)
+    content_version = Column(Integer, nullable=False, server_default=text("0"))
 
 
 class InterviewQuestion(Base):
@@ -100,10 +110,90 @@ class InterviewAnswer(Base):
     relevance_score = Column(Float)
     strengths = Column(JSON)
     improvements = Column(JSON)
+    # Original vs preprocessed duration / size of the recording (see app/audio_processing.py)
+    audio_meta = Column(JSON)
     created_at = Column(DateTime, server_default=func.now())
 
 
 
+class AudioUpload(Base):
+    """Resumable (tus-style) answer audio upload; bytes live in a temp file until processed."""
+
+    __tablename__ = "audio_uploads"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    session_id = Column(
+        Integer, ForeignKey("interview_sessions.id", ondelete="CASCADE"), nullable=False
+    )
+    question_id = Column(
+        Integer, ForeignKey("interview_questions.id", ondelete="CASCADE"), nullable=False
+    )
+    filename = Column(String(255))
+    total_size = Column(Integer, nullable=False)
+    upload_offset = Column(Integer, nullable=False, default=0)
+    # uploading <-> receiving (a PATCH is writing) -> processing -> completed | failed
+    status = Column(String(20), nullable=False, default="uploading")
+    # Random id of the PATCH currently receiving; release and heartbeats must present it
+    claim_id = Column(String(32))
+    # When a worker claimed the processing; a lease, reclaimable once it expires
+    claimed_at = Column(DateTime)
+    # Host the upload was created through; the base of its local media URL
+    host_url = Column(String(255))
+    answer_id = Column(Integer, ForeignKey("interview_answers.id", ondelete="SET NULL"))
+    error = Column(Text)
+    created_at = Column(DateTime, server_default=func.now())
+    # Set from Python so the garbage collector can compare it with utcnow()
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SessionResult(Base):
+    """Persisted outcome of a finished session so repeat finishes never call the AI again."""
+
+    __tablename__ = "session_results"
+
+    session_id = Column(
+        Integer, ForeignKey("interview_sessions.id", ondelete="CASCADE"), primary_key=True
+    )
+    # pending -> generating -> ready | failed
+    status = Column(String(20), nullable=False, default="pending")
+    summary = Column(Text)
+    performance_level = Column(String(50))
+    total_score = Column(Float)
+    max_possible_score = Column(Float)
+    average_score = Column(Float)
+    score_percentage = Column(Float)
+    total_questions = Column(Integer)
+    error = Column(Text)
+    # When the current generating claim was taken; stale claims are taken over
+    claimed_at = Column(DateTime)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class IdempotencyKey(Base):
+    """Stored outcome of a request sent with an ``Idempotency-Key`` header, unique per user."""
+
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    # SHA-256 of method, path and body; a reused key with a different request is rejected
+    request_hash = Column(String(64), nullable=False)
+    # processing -> completed
+    status = Column(String(20), nullable=False, default="processing")
+    response_code = Column(Integer)
+    response_body = Column(Text)
+    content_type = Column(String(100))
+    locked_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_user_key"),
+    )
+
+
 class QuestionNote(Base):
     __tablename__ = "question_notes"
 
@@ -119,15 +209,86 @@ class QuestionNote(Base):
     )
 
 
+class RefreshToken(Base):
+    """Issued refresh token, looked up by ``jti`` on refresh and logout.
+
+    Each refresh replaces the token with a new one of the same family; presenting an
+    already-replaced token revokes the whole family.
+    """
+
+    __tablename__ = "refresh_tokens"
+
+    jti = Column(String(32), primary_key=True)
+    family_id = Column(String(32), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime)
+    replaced_by = Column(String(32))
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class SearchDocument(Base):
+    """Diacritic-folded text of a question and its answer, the unit of full-text search.
+
+    Maintained by app/search.py; the full-text index itself is backend specific (GIN
+    expression index on Postgres, an FTS5 table on SQLite).
+    """
+
+    __tablename__ = "search_documents"
+
+    question_id = Column(
+        Integer, ForeignKey("interview_questions.id", ondelete="CASCADE"), primary_key=True
+    )
+    session_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    document = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ScoreHistogramBin(Base):
+    """Completed sessions per cohort and average-score bin (see app/score_ranking.py)."""
+
+    __tablename__ = "score_histogram_bins"
+
+    # Cohort; NULL session attributes are stored as ''
+    field = Column(String(100), primary_key=True)
+    specialization = Column(String(100), primary_key=True)
+    experience_level = Column(String(50), primary_key=True)
+    bin = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, server_default=text("0"))
+    # Set by the full rebuild; NULL on bins created incrementally since
+    refreshed_at = Column(DateTime)
+
+
 class PasswordReset(Base):
     __tablename__ = "password_resets"
 
     email = Column(String(255), primary_key=True)
     token = Column(String(255), primary_key=True)
     created_at = Column(DateTime, server_default=func.now())
+    expires_at = Column(DateTime)
 
 
-Index("idx_password_resets_token", PasswordReset.token)
+# Used by the password-reset purge job
+Index("idx_password_resets_expires", PasswordReset.expires_at)
+# Used by the session-expiry sweeper to find ongoing sessions past expires_at
+Index("idx_interview_sessions_status_expires", InterviewSession.status, InterviewSession.expires_at)
+# One answer per question; retried submissions must not insert duplicates
+Index("uq_interview_answers_session_question", InterviewAnswer.session_id, InterviewAnswer.question_id, unique=True)
+# Used by the abandoned-upload garbage collector
+Index("idx_audio_uploads_updated", AudioUpload.updated_at)
+# Saved-notes listing: newest first per user, paginated on id
+Index("idx_question_notes_user_id", QuestionNote.user_id, QuestionNote.id)
+# Per-user history, stats and progress analytics
+Index("idx_interview_sessions_user_created", InterviewSession.user_id, InterviewSession.created_at)
+# Search is always scoped to one user
+Index("idx_search_documents_user", SearchDocument.user_id)
+# Used by the idempotency-key purge job
+Index("idx_idempotency_keys_locked_at", IdempotencyKey.locked_at)
+# Family revocation on token reuse, per-user revocation and the expiry purge
+Index("idx_refresh_tokens_family", RefreshToken.family_id)
+Index("idx_refresh_tokens_user", RefreshToken.user_id)
+Index("idx_refresh_tokens_expires", RefreshToken.expires_at)
 
 
 def migrate_user_settings():
@@ -156,6 +317,55 @@ def migrate_user_settings():
             add_column("email_notifications")
 
 
+def migrate_users():
+    """Ensure new columns exist on users."""
+    inspector = inspect(engine)
+    if not inspector.has_table("users"):
+        return
+    existing = {col["name"] for col in inspector.get_columns("users")}
+    with engine.begin() as conn:
+        if "avatar_variants" not in existing:
+            conn.execute(text("ALTER TABLE users ADD COLUMN avatar_variants JSON"))
+        if "content_version" not in existing:
+            conn.execute(text("ALTER TABLE users ADD COLUMN content_version INTEGER NOT NULL DEFAULT 0"))
+        if "avatar_version" not in existing:
+            conn.execute(text("ALTER TABLE users ADD COLUMN avatar_version BIGINT"))
+
+
+def migrate_password_resets():
+    """Add expires_at to password_resets; drop codes already past the old 3-minute window."""
+    inspector = inspect(engine)
+    if not inspector.has_table("password_resets"):
+        return
+    existing = {col["name"] for col in inspector.get_columns("password_resets")}
+    if "expires_at" in existing:
+        return
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE password_resets ADD COLUMN expires_at TIMESTAMP"))
+        removed = conn.execute(
+            text("DELETE FROM password_resets WHERE created_at < :cutoff"),
+            {"cutoff": now - timedelta(minutes=3)},
+        ).rowcount
+        conn.execute(
+            text("UPDATE password_resets SET expires_at = :expires WHERE expires_at IS NULL"),
+            {"expires": now + timedelta(minutes=3)},
+        )
+    if removed:
+        print(f"Removed {removed} expired password reset codes")
+
+
+def migrate_session_results():
+    """Add the generation lease column to session_results."""
+    inspector = inspect(engine)
+    if not inspector.has_table("session_results"):
+        return
+    existing = {col["name"] for col in inspector.get_columns("session_results")}
+    if "claimed_at" not in existing:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE session_results ADD COLUMN claimed_at TIMESTAMP"))
+
+
 def migrate_interview_sessions():
     """Ensure new metadata columns exist on interview_sessions."""
     inspector = inspect(engine)
@@ -182,6 +392,8 @@ def migrate_interview_sessions():
             add_col("mode", "VARCHAR(20) DEFAULT 'voice'")
         if "difficulty_setting" not in existing:
             add_col("difficulty_setting", "VARCHAR(50) DEFAULT 'medium'")
+        if "content_version" not in existing:
+            add_col("content_version", "INTEGER NOT NULL DEFAULT 0")
         # Drop old columns if they exist
         if "topic_id" in existing:
             try:
@@ -221,6 +433,8 @@ def migrate_interview_answers():
             add_col("strengths", "JSON")
         if "improvements" not in existing:
             add_col("improvements", "JSON")
+        if "audio_meta" not in existing:
+            add_col("audio_meta", "JSON")
         # Drop legacy 'answer' column if exists to avoid duplication with transcript_text
         if "answer" in existing:
             try:
@@ -252,6 +466,34 @@ def migrate_remove_session_columns():
             except Exception as e:
                 print(f"Error removing completed_at column: {e}")
 
+def migrate_unique_answers():
+    """Drop duplicate answers (keeping the first per question) so the unique index can be built."""
+    inspector = inspect(engine)
+    if not inspector.has_table("interview_answers"):
+        return
+    existing = {ix["name"] for ix in inspector.get_indexes("interview_answers")}
+    if "uq_interview_answers_session_question" in existing:
+        return
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            "DELETE FROM interview_answers WHERE id NOT IN ("
+            " SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM interview_answers"
+            " GROUP BY session_id, question_id) AS keep)"
+        ))
+        if result.rowcount:
+            print(f"Removed {result.rowcount} duplicate interview answers")
+
+
+def migrate_indexes():
+    """Create indexes declared on existing tables (create_all only does it for new tables)."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                print(f"Error creating index {index.name}: {e}")
+
+
 def get_session():
     return SessionLocal()
 
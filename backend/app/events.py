@@ -0,0 +1,31 @@
+"""Tiny in-process event bus used to fan out domain events (session transitions, new answers).
+
+Handlers run synchronously in the emitting thread, after the emitter has committed.
+They must be quick and must not raise; failures are logged and swallowed.
+"""
+import threading
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+SESSION_STATUS_CHANGED = 'session.status_changed'
+
+_subscribers = defaultdict(list)
+_lock = threading.Lock()
+
+
+def subscribe(event, handler):
+    with _lock:
+        if handler not in _subscribers[event]:
+            _subscribers[event].append(handler)
+
+
+def emit(event, **payload):
+    with _lock:
+        handlers = list(_subscribers.get(event, ()))
+    for handler in handlers:
+        try:
+            handler(**payload)
+        except Exception as e:
+            logger.error(f"Event handler {getattr(handler, '__name__', handler)} for {event} failed: {e}")
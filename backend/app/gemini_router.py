@@ -0,0 +1,207 @@
+"""Route Gemini calls across a pool of API keys and per-task model tiers.
+
+Keys come from ``GEMINI_API_KEYS`` (comma separated, falls back to ``GEMINI_API_KEY``).
+Each task (question, evaluation, summary, chat) has an ordered list of models from
+``GEMINI_MODELS_<TASK>`` or ``GEMINI_MODELS``. For every call we try the tiers in order
+and, inside a tier, pick the key with the best observed latency / throttle rate. A 429
+puts the key on cooldown for that model and fails over to the next key.
+"""
+import os
+import random
+import threading
+import time
+import logging
+
+from app.resilience import RETRYABLE_ERRORS, resilient_request, retry_budget
+from app.metrics import gemini_prompt_chars, gemini_response_bytes
+
+logger = logging.getLogger(__name__)
+
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+TASKS = ("question", "evaluation", "summary", "chat")
+
+THROTTLE_COOLDOWN = float(os.getenv("GEMINI_THROTTLE_COOLDOWN", "30"))
+# Weight of the newest sample in the latency / throttle moving averages
+EWMA_ALPHA = 0.2
+
+
+def _split_env(name):
+    return [v.strip() for v in (os.getenv(name) or "").split(",") if v.strip()]
+
+
+class RouteStats:
+    """Counters and moving averages for one (key, model) pair."""
+
+    def __init__(self):
+        self.requests = 0
+        self.successes = 0
+        self.errors = 0
+        self.throttled = 0
+        self.latency_ewma = None
+        self.throttle_rate = 0.0
+        self.throttled_until = 0.0
+
+    def score(self):
+        # Untried routes get a neutral latency so they are explored early
+        latency = self.latency_ewma if self.latency_ewma is not None else 1.0
+        return latency * (1 + 4 * self.throttle_rate)
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'successes': self.successes,
+            'errors': self.errors,
+            'throttled': self.throttled,
+            'latency_ewma_ms': round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            'throttle_rate': round(self.throttle_rate, 3),
+            'cooling_down': self.throttled_until > time.monotonic(),
+        }
+
+
+class GeminiRouter:
+    def __init__(self, api_keys, model_tiers, base_url=GEMINI_BASE_URL):
+        self.api_keys = list(api_keys)
+        self.model_tiers = model_tiers
+        self.base_url = base_url.rstrip("/")
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        keys = _split_env("GEMINI_API_KEYS") or _split_env("GEMINI_API_KEY")
+        default_models = _split_env("GEMINI_MODELS") or [DEFAULT_MODEL]
+        tiers = {task: _split_env(f"GEMINI_MODELS_{task.upper()}") or default_models for task in TASKS}
+        return cls(keys, tiers)
+
+    @property
+    def configured(self):
+        return bool(self.api_keys)
+
+    def key_id(self, index):
+        """Opaque label for a key (its position in GEMINI_API_KEYS); reveals nothing of the key."""
+        return f"key{index}"
+
+    def _route(self, index, model):
+        with self._lock:
+            return self._stats.setdefault((index, model), RouteStats())
+
+    def _candidates(self, model):
+        """Key indexes for ``model`` that are not cooling down, best score first."""
+        now = time.monotonic()
+        routes = [(i, self._route(i, model)) for i in range(len(self.api_keys))]
+        available = [(i, s) for i, s in routes if s.throttled_until <= now]
+        # Light randomisation so equally scored keys share the load
+        available.sort(key=lambda item: item[1].score() * random.uniform(0.9, 1.1))
+        return [i for i, _ in available]
+
+    def _record(self, stats, elapsed, status):
+        with self._lock:
+            stats.requests += 1
+            throttled = status == 429
+            stats.throttle_rate += EWMA_ALPHA * ((1.0 if throttled else 0.0) - stats.throttle_rate)
+            if throttled:
+                stats.throttled += 1
+                return
+            if status is None or status >= 400:
+                stats.errors += 1
+            else:
+                stats.successes += 1
+            if status is not None and status < 500:
+                stats.latency_ewma = elapsed if stats.latency_ewma is None else (
+                    stats.latency_ewma + EWMA_ALPHA * (elapsed - stats.latency_ewma)
+                )
+
+    def post(self, task, payload, timeout=30):
+        """POST a ``generateContent`` payload for ``task`` and return the final response.
+
+        Mirrors ``requests.post``: non-2xx responses are returned so callers keep their
+        own error handling. Network errors are raised once every route has been tried.
+        """
+        if not self.configured:
+            raise RuntimeError("GEMINI_API_KEY not configured")
+
+        models = self.model_tiers.get(task) or [DEFAULT_MODEL]
+        gemini_prompt_chars.observe(
+            sum(len(part.get("text", "")) for c in payload.get("contents", []) for part in c.get("parts", [])),
+            task=task,
+        )
+        last_resp, last_error = None, None
+        first_attempt, budget_spent = True, False
+        for model in models:
+            endpoint = f"{self.base_url}/models/{model}:generateContent"
+            for index in self._candidates(model):
+                # Failing over after a throttle is free, anything else spends retry budget
+                if not first_attempt and not (last_resp is not None and last_resp.status_code == 429):
+                    if not retry_budget.try_acquire():
+                        budget_spent = True
+                        break
+                first_attempt = False
+
+                stats = self._route(index, model)
+                started = time.monotonic()
+                try:
+                    resp = resilient_request(
+                        "gemini", "POST", endpoint,
+                        params={"key": self.api_keys[index]}, json=payload, timeout=timeout, max_attempts=1,
+                    )
+                except RETRYABLE_ERRORS as e:
+                    self._record(stats, time.monotonic() - started, None)
+                    logger.warning(f"Gemini {model} via {self.key_id(index)} failed: {e}")
+                    last_resp, last_error = None, e
+                    continue
+
+                self._record(stats, time.monotonic() - started, resp.status_code)
+                last_resp, last_error = resp, None
+                if resp.ok:
+                    gemini_response_bytes.observe(len(resp.content), task=task)
+                    return resp
+                if resp.status_code == 429:
+                    retry_after = resp.headers.get("Retry-After", "")
+                    cooldown = float(retry_after) if retry_after.isdigit() else THROTTLE_COOLDOWN
+                    with self._lock:
+                        stats.throttled_until = time.monotonic() + cooldown
+                    logger.warning(f"Gemini {model} throttled on {self.key_id(index)}, cooling down {cooldown:.0f}s")
+                    continue
+                if resp.status_code < 500:
+                    # Bad request / auth problems will not be fixed by another route
+                    return resp
+                logger.warning(f"Gemini {model} via {self.key_id(index)} returned {resp.status_code}")
+            if budget_spent:
+                break
+
+        if last_error is not None:
+            raise last_error
+        if last_resp is None:
+            raise RuntimeError("All Gemini API keys are throttled, please retry later")
+        return last_resp
+
+    def snapshot(self):
+        """Per-key and per-model counters for capacity planning."""
+        with self._lock:
+            items = list(self._stats.items())
+        per_key, per_model = {}, {}
+        for (index, model), stats in items:
+            data = stats.to_dict()
+            per_key.setdefault(self.key_id(index), {})[model] = data
+            totals = per_model.setdefault(model, {'requests': 0, 'successes': 0, 'errors': 0, 'throttled': 0})
+            for field in totals:
+                totals[field] += data[field]
+        return {
+            'keys': per_key,
+            'models': per_model,
+            'tiers': self.model_tiers,
+        }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_gemini_router():
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = GeminiRouter.from_env()
+    return _router
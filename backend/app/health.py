@@ -0,0 +1,176 @@
+"""Background dependency prober backing the liveness / readiness endpoints.
+
+Probes run on a background thread every ``HEALTH_PROBE_INTERVAL`` seconds; the HTTP
+endpoints only read the cached results, so orchestrator probes never touch the database
+or spend Gemini quota. Results older than ``HEALTH_STATUS_TTL`` are treated as failed.
+With background jobs disabled (``BACKGROUND_JOBS=0``) the endpoints probe on demand
+instead, at most once per ``HEALTH_PROBE_INTERVAL`` across concurrent requests.
+"""
+import os
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+
+import requests
+from flask import jsonify
+
+from app.scheduler import schedule
+
+logger = logging.getLogger(__name__)
+
+PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+STATUS_TTL = float(os.getenv("HEALTH_STATUS_TTL", "60"))
+PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))
+VERSION = '1.0.0'
+
+
+def _utcnow_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def check_database():
+    from app.database import check_connection
+    if not check_connection():
+        raise RuntimeError("database connection failed")
+
+
+def check_gemini():
+    from app.gemini_router import get_gemini_router
+    router = get_gemini_router()
+    if not router.configured:
+        raise RuntimeError("GEMINI_API_KEY not configured")
+    model = router.model_tiers['question'][0]
+    resp = requests.get(
+        f"{router.base_url}/models/{model}",
+        params={"key": router.api_keys[0]},
+        timeout=PROBE_TIMEOUT,
+    )
+    if not resp.ok:
+        raise RuntimeError(f"Gemini returned {resp.status_code}")
+
+
+class HealthProber:
+    """Runs dependency checks periodically and caches the latest result per dependency."""
+
+    def __init__(self):
+        # name -> (check function, critical for readiness)
+        self.checks = {
+            'database': (check_database, True),
+            'gemini_api': (check_gemini, False),
+        }
+        self._results = {}
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._last_probe = None
+        # Set when no background prober runs; snapshot() then probes itself
+        self.on_demand = False
+
+    def probe_all(self):
+        self._last_probe = time.monotonic()
+        for name, (check, _) in self.checks.items():
+            started = time.perf_counter()
+            error = None
+            try:
+                check()
+            except Exception as e:
+                error = str(e)
+            result = {
+                'ok': error is None,
+                'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+                'checked_at': _utcnow_iso(),
+                'error': error,
+                '_monotonic': time.monotonic(),
+            }
+            if error:
+                logger.warning(f"Health probe {name} failed: {error}")
+            with self._lock:
+                self._results[name] = result
+
+    def probe_if_due(self):
+        """Probe synchronously unless a probe ran in the last ``PROBE_INTERVAL`` seconds."""
+        if self._last_probe is not None and time.monotonic() - self._last_probe < PROBE_INTERVAL:
+            return
+        with self._probe_lock:
+            # Another request may have probed while we waited
+            if self._last_probe is None or time.monotonic() - self._last_probe >= PROBE_INTERVAL:
+                self.probe_all()
+
+    def snapshot(self):
+        """Return ``(ready, services)`` from the cached results."""
+        if self.on_demand:
+            self.probe_if_due()
+        now = time.monotonic()
+        with self._lock:
+            results = dict(self._results)
+        services = {}
+        ready = True
+        for name, (_, critical) in self.checks.items():
+            result = results.get(name)
+            if result is None:
+                services[name] = {'ok': False, 'latency_ms': None, 'checked_at': None,
+                                  'error': 'not probed yet', 'critical': critical}
+            else:
+                stale = now - result['_monotonic'] > STATUS_TTL
+                services[name] = {
+                    'ok': result['ok'] and not stale,
+                    'latency_ms': result['latency_ms'],
+                    'checked_at': result['checked_at'],
+                    'error': 'stale probe result' if stale else result['error'],
+                    'critical': critical,
+                }
+            if critical and not services[name]['ok']:
+                ready = False
+        return ready, services
+
+
+prober = HealthProber()
+
+
+def _circuit_states():
+    from app.resilience import breakers
+    return {name: b.state for name, b in breakers.items()}
+
+
+def init_health(app):
+    """Register ``/livez``, ``/readyz`` and ``/health`` and start the background prober."""
+    if schedule('health-prober', PROBE_INTERVAL, prober.probe_all) is None:
+        prober.on_demand = True
+
+    @app.route("/livez")
+    def livez():
+        """Liveness: the process is up and serving requests, no dependency checks."""
+        return jsonify({'status': 'alive', 'timestamp': _utcnow_iso()}), 200
+
+    @app.route("/readyz")
+    def readyz():
+        """Readiness from cached probe results; only critical dependencies gate it."""
+        ready, services = prober.snapshot()
+        return jsonify({
+            'status': 'ready' if ready else 'not_ready',
+            'timestamp': _utcnow_iso(),
+            'services': services,
+            'circuits': _circuit_states(),
+        }), 200 if ready else 503
+
+    @app.route("/health")
+    def health_check():
+        """Health check endpoint để kiểm tra trạng thái API (đọc kết quả probe đã cache)"""
+        ready, services = prober.snapshot()
+        env_status = {
+            'GEMINI_API_KEY': bool(os.getenv('GEMINI_API_KEY') or os.getenv('GEMINI_API_KEYS')),
+            'SUPABASE_URL': bool(os.getenv('SUPABASE_URL')),
+            'SUPABASE_KEY': bool(os.getenv('SUPABASE_KEY')),
+        }
+        healthy = ready and all(s['ok'] for s in services.values()) and all(env_status.values())
+        return jsonify({
+            'status': 'healthy' if healthy else 'degraded',
+            'timestamp': _utcnow_iso(),
+            'services': {
+                'database': services['database']['ok'],
+                'gemini_api': services['gemini_api']['ok'],
+                'environment': env_status,
+                'details': services,
+            },
+            'version': VERSION,
+        }), 200 if services['database']['ok'] else 503
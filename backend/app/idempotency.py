@@ -0,0 +1,215 @@
+"""``Idempotency-Key`` support for POST endpoints that must not run twice on a client retry.
+
+The first request with a key (unique per user) inserts a ``processing`` row and runs the
+view; the response is stored on the row. A retry with the same key and body waits for the
+in-flight request and then replays the stored response. Reusing a key for a different
+request returns 422. 5xx responses and in-progress answers (202, e.g. an async finish
+whose summary is still being generated) are not stored, so a retry runs the view again
+and sees the current state.
+Rows older than ``IDEMPOTENCY_TTL_HOURS`` are purged by a background job.
+"""
+import os
+import time
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import request, jsonify, make_response, current_app
+from sqlalchemy import select, delete, update
+from sqlalchemy.exc import IntegrityError
+
+from app.database import get_session, IdempotencyKey
+from app.metrics import idempotency_requests
+from app.scheduler import schedule
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+PROCESSING = 'processing'
+COMPLETED = 'completed'
+
+TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# How long a retry waits for the in-flight request before giving up with 409
+WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+POLL_INTERVAL = float(os.getenv("IDEMPOTENCY_POLL_INTERVAL", "0.25"))
+# A processing row not finished after this long belongs to a dead worker and may be taken over
+LOCK_TIMEOUT = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "300"))
+GC_INTERVAL = float(os.getenv("IDEMPOTENCY_GC_INTERVAL", "3600"))
+GC_BATCH_SIZE = int(os.getenv("IDEMPOTENCY_GC_BATCH_SIZE", "1000"))
+
+
+def request_fingerprint():
+    """SHA-256 of method, path and body; uploaded files are hashed in chunks and rewound."""
+    h = hashlib.sha256()
+    h.update(f"{request.method} {request.path}\0".encode())
+    if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        for name, value in sorted(request.form.items(multi=True)):
+            h.update(f"{name}={value}\0".encode())
+        for name, storage in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            h.update(f"{name}:{storage.filename}\0".encode())
+            for chunk in iter(lambda: storage.stream.read(64 * 1024), b''):
+                h.update(chunk)
+            storage.stream.seek(0)
+    else:
+        h.update(request.get_data(cache=True))
+    return h.hexdigest()
+
+
+def _insert(db, user_id, key, fingerprint):
+    row = IdempotencyKey(user_id=user_id, key=key, request_hash=fingerprint,
+                         status=PROCESSING, locked_at=datetime.utcnow())
+    db.add(row)
+    try:
+        db.commit()
+        return row
+    except IntegrityError:
+        db.rollback()
+        return None
+
+
+def _take_over(db, row):
+    """Claim a stale processing row with a conditional UPDATE; True if we own it now."""
+    claimed = db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.id == row.id, IdempotencyKey.status == PROCESSING,
+               IdempotencyKey.locked_at == row.locked_at)
+        .values(locked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return claimed == 1
+
+
+def reserve(user_id, key, fingerprint):
+    """Return ``(outcome, value)``: ``owner`` with the row id to complete, ``replay`` with
+    the stored row, or ``mismatch`` / ``busy`` with None."""
+    db = get_session()
+    try:
+        deadline = time.monotonic() + WAIT_SECONDS
+        try_insert = True
+        while True:
+            if try_insert:
+                row = _insert(db, user_id, key, fingerprint)
+                if row is not None:
+                    return 'owner', row.id
+            row = db.execute(
+                select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            ).scalar_one_or_none()
+            # Row vanished: the first attempt failed with a 5xx, so this retry runs the work
+            try_insert = row is None
+            if row is not None:
+                if row.request_hash != fingerprint:
+                    return 'mismatch', None
+                if row.status == COMPLETED:
+                    db.expunge(row)
+                    return 'replay', row
+                stale_before = datetime.utcnow() - timedelta(seconds=LOCK_TIMEOUT)
+                if row.locked_at < stale_before and _take_over(db, row):
+                    logger.warning(f"Took over stale idempotency key {row.id} for user {user_id}")
+                    return 'owner', row.id
+                if time.monotonic() >= deadline:
+                    return 'busy', None
+                # End the transaction so the next read sees the owner's commit
+                db.rollback()
+                time.sleep(POLL_INTERVAL)
+    finally:
+        db.close()
+
+
+def store_response(row_id, response):
+    """Persist a final response; drop the reservation on a server failure or a 202."""
+    db = get_session()
+    try:
+        if response is None or response.status_code >= 500 or response.status_code == 202:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == row_id))
+        else:
+            db.execute(
+                update(IdempotencyKey).where(IdempotencyKey.id == row_id).values(
+                    status=COMPLETED,
+                    response_code=response.status_code,
+                    response_body=response.get_data(as_text=True),
+                    content_type=response.content_type,
+                )
+            )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to store idempotent response {row_id}: {e}")
+    finally:
+        db.close()
+
+
+def replay(row):
+    response = current_app.response_class(row.response_body, status=row.response_code,
+                                          content_type=row.content_type)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(f):
+    """Honour an ``Idempotency-Key`` header; apply below ``token_required``."""
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return f(current_user, *args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': 'Idempotency-Key không hợp lệ'}), 400
+
+        endpoint = request.endpoint or f.__name__
+        outcome, value = reserve(current_user.id, key, request_fingerprint())
+        idempotency_requests.inc(endpoint=endpoint, outcome=outcome)
+        if outcome == 'replay':
+            return replay(value)
+        if outcome == 'mismatch':
+            return jsonify({'error': 'Idempotency-Key đã được dùng cho một yêu cầu khác'}), 422
+        if outcome == 'busy':
+            response = jsonify({'error': 'Yêu cầu với Idempotency-Key này đang được xử lý'})
+            response.headers['Retry-After'] = str(int(POLL_INTERVAL) + 1)
+            return response, 409
+
+        response = None
+        try:
+            response = make_response(f(current_user, *args, **kwargs))
+            return response
+        finally:
+            store_response(value, response)
+    return decorated
+
+
+def purge_expired_keys(batch_size=GC_BATCH_SIZE):
+    """Delete keys older than the TTL in batches; returns the number removed."""
+    cutoff = datetime.utcnow() - timedelta(hours=TTL_HOURS)
+    total = 0
+    while True:
+        expired_ids = (
+            select(IdempotencyKey.id)
+            .where(IdempotencyKey.locked_at < cutoff)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        db = get_session()
+        try:
+            removed = db.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.id.in_(expired_ids))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        total += removed
+        if removed < batch_size:
+            break
+    if total:
+        logger.info(f"Purged {total} expired idempotency keys")
+    return total
+
+
+def init_idempotency():
+    schedule('idempotency-gc', GC_INTERVAL, purge_expired_keys, run_immediately=False)
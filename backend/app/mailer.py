@@ -0,0 +1,238 @@
+"""Outbound mail queue with one persistent SMTP connection and a background sender.
+
+Requests only enqueue; the sender thread reuses a logged-in SMTP connection (probed
+with NOOP after it has been idle, closed after ``MAIL_IDLE_TIMEOUT``) and retries
+failed sends with backoff. Templates are compiled once at import.
+"""
+import os
+import queue
+import atexit
+import smtplib
+import logging
+import threading
+import time
+from datetime import datetime
+from string import Template
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from app.resilience import backoff_delay
+from app.metrics import mail_sent, mail_queue_depth
+
+logger = logging.getLogger(__name__)
+
+EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
+EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', '1') != '0'
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '20'))
+MAIL_QUEUE_SIZE = int(os.getenv('MAIL_QUEUE_SIZE', '1000'))
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', '4'))
+# Servers drop idle sessions (Gmail after a few minutes); close ours first
+MAIL_IDLE_TIMEOUT = float(os.getenv('MAIL_IDLE_TIMEOUT', '60'))
+# Probe a connection with NOOP before reuse once it has been idle this long
+MAIL_NOOP_AFTER = float(os.getenv('MAIL_NOOP_AFTER', '10'))
+MAIL_SHUTDOWN_TIMEOUT = float(os.getenv('MAIL_SHUTDOWN_TIMEOUT', '5'))
+
+RESET_CODE_SUBJECT = "🔐 PrepTalk - Reset Your Password"
+RESET_CODE_TEMPLATE = Template("""
+        <html>
+        <head>
+            <style>
+                body {
+                    font-family: 'Inter', Arial, sans-serif;
+                    background-color: #111827;
+                    color: #F9FAFB;
+                    padding: 20px;
+                    text-align: center;
+                }
+                .container {
+                    background-color: #1F2937;
+                    padding: 30px;
+                    border-radius: 10px;
+                    width: 80%;
+                    margin: auto;
+                }
+                h2 {
+                    color: #6D28D9;
+                    margin-bottom: 16px;
+                }
+                p {
+                    font-size: 16px;
+                    color: #D1D5DB;
+                    margin: 8px 0;
+                }
+                .code {
+                    font-size: 24px;
+                    font-weight: bold;
+                    color: #F9FAFB;
+                    background: #111827;
+                    padding: 10px 20px;
+                    border: 2px dashed #6D28D9;
+                    border-radius: 8px;
+                    display: inline-block;
+                    margin: 16px 0;
+                }
+                .divider {
+                    margin-top: 24px;
+                    border: none;
+                    border-top: 1px solid #374151;
+                }
+                .footer {
+                    margin-top: 20px;
+                    font-size: 14px;
+                    color: #9CA3AF;
+                }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <h2>🔐 Reset Your Password</h2>
+                <p>Hello,</p>
+                <p>You requested to reset your password on <strong>PrepTalk</strong>. Use the code below to proceed:</p>
+                <div class="code">$code</div>
+                <p>This code is valid for <strong>$minutes minutes</strong>.</p>
+                <p>If you did not request this, please ignore this email.</p>
+                <hr class="divider"/>
+                <p class="footer">© $year PrepTalk. All rights reserved.</p>
+            </div>
+        </body>
+        </html>
+        """)
+
+
+def mail_configured():
+    return bool(EMAIL_ADDRESS and EMAIL_PASSWORD)
+
+
+class SMTPConnection:
+    """A lazily opened, reused SMTP session (used only by the sender thread)."""
+
+    def __init__(self):
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            server.starttls()
+        server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+        logger.info(f"Opened SMTP connection to {SMTP_HOST}:{SMTP_PORT}")
+        return server
+
+    def get(self):
+        if self._server is not None and time.monotonic() - self._last_used > MAIL_NOOP_AFTER:
+            try:
+                if self._server.noop()[0] != 250:
+                    self.close()
+            except smtplib.SMTPException:
+                self.close()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def send(self, from_addr, to_addr, message):
+        self.get().sendmail(from_addr, to_addr, message)
+        self._last_used = time.monotonic()
+
+    def idle_for(self):
+        return time.monotonic() - self._last_used if self._server is not None else 0.0
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+
+class MailQueue:
+    """Bounded queue drained by a single sender thread owning the SMTP connection."""
+
+    def __init__(self, maxsize=MAIL_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._connection = SMTPConnection()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_sender(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mail-sender", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, to_addr, subject, html):
+        """Queue a message; False when mail is not configured or the queue is full."""
+        if not mail_configured():
+            logger.error("EMAIL_ADDRESS / EMAIL_PASSWORD not configured, dropping mail")
+            return False
+        msg = MIMEMultipart()
+        msg['From'] = EMAIL_ADDRESS
+        msg['To'] = to_addr
+        msg['Subject'] = subject
+        msg.attach(MIMEText(html, 'html'))
+        try:
+            self._queue.put_nowait((to_addr, msg.as_string()))
+        except queue.Full:
+            mail_sent.inc(outcome='dropped')
+            logger.error(f"Mail queue full, dropping mail to {to_addr}")
+            return False
+        self._ensure_sender()
+        return True
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _deliver(self, to_addr, message):
+        for attempt in range(1, MAIL_MAX_ATTEMPTS + 1):
+            try:
+                self._connection.send(EMAIL_ADDRESS, to_addr, message)
+                mail_sent.inc(outcome='sent')
+                return True
+            except Exception as e:
+                # Drop the session; the next attempt reconnects
+                self._connection.close()
+                if attempt == MAIL_MAX_ATTEMPTS:
+                    mail_sent.inc(outcome='failed')
+                    logger.error(f"Failed to send email to {to_addr} after {attempt} attempts: {e}")
+                    return False
+                mail_sent.inc(outcome='retried')
+                logger.warning(f"Sending email to {to_addr} failed (attempt {attempt}): {e}")
+                time.sleep(backoff_delay(attempt))
+
+    def _run(self):
+        while True:
+            try:
+                to_addr, message = self._queue.get(timeout=1)
+            except queue.Empty:
+                if self._connection.idle_for() > MAIL_IDLE_TIMEOUT:
+                    self._connection.close()
+                continue
+            try:
+                self._deliver(to_addr, message)
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout=MAIL_SHUTDOWN_TIMEOUT):
+        """Wait up to ``timeout`` seconds for queued mail to be sent."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._connection.close()
+
+
+mail_queue = MailQueue()
+mail_queue_depth.callback = lambda: {(): mail_queue.depth()}
+atexit.register(mail_queue.flush)
+
+
+def send_reset_code_email(email, code, valid_minutes=3):
+    """Queue the password reset code mail; returns False if it could not be queued."""
+    html = RESET_CODE_TEMPLATE.substitute(code=code, minutes=valid_minutes, year=datetime.now().year)
+    return mail_queue.enqueue(email, RESET_CODE_SUBJECT, html)
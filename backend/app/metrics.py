@@ -0,0 +1,307 @@
+"""In-process Prometheus-style instruments and the ``/metrics`` exposition.
+
+Counters, gauges and histograms are plain Python objects guarded by a lock, so recording
+a sample costs a dict lookup and an addition. Each worker process keeps its own registry;
+scrape every worker (or run one worker per pod) when deploying with several processes.
+"""
+import bisect
+import threading
+import time
+import logging
+
+from flask import Response, g, request
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+SIZE_BUCKETS = (100, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+AUDIO_SECONDS_BUCKETS = (5, 15, 30, 60, 120, 300, 600)
+AUDIO_BYTES_BUCKETS = (50000, 200000, 500000, 1000000, 5000000, 20000000, 50000000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        # Optional callable returning {label_tuple: value}, evaluated at scrape time
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        if self.callback is not None:
+            try:
+                items = list(self.callback().items())
+            except Exception as e:
+                logger.error(f"Gauge {self.name} callback failed: {e}")
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# HTTP
+http_requests = registry.register(Counter(
+    'http_requests_total', 'HTTP requests by route and status.', ('method', 'route', 'status')))
+http_latency = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route.', ('method', 'route')))
+response_bytes = registry.register(Counter(
+    'http_compressed_response_bytes_total', 'Bytes of compressed responses before (identity) and after encoding.',
+    ('encoding',)))
+
+# Database pool
+db_pool_checkouts = registry.register(Counter(
+    'db_pool_checkouts_total', 'Connections checked out of the SQLAlchemy pool.'))
+db_pool_wait = registry.register(Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.', buckets=POOL_WAIT_BUCKETS))
+db_pool_checked_out = registry.register(Gauge(
+    'db_pool_checked_out', 'Connections currently checked out of the pool.'))
+db_pool_connections = registry.register(Counter(
+    'db_pool_connections_created_total', 'New DBAPI connections opened by the pool.'))
+
+# External AI / storage providers
+provider_latency = registry.register(Histogram(
+    'ai_provider_request_duration_seconds', 'External provider call latency.', ('provider', 'outcome')))
+provider_errors = registry.register(Counter(
+    'ai_provider_errors_total', 'External provider calls that failed, by kind.', ('provider', 'kind')))
+provider_timeouts = registry.register(Counter(
+    'ai_provider_timeouts_total', 'External provider calls that timed out.', ('provider',)))
+provider_rejections = registry.register(Counter(
+    'ai_provider_circuit_rejections_total', 'Calls rejected because the circuit was open.', ('provider',)))
+gemini_prompt_chars = registry.register(Histogram(
+    'gemini_prompt_chars', 'Prompt size sent to Gemini, in characters.', ('task',), buckets=SIZE_BUCKETS))
+gemini_response_bytes = registry.register(Histogram(
+    'gemini_response_bytes', 'Response body size returned by Gemini, in bytes.', ('task',),
+    buckets=SIZE_BUCKETS))
+evaluation_parse_failures = registry.register(Counter(
+    'evaluation_parse_failures_total', 'Gemini evaluations that were not valid JSON.', ('mode',)))
+audio_duration = registry.register(Histogram(
+    'audio_duration_seconds', 'Answer audio duration before and after preprocessing.', ('stage',),
+    buckets=AUDIO_SECONDS_BUCKETS))
+audio_bytes = registry.register(Histogram(
+    'audio_bytes', 'Answer audio size before and after preprocessing.', ('stage',),
+    buckets=AUDIO_BYTES_BUCKETS))
+audio_preprocess = registry.register(Counter(
+    'audio_preprocess_total', 'Answer audio preprocessing runs, by outcome.', ('outcome',)))
+storage_uploads = registry.register(Counter(
+    'storage_uploads_total', 'Object storage upload attempts, by backend and outcome.', ('backend', 'outcome')))
+storage_queue_depth = registry.register(Gauge(
+    'storage_upload_queue_depth', 'Uploads queued or in flight on the background storage queue.', ('backend',)))
+mail_sent = registry.register(Counter(
+    'mail_sent_total', 'Outbound mail delivery attempts, by outcome.', ('outcome',)))
+mail_queue_depth = registry.register(Gauge(
+    'mail_queue_depth', 'Messages waiting in the outbound mail queue.'))
+idempotency_requests = registry.register(Counter(
+    'idempotency_requests_total', 'Requests carrying an Idempotency-Key, by outcome.', ('endpoint', 'outcome')))
+conditional_requests = registry.register(Counter(
+    'conditional_requests_total', 'Conditional GETs by endpoint; not_modified ones skipped the view.',
+    ('endpoint', 'outcome')))
+password_hash_duration = registry.register(Histogram(
+    'password_hash_duration_seconds', 'Password hash/verify time including pool queueing.', ('op',)))
+password_hash_rejections = registry.register(Counter(
+    'password_hash_rejections_total', 'Password operations rejected because the hash pool was saturated.',
+    ('op',)))
+
+
+def _circuit_states():
+    from app.resilience import breakers, CircuitBreaker
+    codes = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+    return {(name,): codes[b.state] for name, b in breakers.items()}
+
+
+def _router_counts():
+    from app.gemini_router import get_gemini_router
+    values = {}
+    for key_id, models in get_gemini_router().snapshot()['keys'].items():
+        for model, data in models.items():
+            for result in ('successes', 'errors', 'throttled'):
+                values[(key_id, model, result)] = data[result]
+    return values
+
+
+registry.register(Gauge(
+    'ai_provider_circuit_state', 'Circuit state per provider (0 closed, 1 half-open, 2 open).', ('provider',),
+    callback=_circuit_states))
+registry.register(Gauge(
+    'gemini_router_requests', 'Gemini calls per API key and model, by result.', ('key', 'model', 'result'),
+    callback=_router_counts))
+
+
+def observe_provider_call(provider, seconds, status=None, error=None):
+    """Record one external call; ``status`` is the HTTP status when one was received."""
+    if error is not None:
+        outcome = 'timeout' if 'timeout' in type(error).__name__.lower() else 'error'
+        if outcome == 'timeout':
+            provider_timeouts.inc(provider=provider)
+        provider_errors.inc(provider=provider, kind=type(error).__name__)
+    elif status is not None and status >= 400:
+        outcome = 'throttled' if status == 429 else 'error'
+        provider_errors.inc(provider=provider, kind=f"http_{status}")
+    else:
+        outcome = 'ok'
+    provider_latency.observe(seconds, provider=provider, outcome=outcome)
+
+
+def _instrument_pool(engine):
+    from sqlalchemy import event
+
+    pool = engine.pool
+    original_connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return original_connect()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+    @event.listens_for(pool, 'checkout')
+    def _on_checkout(dbapi_conn, record, proxy):
+        db_pool_checkouts.inc()
+        db_pool_checked_out.inc()
+
+    @event.listens_for(pool, 'checkin')
+    def _on_checkin(dbapi_conn, record):
+        db_pool_checked_out.dec()
+
+    @event.listens_for(pool, 'connect')
+    def _on_connect(dbapi_conn, record):
+        db_pool_connections.inc()
+
+
+def init_metrics(app):
+    """Record HTTP metrics for ``app``, instrument the DB pool and expose ``/metrics``
+    (to ``OPS_TOKEN`` holders and ``OPS_ALLOWED_IPS`` only, see ``app.utils.ops_only``)."""
+    from app.database import engine
+
+    _instrument_pool(engine)
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _metrics_record(response):
+        started = g.get('_metrics_started')
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            http_latency.observe(time.perf_counter() - started, method=request.method, route=route)
+            http_requests.inc(method=request.method, route=route, status=response.status_code)
+        return response
+
+    from app.utils import ops_only
+
+    @app.route('/metrics')
+    @ops_only
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,92 @@
+"""Password reset codes: issue, verify and purge.
+
+Each email has at most one pending code. Verification loads the row by email (the
+primary key prefix) and compares the code with ``hmac.compare_digest``, so neither
+the query nor the comparison depends on how much of the code is right. Rows past
+``expires_at`` are deleted in batches by a background job.
+"""
+import os
+import hmac
+import secrets
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete
+
+from app.database import get_session, PasswordReset
+from app.scheduler import schedule
+
+logger = logging.getLogger(__name__)
+
+RESET_TTL_MINUTES = int(os.getenv("PASSWORD_RESET_TTL_MINUTES", "3"))
+GC_INTERVAL = float(os.getenv("PASSWORD_RESET_GC_INTERVAL", "300"))
+GC_BATCH_SIZE = int(os.getenv("PASSWORD_RESET_GC_BATCH_SIZE", "1000"))
+
+VALID = 'valid'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+
+
+def create_reset(db, email):
+    """Replace any pending code for ``email`` with a new one; returns the code."""
+    db.query(PasswordReset).filter_by(email=email).delete()
+    code = f"{secrets.randbelow(1000000):06d}"
+    db.add(PasswordReset(email=email, token=code,
+                         expires_at=datetime.utcnow() + timedelta(minutes=RESET_TTL_MINUTES)))
+    db.commit()
+    return code
+
+
+def check_reset(db, email, code):
+    """Return VALID, INVALID or EXPIRED for ``code``; an expired code is deleted."""
+    reset = db.query(PasswordReset).filter_by(email=email).first()
+    if reset is None or not hmac.compare_digest(reset.token.encode(), str(code).encode()):
+        return INVALID
+    if reset.expires_at is None or reset.expires_at < datetime.utcnow():
+        db.delete(reset)
+        db.commit()
+        return EXPIRED
+    return VALID
+
+
+def consume_resets(db, email):
+    db.query(PasswordReset).filter_by(email=email).delete()
+
+
+def purge_expired_resets(batch_size=GC_BATCH_SIZE):
+    """Delete expired reset codes in batches; returns the number removed."""
+    now = datetime.utcnow()
+    total = 0
+    while True:
+        db = get_session()
+        try:
+            expired = db.execute(
+                select(PasswordReset.email, PasswordReset.token)
+                .where(PasswordReset.expires_at < now)
+                .limit(batch_size)
+            ).all()
+            if not expired:
+                break
+            # Composite key; select the emails, then delete their expired codes
+            removed = db.execute(
+                delete(PasswordReset)
+                .where(PasswordReset.email.in_([row.email for row in expired]),
+                       PasswordReset.expires_at < now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        total += removed
+        if len(expired) < batch_size:
+            break
+    if total:
+        logger.info(f"Purged {total} expired password reset codes")
+    return total
+
+
+def init_password_resets():
+    schedule('password-reset-gc', GC_INTERVAL, purge_expired_resets, run_immediately=False)
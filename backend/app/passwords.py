@@ -0,0 +1,131 @@
+"""Password hashing on a dedicated, bounded worker pool.
+
+Hashing is deliberately slow, so it never runs on the request thread's critical path
+unbounded: at most ``PASSWORD_HASH_WORKERS`` hashes run at once (threads by default;
+hashlib's scrypt/pbkdf2 release the GIL) and at most ``PASSWORD_HASH_MAX_PENDING``
+requests wait for a worker. A request that cannot get a slot within
+``PASSWORD_HASH_QUEUE_TIMEOUT`` seconds fails fast with 503 instead of piling up.
+
+The algorithm and cost come from ``PASSWORD_HASH_METHOD`` in werkzeug's format
+(``scrypt:32768:8:1``, ``pbkdf2:sha256:600000``). Hashes made with other parameters
+are upgraded on the next successful login.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from flask import jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from app.metrics import password_hash_duration, password_hash_rejections
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# 'process' sidesteps the GIL for hash implementations that hold it
+HASH_POOL = os.getenv("PASSWORD_HASH_POOL", "thread")
+HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(HASH_WORKERS * 4)))
+HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2"))
+
+
+class HashPoolBusy(RuntimeError):
+    """Raised when no hashing slot frees up within ``HASH_QUEUE_TIMEOUT``."""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash, password, method, prefix):
+    """Check ``password``; also return a fresh hash when the stored one is outdated."""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split('$', 1)[0] != prefix:
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+
+class HashPool:
+    def __init__(self, workers=HASH_WORKERS, max_pending=HASH_MAX_PENDING, kind=HASH_POOL):
+        self.workers = workers
+        self.kind = kind
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="password-hash")
+            return self._executor
+
+    def run(self, op, fn, *args):
+        if not self._slots.acquire(timeout=HASH_QUEUE_TIMEOUT):
+            password_hash_rejections.inc(op=op)
+            logger.warning(f"Password hash pool saturated, rejecting {op}")
+            raise HashPoolBusy(f"Password hashing is saturated ({op})")
+        try:
+            started = time.perf_counter()
+            result = self._get_executor().submit(fn, *args).result()
+            password_hash_duration.observe(time.perf_counter() - started, op=op)
+            return result
+        finally:
+            self._slots.release()
+
+
+hash_pool = HashPool()
+_method_prefix = None
+_dummy_hash = None
+
+
+def _prepare():
+    """Compute the method prefix and the dummy hash on the pool (once; also done at init)."""
+    global _method_prefix, _dummy_hash
+    if _method_prefix is None:
+        _method_prefix = hash_pool.run('hash', _hash, '', PASSWORD_HASH_METHOD).split('$', 1)[0]
+    if _dummy_hash is None:
+        _dummy_hash = hash_pool.run('hash', _hash, 'dummy-password', PASSWORD_HASH_METHOD)
+
+
+def method_prefix():
+    """Stored-hash prefix (``scrypt:32768:8:1``) produced by the configured method."""
+    if _method_prefix is None:
+        _prepare()
+    return _method_prefix
+
+
+def hash_password(password):
+    return hash_pool.run('hash', _hash, password, PASSWORD_HASH_METHOD)
+
+
+def verify_password(pwhash, password):
+    """Return ``(ok, new_hash)``; ``new_hash`` is set when the stored hash should be replaced.
+
+    A missing ``pwhash`` (unknown user) is checked against a dummy hash so the response
+    time does not reveal whether the account exists.
+    """
+    if _dummy_hash is None:
+        _prepare()
+    if not pwhash:
+        hash_pool.run('verify', _verify, _dummy_hash, password, PASSWORD_HASH_METHOD, method_prefix())
+        return False, None
+    return hash_pool.run('verify', _verify, pwhash, password, PASSWORD_HASH_METHOD, method_prefix())
+
+
+def init_passwords(app):
+    # Pay for the two reference hashes at startup, not on the first logins
+    _prepare()
+
+    @app.errorhandler(HashPoolBusy)
+    def _hash_pool_busy(e):
+        resp = jsonify({'error': 'Server is busy, please retry'})
+        resp.status_code = 503
+        resp.headers['Retry-After'] = '1'
+        return resp
@@ -0,0 +1,160 @@
+"""Per-request timing breakdown (Server-Timing header) and slow-request profile capture.
+
+Every request accumulates time spent in SQL (SQLAlchemy cursor events), in each external
+provider (recorded by ``app.resilience``) and in JSON serialization. The breakdown is
+returned in a ``Server-Timing`` header.
+
+With ``PROFILE_SAMPLE_RATE`` > 0 a fraction of requests also runs under a profiler
+(pyinstrument if installed, cProfile otherwise); the ones slower than ``PROFILE_SLOW_MS``
+are written to ``PROFILE_DIR``, keeping only the newest ``PROFILE_MAX_FILES``.
+"""
+import os
+import random
+import time
+import logging
+from datetime import datetime
+
+from flask import g, request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+try:
+    import pyinstrument
+except Exception:  # pragma: no cover - optional dependency
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING", "1") != "0"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "1000"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+
+def record_timing(name, seconds, count=1):
+    """Add ``seconds`` to the current request's ``name`` bucket; no-op outside requests."""
+    if not has_request_context():
+        return
+    timings = g.setdefault('_timings', {})
+    total, calls = timings.get(name, (0.0, 0))
+    timings[name] = (total + seconds, calls + count)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default provider that records time spent serializing responses."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_timing('ser', time.perf_counter() - started)
+
+
+def _install_db_hooks(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_query_start')
+        if starts:
+            record_timing('db', time.perf_counter() - starts.pop())
+
+
+def _start_profiler():
+    if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    try:
+        if pyinstrument is not None:
+            profiler = pyinstrument.Profiler(async_mode='disabled')
+            profiler.start()
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+    except ValueError:
+        # Another profiler is already active (cProfile is process-wide on newer Pythons)
+        return None
+    return profiler
+
+
+def _stop_profiler(profiler):
+    if pyinstrument is not None and isinstance(profiler, pyinstrument.Profiler):
+        profiler.stop()
+    else:
+        profiler.disable()
+
+
+def _save_profile(profiler, elapsed_ms):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    endpoint = (request.endpoint or 'unknown').replace('.', '-')
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    base = os.path.join(PROFILE_DIR, f"{stamp}_{request.method}_{endpoint}_{int(elapsed_ms)}ms")
+    if pyinstrument is not None and isinstance(profiler, pyinstrument.Profiler):
+        path = f"{base}.html"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+    else:
+        path = f"{base}.prof"
+        profiler.dump_stats(path)
+    logger.warning(f"Slow request {request.method} {request.path} took {elapsed_ms:.0f}ms, profile saved to {path}")
+    _enforce_retention()
+
+
+def _enforce_retention():
+    try:
+        files = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)]
+        files = sorted((p for p in files if os.path.isfile(p)), key=os.path.getmtime)
+        for path in files[:-PROFILE_MAX_FILES] if len(files) > PROFILE_MAX_FILES else []:
+            os.remove(path)
+    except OSError as e:
+        logger.error(f"Failed to prune profile directory: {e}")
+
+
+def _server_timing_header(timings, total):
+    parts = []
+    for name, (seconds, calls) in sorted(timings.items()):
+        parts.append(f'{name};dur={seconds * 1000:.1f};desc="{calls} call{"s" if calls != 1 else ""}"')
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def init_profiling(app):
+    """Register the timing hooks on ``app`` and the shared engine."""
+    from app.database import engine
+
+    _install_db_hooks(engine)
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_request_timer():
+        g._request_started = time.perf_counter()
+        g._timings = {}
+        g._profiler = _start_profiler()
+
+    @app.after_request
+    def _finish_request_timer(response):
+        started = g.get('_request_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            _stop_profiler(profiler)
+            if elapsed * 1000 >= PROFILE_SLOW_MS:
+                try:
+                    _save_profile(profiler, elapsed * 1000)
+                except Exception as e:
+                    logger.error(f"Failed to save profile: {e}")
+        if SERVER_TIMING_ENABLED:
+            response.headers['Server-Timing'] = _server_timing_header(g.get('_timings') or {}, elapsed)
+        return response
+
+    @app.teardown_request
+    def _stop_dangling_profiler(exc):
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            _stop_profiler(profiler)
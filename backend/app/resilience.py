@@ -0,0 +1,226 @@
+"""Circuit breakers and retry budget for the external providers (Gemini, AssemblyAI, Cloudinary)."""
+import os
+import random
+import threading
+import time
+import logging
+
+import requests
+
+from app.profiling import record_timing
+from app.metrics import observe_provider_call, provider_rejections
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+HALF_OPEN_MAX_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", "1"))
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "4"))
+# Retries may add at most this fraction of extra load on top of first attempts
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_SEC = float(os.getenv("RETRY_BUDGET_MIN_PER_SEC", "1"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Errors worth another attempt; any other exception still counts as a breaker failure
+RETRYABLE_ERRORS = (
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+PROVIDERS = ("gemini", "assemblyai", "cloudinary")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a provider's circuit is open and the call is rejected without trying."""
+
+    def __init__(self, provider):
+        super().__init__(f"{provider} circuit is open, failing fast")
+        self.provider = provider
+
+
+class CircuitBreaker:
+    """Classic closed / open / half-open breaker, counting consecutive failures."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 half_open_max_calls=HALF_OPEN_MAX_CALLS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+            logger.info(f"Circuit {self.name} half-open, probing")
+
+    def allow_request(self):
+        """Return True if a call may go through (reserving a probe slot when half-open)."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit {self.name} closed again")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._half_open_calls = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit {self.name} opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_calls = 0
+
+    def call(self, fn, *args, **kwargs):
+        """Run ``fn`` through the breaker; any exception counts as a failure."""
+        if not self.allow_request():
+            provider_rejections.inc(provider=self.name)
+            raise CircuitOpenError(self.name)
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record_failure()
+            observe_provider_call(self.name, time.perf_counter() - started, error=e)
+            raise
+        finally:
+            record_timing(f"ext-{self.name}", time.perf_counter() - started)
+        observe_provider_call(self.name, time.perf_counter() - started)
+        self.record_success()
+        return result
+
+
+class RetryBudget:
+    """Token bucket shared by all providers so retries cannot multiply load during an outage.
+
+    Every first attempt deposits ``ratio`` tokens, every retry withdraws one. A small
+    per-second allowance keeps retries possible at low traffic.
+    """
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, min_per_sec=RETRY_BUDGET_MIN_PER_SEC, max_tokens=100.0):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens / 10
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last_refill) * self.min_per_sec)
+        self._last_refill = now
+
+    def record_request(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+breakers = {name: CircuitBreaker(name) for name in PROVIDERS}
+retry_budget = RetryBudget()
+
+
+def get_breaker(provider):
+    return breakers[provider]
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Full-jitter exponential backoff for the given retry number (1-based)."""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+def resilient_request(provider, method, url, max_attempts=None, **kwargs):
+    """Issue an HTTP request to ``provider`` guarded by its breaker and the retry budget.
+
+    Exceptions and 5xx responses count as breaker failures, so every allowed call
+    records an outcome (a half-open probe slot is always released). Timeouts, connection
+    and truncated-body errors, 5xx and 429 are retried with jittered backoff while the
+    budget allows. The last response is returned as-is so callers keep their own status
+    handling, and the last exception is re-raised when no response was obtained.
+    """
+    breaker = breakers[provider]
+    attempts = max_attempts or RETRY_MAX_ATTEMPTS
+    retry_budget.record_request()
+
+    attempt = 0
+    while True:
+        attempt += 1
+        if not breaker.allow_request():
+            provider_rejections.inc(provider=provider)
+            raise CircuitOpenError(provider)
+
+        resp, error = None, None
+        started = time.perf_counter()
+        try:
+            resp = requests.request(method, url, **kwargs)
+        except Exception as e:
+            error = e
+        finally:
+            elapsed = time.perf_counter() - started
+            record_timing(f"ext-{provider}", elapsed)
+        observe_provider_call(provider, elapsed, status=resp.status_code if resp is not None else None, error=error)
+
+        if error is not None or resp.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        if error is not None:
+            retryable = isinstance(error, RETRYABLE_ERRORS)
+        else:
+            retryable = resp.status_code in RETRYABLE_STATUS
+        if not retryable:
+            if error is not None:
+                raise error
+            return resp
+        if attempt >= attempts or not retry_budget.try_acquire():
+            if error is not None:
+                raise error
+            return resp
+
+        delay = backoff_delay(attempt)
+        if resp is not None and resp.headers.get("Retry-After", "").isdigit():
+            delay = max(delay, min(float(resp.headers["Retry-After"]), RETRY_MAX_DELAY))
+        logger.warning(
+            f"{provider} call failed ({error or resp.status_code}), retry {attempt}/{attempts - 1} in {delay:.2f}s"
+        )
+        time.sleep(delay)
@@ -1,114 +1,22 @@
-from datetime import datetime, timedelta, timezone
-import os
-import secrets
-import smtplib
-import jwt
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from flask import Blueprint, request, jsonify, current_app
-from werkzeug.security import generate_password_hash, check_password_hash
-
-from app.database import get_session, User, PasswordReset
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify
+from sqlalchemy import update
+
+from app.database import get_session, User
+from app.passwords import hash_password, verify_password
+from app.tokens import (
+    issue_tokens, rotate_refresh_token, revoke_refresh_token, revoke_user_tokens, InvalidRefreshToken,
+)
 from app.utils import token_required
+from app.mailer import send_reset_code_email
+from app.password_resets import create_reset, check_reset, consume_resets, RESET_TTL_MINUTES, EXPIRED, INVALID
 
 
-EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
-EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
-
-
-def send_reset_code_email(email, code):
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = email
-        msg['Subject'] = "🔐 PrepTalk - Reset Your Password"
-
-        body = f"""
-        <html>
-        <head>
-            <style>
-                body {{
-                    font-family: 'Inter', Arial, sans-serif;
-                    background-color: #111827;
-                    color: #F9FAFB;
-                    padding: 20px;
-                    text-align: center;
-                }}
-                .container {{
-                    background-color: #1F2937;
-                    padding: 30px;
-                    border-radius: 10px;
-                    width: 80%;
-                    margin: auto;
-                }}
-                h2 {{
-                    color: #6D28D9;
-                    margin-bottom: 16px;
-                }}
-                p {{
-                    font-size: 16px;
-                    color: #D1D5DB;
-                    margin: 8px 0;
-                }}
-                .code {{
-                    font-size: 24px;
-                    font-weight: bold;
-                    color: #F9FAFB;
-                    background: #111827;
-                    padding: 10px 20px;
-                    border: 2px dashed #6D28D9;
-                    border-radius: 8px;
-                    display: inline-block;
-                    margin: 16px 0;
-                }}
-                .divider {{
-                    margin-top: 24px;
-                    border: none;
-                    border-top: 1px solid #374151;
-                }}
-                .footer {{
-                    margin-top: 20px;
-                    font-size: 14px;
-                    color: #9CA3AF;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>🔐 Reset Your Password</h2>
-                <p>Hello,</p>
-                <p>You requested to reset your password on <strong>PrepTalk</strong>. Use the code below to proceed:</p>
-                <div class="code">{code}</div>
-                <p>This code is valid for <strong>3 minutes</strong>.</p>
-                <p>If you did not request this, please ignore this email.</p>
-                <hr class="divider"/>
-                <p class="footer">© {datetime.now().year} PrepTalk. All rights reserved.</p>
-            </div>
-        </body>
-        </html>
-        """
-
-        msg.attach(MIMEText(body, 'html'))
-
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_ADDRESS, email, msg.as_string())
-
-        return True
-    except Exception as e:
-        print(f"Failed to send email: {str(e)}")
-        return False
-
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 
-def create_access_token(user_id):
-    return jwt.encode(
-        {'id': user_id, 'exp': datetime.now(timezone.utc) + timedelta(hours=1)},
-        current_app.config['SECRET_KEY'],
-        algorithm='HS256',
-    )
+def avatar_variants(user):
+    return user.avatar_variants or {}
 
 
 def serialize_user(user):
@@ -117,6 +25,7 @@ def serialize_user(user):
         'full_name': user.full_name,
         'email': user.email,
         'avatar_url': user.avatar_url,
+        'avatar_variants': avatar_variants(user),
         'profession': user.profession,
         'experience_level': user.experience_level,
     }
@@ -130,6 +39,8 @@ def register():
     if not full_name or not email or not password:
         return jsonify({'error': 'Missing name, email, or password'}), 400
 
+    # Hash before taking a DB connection so it is not held for the hashing time
+    password_hash = hash_password(password)
     session = get_session()
     try:
         if session.query(User).filter_by(email=email).first():
@@ -137,12 +48,12 @@ def register():
         user = User(
             full_name=full_name,
             email=email,
-            password_hash=generate_password_hash(password),
+            password_hash=password_hash,
         )
         session.add(user)
         session.commit()
-        token = create_access_token(user.id)
-        return jsonify({'token': token, 'user': serialize_user(user)}), 201
+        tokens = issue_tokens(session, user.id)
+        return jsonify({**tokens, 'user': serialize_user(user)}), 201
     finally:
         session.close()
 
@@ -158,10 +69,21 @@ def login():
     session = get_session()
     try:
         user = session.query(User).filter_by(email=email).first()
-        if user and check_password_hash(user.password_hash, password):
-            token = create_access_token(user.id)
-            return jsonify({'token': token, 'user': serialize_user(user)}), 200
+    finally:
+        # Return the pooled connection before waiting on the hash pool
+        session.close()
+
+    ok, new_hash = verify_password(user.password_hash if user else None, password)
+    if not ok:
         return jsonify({'error': 'Invalid credentials'}), 401
+
+    session = get_session()
+    try:
+        if new_hash:
+            # Hashed with older parameters; upgrade while we have the plaintext
+            session.execute(update(User).where(User.id == user.id).values(password_hash=new_hash))
+        tokens = issue_tokens(session, user.id)
+        return jsonify({**tokens, 'user': serialize_user(user)}), 200
     finally:
         session.close()
 
@@ -181,7 +103,7 @@ def login_google():
             user = User(
                 full_name=full_name,
                 email=email,
-                password_hash=generate_password_hash(''),
+                password_hash=hash_password(''),
                 provider='google',
                 provider_id=provider_id,
                 email_verified_at=datetime.now(timezone.utc),
@@ -192,8 +114,7 @@ def login_google():
             user.provider = 'google'
             user.provider_id = provider_id
             session.commit()
-        token = create_access_token(user.id)
-        return jsonify({'token': token}), 200
+        return jsonify(issue_tokens(session, user.id)), 200
     finally:
         session.close()
 
@@ -209,12 +130,10 @@ def forgot_password():
         user = session.query(User).filter_by(email=email).first()
         if not user:
             return jsonify({'error': 'User not found'}), 404
-        session.query(PasswordReset).filter_by(email=email).delete()
-        token = f"{secrets.randbelow(1000000):06d}"
-        session.add(PasswordReset(email=email, token=token))
-        session.commit()
+        token = create_reset(session, email)
 
-        if not send_reset_code_email(email, token):
+        # Only queued here; the background sender delivers it
+        if not send_reset_code_email(email, token, RESET_TTL_MINUTES):
             return jsonify({'error': 'Failed to send email'}), 500
 
         return jsonify({'message': 'Reset token sent'}), 200
@@ -233,24 +152,56 @@ def reset_password():
 
     session = get_session()
     try:
-        reset = session.query(PasswordReset).filter_by(email=email, token=token).first()
-        if not reset:
+        status = check_reset(session, email, token)
+        if status == INVALID:
             return jsonify({'error': 'Invalid token'}), 400
-        if datetime.utcnow() - reset.created_at > timedelta(minutes=3):
-            session.query(PasswordReset).filter_by(email=email, token=token).delete()
-            session.commit()
+        if status == EXPIRED:
             return jsonify({'error': 'Token expired'}), 400
         user = session.query(User).filter_by(email=email).first()
         if not user:
             return jsonify({'error': 'User not found'}), 404
-        user.password_hash = generate_password_hash(new_password)
-        session.query(PasswordReset).filter_by(email=email).delete()
+        user.password_hash = hash_password(new_password)
+        revoke_user_tokens(session, user.id)
+        consume_resets(session, email)
         session.commit()
         return jsonify({'message': 'Password reset successful'}), 200
     finally:
         session.close()
 
 
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    """Exchange a refresh token for a new access/refresh pair without a password check."""
+    data = request.get_json(force=True)
+    refresh_token = data.get('refresh_token')
+    if not refresh_token:
+        return jsonify({'error': 'Missing refresh token'}), 400
+
+    session = get_session()
+    try:
+        return jsonify(rotate_refresh_token(session, refresh_token)), 200
+    except InvalidRefreshToken:
+        return jsonify({'error': 'Invalid refresh token'}), 401
+    finally:
+        session.close()
+
+
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    """Revoke the refresh token (and its rotations) held by this device."""
+    data = request.get_json(force=True)
+    refresh_token = data.get('refresh_token')
+    if not refresh_token:
+        return jsonify({'error': 'Missing refresh token'}), 400
+
+    session = get_session()
+    try:
+        revoke_refresh_token(session, refresh_token)
+        return jsonify({'message': 'Logged out'}), 200
+    finally:
+        session.close()
+
+
 @auth_bp.route('/me', methods=['GET'])
 @token_required
 def me(current_user):
@@ -259,6 +210,7 @@ def me(current_user):
         'name': current_user.full_name,
         'email': current_user.email,
         'avatar_url': current_user.avatar_url,
+        'avatar_variants': avatar_variants(current_user),
         'profession': current_user.profession,
         'experience_level': current_user.experience_level,
     })
\ No newline at end of file
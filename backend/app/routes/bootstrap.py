@@ -0,0 +1,57 @@
+import logging
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+from sqlalchemy import select, func
+
+from app.database import get_session, QuestionNote
+from app.utils import token_required
+from app.conditional import conditional_get
+from app.routes.auth import serialize_user
+from app.routes.interviews.overview import session_aggregates, history_item, history_summary, user_stats
+
+logger = logging.getLogger(__name__)
+
+bootstrap_bp = Blueprint('bootstrap', __name__)
+
+DEFAULT_HISTORY_LIMIT = 10
+MAX_HISTORY_LIMIT = 50
+
+
+@bootstrap_bp.route('/bootstrap', methods=['GET'])
+@token_required
+@conditional_get('user', refresh_every=3600)
+def bootstrap(current_user):
+    """Everything the home and progress screens need on launch, in one response.
+
+    Replaces ``/auth/me`` + ``/interviews/history`` + ``/interviews/stats`` + the saved
+    count: the profile comes from the authenticated user, history and stats from one
+    aggregate query, the saved count from one COUNT. An unchanged snapshot is answered
+    with 304 before any of that runs.
+
+    Query params: ``history_limit`` (default 10, max 50) items of history.
+    """
+    limit = min(max(request.args.get('history_limit', DEFAULT_HISTORY_LIMIT, type=int), 1), MAX_HISTORY_LIMIT)
+    db = get_session()
+    try:
+        rows = session_aggregates(db, current_user.id)
+        saved_count = db.execute(
+            select(func.count()).select_from(QuestionNote).where(QuestionNote.user_id == current_user.id)
+        ).scalar_one()
+    except Exception as e:
+        logger.error(f"❌ Error building bootstrap for user {current_user.id}: {e}")
+        return jsonify({'error': 'Không thể tải dữ liệu'}), 500
+    finally:
+        db.close()
+
+    now = datetime.utcnow()
+    return jsonify({
+        'user': serialize_user(current_user),
+        'history': {
+            'items': [history_item(session, count, score, now) for session, count, score in rows[:limit]],
+            'has_more': len(rows) > limit,
+            'stats': history_summary(rows, now),
+        },
+        'stats': user_stats(rows),
+        'saved_count': saved_count,
+    })
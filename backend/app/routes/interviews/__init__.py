@@ -2,10 +2,12 @@ from flask import Blueprint
 from .session_routes import session_bp
 from .question_routes import question_bp
 from .answer_routes import answer_bp
+from .upload_routes import upload_bp
 from .history_routes import history_bp
 from .stats_routes import stats_bp
 from .note_routes import note_bp
 from .chat_routes import chat_bp
+from .search_routes import search_bp
 
 # Tạo blueprint chính
 interviews_bp = Blueprint('interviews', __name__, url_prefix='/interviews')
@@ -14,10 +16,12 @@ interviews_bp = Blueprint('interviews', __name__, url_prefix='/interviews')
 interviews_bp.register_blueprint(session_bp)
 interviews_bp.register_blueprint(question_bp)
 interviews_bp.register_blueprint(answer_bp)
+interviews_bp.register_blueprint(upload_bp)
 interviews_bp.register_blueprint(history_bp)
 interviews_bp.register_blueprint(stats_bp)
 interviews_bp.register_blueprint(note_bp)
 interviews_bp.register_blueprint(chat_bp)
+interviews_bp.register_blueprint(search_bp)
 
 
 
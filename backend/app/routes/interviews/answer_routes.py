@@ -5,40 +5,32 @@ from datetime import datetime
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 
-try:
-    import cloudinary
-    import cloudinary.uploader
-except Exception as e:
-    logging.warning(f"Cloudinary not available: {e}")
-    cloudinary = None
-
 from app.database import get_session, InterviewSession, InterviewQuestion, InterviewAnswer
 from app.utils import token_required
-from .utils import evaluate_audio_answer, evaluate_text_answer
+from app.idempotency import idempotent
+from app.storage import get_storage
+from .utils import evaluate_text_answer
+from .answer_service import (
+    AUDIO_FOLDER, MAX_AUDIO_SIZE, answer_evaluation, process_answer_audio, store_answer,
+)
 
 logger = logging.getLogger(__name__)
 answer_bp = Blueprint('answer', __name__)
 
-# Cloudinary configuration
-Cloud_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
-Cloud_API_KEY = os.getenv("CLOUDINARY_API_KEY")
-Cloud_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
-Cloud_FOLDER = os.getenv("CLOUDINARY_AUDIO_FOLDER", "interview-audio")
 
-if cloudinary and Cloud_NAME and Cloud_API_KEY and Cloud_API_SECRET:
-    try:
-        cloudinary.config(
-            cloud_name=Cloud_NAME,
-            api_key=Cloud_API_KEY,
-            api_secret=Cloud_API_SECRET,
-            secure=True,
-        )
-        logger.info("Cloudinary configured successfully")
-    except Exception as e:
-        logger.error(f"Failed to configure Cloudinary: {e}")
+def _existing_answer_response(answer, interview_session):
+    """Response for a question that already has a stored answer (client retry)."""
+    return jsonify({
+        'audio_url': answer.user_answer_audio_url,
+        'evaluation': answer_evaluation(answer),
+        'message': 'Câu hỏi này đã được trả lời',
+        'next_question_available': interview_session.questions_asked < interview_session.question_limit
+    })
+
 
 @answer_bp.route('/<int:session_id>/answer', methods=['POST'])
 @token_required
+@idempotent
 def submit_answer(current_user, session_id):
     """Upload user's audio answer and evaluate with AI."""
     logger.info(f"🎤 Starting audio answer submission for session {session_id} by user {current_user.id}")
@@ -79,47 +71,31 @@ def submit_answer(current_user, session_id):
 
         logger.info(f"✅ Question validation passed: {question_id}")
 
+        # A retried submission must not upload, transcribe and score the same answer again
+        existing = db.query(InterviewAnswer).filter_by(session_id=session_id, question_id=question_id).first()
+        if existing:
+            logger.info(f"↩️ Question {question_id} already answered, returning stored answer {existing.id}")
+            return _existing_answer_response(existing, interview_session)
+
         audio_url = None
+        audio_meta = None
         eval_json = {}
         question_text = question.content if question else ''
 
         if audio_file:
-            if not cloudinary or not Cloud_NAME:
-                logger.warning("Cloudinary not configured")
-                return jsonify({'error': 'Cloudinary chưa được cấu hình'}), 500
             try:
-                if not audio_file.filename:
-                    logger.warning("Audio file has no filename")
-                else:
-                    audio_file.seek(0, 2)
-                    file_size = audio_file.tell()
-                    audio_file.seek(0)
-
-                    if file_size > 50 * 1024 * 1024:
-                        logger.warning(f"Audio file too large: {file_size} bytes")
-                        return jsonify({'error': 'File audio quá lớn (tối đa 50MB)'}), 400
-
-                    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-                    public_id = f"answer_{session_id}_{question_id}_{timestamp}_{uuid.uuid4().hex[:8]}"
-
-                    logger.info(f"Uploading audio to Cloudinary: {public_id} ({file_size} bytes)")
-
-                    upload_result = cloudinary.uploader.upload(
-                        audio_file,
-                        resource_type="video",
-                        folder=Cloud_FOLDER,
-                        public_id=public_id,
-                        overwrite=True,
-                    )
-
-                    audio_url = upload_result.get('secure_url') or upload_result.get('url')
-                    if not audio_url:
-                        logger.error("❌ Cloudinary upload returned no URL")
-                        return jsonify({'error': 'Upload audio thất bại'}), 500
-                    logger.info(f"✅ Audio uploaded to Cloudinary: {audio_url}")
-
-                logger.info(f"🎯 Starting evaluation for question ID: {question_id}")
-                eval_json = evaluate_audio_answer(question_text, audio_url)
+                audio_file.seek(0, 2)
+                file_size = audio_file.tell()
+                audio_file.seek(0)
+
+                if file_size > MAX_AUDIO_SIZE:
+                    logger.warning(f"Audio file too large: {file_size} bytes")
+                    return jsonify({'error': 'File audio quá lớn (tối đa 50MB)'}), 400
+
+                logger.info(f"🎯 Processing answer audio for question ID: {question_id} ({file_size} bytes)")
+                audio_url, audio_meta, eval_json = process_answer_audio(
+                    audio_file, session_id, question_id, question_text
+                )
                 logger.info("✅ Gemini evaluation completed successfully")
             except Exception as e:
                 logger.error(f"❌ Error handling audio submission: {e}")
@@ -144,33 +120,9 @@ def submit_answer(current_user, session_id):
 
         logger.info("💾 Saving evaluation results to database...")
         
-        # Extract and log scores
-        overall_score = float(eval_json.get('score') or 0)
-        speaking_score = float((eval_json.get('breakdown') or {}).get('speaking') or 0)
-        content_score = float((eval_json.get('breakdown') or {}).get('content') or 0)
-        relevance_score = float((eval_json.get('breakdown') or {}).get('relevance') or 0)
-        
-        logger.info(f"📊 Scores to save:")
-        logger.info(f"   ⭐ Overall: {overall_score}")
-        logger.info(f"   🗣️ Speaking: {speaking_score}")
-        logger.info(f"   📚 Content: {content_score}")
-        logger.info(f"   🎯 Relevance: {relevance_score}")
-        
-        answer = InterviewAnswer(
-            session_id=session_id,
-            question_id=question_id,
-            feedback=eval_json.get('feedback') or None,
-            score=overall_score,
-            user_answer_audio_url=audio_url,
-            transcript_text=eval_json.get('transcript') or None,
-            speaking_score=speaking_score,
-            content_score=content_score,
-            relevance_score=relevance_score,
-            strengths=eval_json.get('strengths') or [],
-            improvements=eval_json.get('improvements') or [],
-        )
-        db.add(answer)
-        db.commit()
+        answer, created = store_answer(db, session_id, question_id, eval_json, audio_url, audio_meta)
+        if not created:
+            return _existing_answer_response(answer, interview_session)
         logger.info(f"✅ Answer saved to database successfully")
 
         response_data = {
@@ -236,13 +188,11 @@ def get_questions_answers(current_user, session_id):
 
 @answer_bp.route('/test-audio-upload', methods=['POST'])
 def test_audio_upload():
-    """Test endpoint để kiểm tra upload audio vào Cloudinary"""
+    """Test endpoint để kiểm tra upload audio vào storage backend"""
     try:
         audio_file = request.files.get('audio')
         if not audio_file:
             return jsonify({'error': 'Không có file audio được gửi'}), 400
-        if not cloudinary or not (Cloud_NAME and Cloud_API_KEY and Cloud_API_SECRET):
-            return jsonify({'error': 'Cloudinary chưa được cấu hình'}), 500
 
         # Validate file
         if not audio_file.filename:
@@ -252,32 +202,26 @@ def test_audio_upload():
         audio_file.seek(0, 2)
         file_size = audio_file.tell()
         audio_file.seek(0)
-        if file_size > 50 * 1024 * 1024:  # 50MB
+        if file_size > MAX_AUDIO_SIZE:
             return jsonify({'error': f'File quá lớn: {file_size} bytes'}), 400
 
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        public_id = f"test_audio_{timestamp}_{uuid.uuid4().hex[:8]}"
-        logger.info(f"Testing Cloudinary audio upload: {public_id} ({file_size} bytes)")
-
-        result = cloudinary.uploader.upload(
-            audio_file,
-            resource_type="video",
-            folder=Cloud_FOLDER,
-            public_id=public_id,
-            overwrite=True,
-        )
-        audio_url = result.get('secure_url') or result.get('url')
-        if not audio_url:
-            return jsonify({'error': 'Upload thất bại - không có URL trả về'}), 500
+        ext = os.path.splitext(secure_filename(audio_file.filename))[1].lower() or '.m4a'
+        key = f"{AUDIO_FOLDER}/test_audio_{timestamp}_{uuid.uuid4().hex[:8]}{ext}"
+        storage = get_storage()
+        logger.info(f"Testing {storage.name} audio upload: {key} ({file_size} bytes)")
+
+        # Upload inline so errors surface in the response
+        audio_url = storage.save(key, audio_file, wait=True)
 
         return jsonify({
             'success': True,
             'message': 'Upload audio thành công',
-            'public_id': result.get('public_id'),
+            'public_id': key,
             'file_size': file_size,
             'audio_url': audio_url,
-            'duration': result.get('duration'),
-            'format': result.get('format'),
+            'storage': storage.name,
+            'format': ext.lstrip('.'),
         }), 200
     except Exception as e:
         logger.error(f"Error in test audio upload: {e}")
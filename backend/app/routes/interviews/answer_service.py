@@ -0,0 +1,400 @@
+"""Answer processing pipeline shared by the one-shot and the resumable upload endpoints:
+preprocess and store the recording, transcribe and evaluate it, and store the answer.
+
+Resumable uploads keep their bytes in ``AUDIO_UPLOAD_DIR`` until the final chunk
+arrives; processing then runs on a worker pool and the temp file is removed.
+Processing is claimed as a lease: an upload left ``processing`` by a dead worker is
+submitted again once ``AUDIO_UPLOAD_PROCESSING_LEASE`` seconds have passed.
+Uploads untouched for ``AUDIO_UPLOAD_EXPIRY`` seconds are garbage-collected.
+"""
+import os
+import time
+import uuid
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, update, delete, and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from app.database import get_session, InterviewAnswer, InterviewQuestion, AudioUpload
+from app.audio_processing import prepared_audio
+from app.storage import get_storage
+from app.scheduler import schedule
+from .utils import evaluate_audio_answer
+
+logger = logging.getLogger(__name__)
+
+AUDIO_FOLDER = os.getenv("CLOUDINARY_AUDIO_FOLDER", "interview-audio")
+MAX_AUDIO_SIZE = 50 * 1024 * 1024
+UPLOAD_DIR = os.getenv("AUDIO_UPLOAD_DIR") or os.path.join(tempfile.gettempdir(), "interview-uploads")
+UPLOAD_EXPIRY = float(os.getenv("AUDIO_UPLOAD_EXPIRY", "86400"))
+UPLOAD_GC_INTERVAL = float(os.getenv("AUDIO_UPLOAD_GC_INTERVAL", "600"))
+# A PATCH silent for longer than this (no heartbeat) is assumed dead and the upload is released
+RECEIVE_TIMEOUT = float(os.getenv("AUDIO_UPLOAD_RECEIVE_TIMEOUT", "300"))
+# A receiving PATCH refreshes updated_at this often while bytes keep arriving
+HEARTBEAT_INTERVAL = RECEIVE_TIMEOUT / 5
+CHUNK_READ_SIZE = 64 * 1024
+# An upload processing for longer than this belongs to a dead worker and is submitted again
+PROCESSING_LEASE = float(os.getenv("AUDIO_UPLOAD_PROCESSING_LEASE", "600"))
+
+UPLOADING = 'uploading'
+RECEIVING = 'receiving'
+PROCESSING = 'processing'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+_answer_executor = ThreadPoolExecutor(max_workers=int(os.getenv("ANSWER_WORKERS", "2")),
+                                      thread_name_prefix="answer")
+
+
+def _audio_extension(audio, audio_meta, filename=None):
+    if audio_meta.get('processed'):
+        return '.ogg'
+    filename = filename or getattr(audio, 'filename', None) or (audio if isinstance(audio, str) else '')
+    ext = os.path.splitext(filename)[1].lower()
+    return ext if ext and ext != '.part' else '.m4a'
+
+
+def process_answer_audio(audio, session_id, question_id, question_text, filename=None, host_url=None):
+    """Preprocess, store and transcribe/evaluate a recording (path or file object).
+
+    Returns ``(audio_url, audio_meta, eval_json)``. The storage upload is queued; the URL
+    is final immediately and transcription reads the local bytes. Outside a request,
+    ``host_url`` is the request host the recording arrived through.
+    """
+    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    with prepared_audio(audio) as (source, audio_meta):
+        key = (f"{AUDIO_FOLDER}/answer_{session_id}_{question_id}_{timestamp}_{uuid.uuid4().hex[:8]}"
+               f"{_audio_extension(audio, audio_meta, filename)}")
+        audio_url = get_storage().save(key, source, host_url=host_url)
+        logger.info(f"✅ Audio stored: {audio_url}")
+        eval_json = evaluate_audio_answer(question_text, audio_url, audio_file=source)
+    return audio_url, audio_meta, eval_json
+
+
+def store_answer(db, session_id, question_id, eval_json, audio_url, audio_meta=None):
+    """Insert the evaluated answer; returns ``(answer, created)``.
+
+    ``created`` is False when the question already had an answer (retry or concurrent
+    submission), in which case the stored answer is returned.
+    """
+    overall_score = float(eval_json.get('score') or 0)
+    speaking_score = float((eval_json.get('breakdown') or {}).get('speaking') or 0)
+    content_score = float((eval_json.get('breakdown') or {}).get('content') or 0)
+    relevance_score = float((eval_json.get('breakdown') or {}).get('relevance') or 0)
+
+    logger.info(f"📊 Scores to save:")
+    logger.info(f"   ⭐ Overall: {overall_score}")
+    logger.info(f"   🗣️ Speaking: {speaking_score}")
+    logger.info(f"   📚 Content: {content_score}")
+    logger.info(f"   🎯 Relevance: {relevance_score}")
+
+    answer = InterviewAnswer(
+        session_id=session_id,
+        question_id=question_id,
+        feedback=eval_json.get('feedback') or None,
+        score=overall_score,
+        user_answer_audio_url=audio_url,
+        transcript_text=eval_json.get('transcript') or None,
+        speaking_score=speaking_score,
+        content_score=content_score,
+        relevance_score=relevance_score,
+        strengths=eval_json.get('strengths') or [],
+        improvements=eval_json.get('improvements') or [],
+        audio_meta=audio_meta,
+    )
+    db.add(answer)
+    try:
+        db.commit()
+        return answer, True
+    except IntegrityError:
+        # A concurrent submission for the same question won the race
+        db.rollback()
+        existing = db.query(InterviewAnswer).filter_by(session_id=session_id, question_id=question_id).first()
+        logger.info(f"↩️ Duplicate answer for question {question_id}, returning stored answer")
+        return existing, False
+
+
+def answer_evaluation(answer):
+    """Evaluation dict of a stored answer, same shape as the Gemini evaluation."""
+    return {
+        'transcript': answer.transcript_text or '',
+        'score': answer.score,
+        'breakdown': {
+            'speaking': answer.speaking_score,
+            'content': answer.content_score,
+            'relevance': answer.relevance_score,
+        },
+        'feedback': answer.feedback or '',
+        'strengths': answer.strengths or [],
+        'improvements': answer.improvements or [],
+    }
+
+
+def upload_path(upload_id):
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+
+def create_upload(db, user_id, session_id, question_id, total_size, filename=None, host_url=None):
+    """Register a resumable upload and create its empty temp file."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    upload = AudioUpload(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        session_id=session_id,
+        question_id=question_id,
+        filename=filename,
+        total_size=total_size,
+        upload_offset=0,
+        status=UPLOADING,
+        host_url=host_url,
+    )
+    open(upload_path(upload.id), 'wb').close()
+    db.add(upload)
+    db.commit()
+    return upload
+
+
+def claim_upload(db, upload_id, offset):
+    """Mark the upload as receiving if it is idle at ``offset``; returns the claim id if
+    this request owns it now, else None."""
+    claim_id = uuid.uuid4().hex
+    claimed = db.execute(
+        update(AudioUpload)
+        .where(AudioUpload.id == upload_id, AudioUpload.status == UPLOADING,
+               AudioUpload.upload_offset == offset)
+        .values(status=RECEIVING, claim_id=claim_id, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return claim_id if claimed == 1 else None
+
+
+def _heartbeat(upload_id, claim_id):
+    """Refresh the receiving claim; False if it was released (e.g. by the garbage collector)."""
+    db = get_session()
+    try:
+        alive = db.execute(
+            update(AudioUpload)
+            .where(AudioUpload.id == upload_id, AudioUpload.status == RECEIVING,
+                   AudioUpload.claim_id == claim_id)
+            .values(updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return alive == 1
+    finally:
+        db.close()
+
+
+def write_chunk(upload_id, claim_id, offset, stream, max_bytes):
+    """Write request body bytes at ``offset``; returns how many were written.
+
+    A client that disconnects midway keeps the bytes received so far, so it can resume
+    from the new offset instead of restarting. Writing stops if the claim is lost.
+    """
+    written = 0
+    last_beat = time.monotonic()
+    with open(upload_path(upload_id), 'r+b') as fh:
+        fh.seek(offset)
+        # Drop bytes past the acknowledged offset left by an interrupted PATCH
+        fh.truncate()
+        try:
+            while written < max_bytes:
+                chunk = stream.read(min(CHUNK_READ_SIZE, max_bytes - written))
+                if not chunk:
+                    break
+                fh.write(chunk)
+                written += len(chunk)
+                if time.monotonic() - last_beat >= HEARTBEAT_INTERVAL:
+                    if not _heartbeat(upload_id, claim_id):
+                        logger.warning(f"Upload {upload_id} claim lost after {written} bytes, stopping")
+                        break
+                    last_beat = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Upload {upload_id} interrupted after {written} bytes: {e}")
+        fh.flush()
+        os.fsync(fh.fileno())
+    return written
+
+
+def release_upload(db, upload_id, claim_id, new_offset, complete):
+    """Record the new offset if this request still owns the upload; True on success."""
+    released = db.execute(
+        update(AudioUpload)
+        .where(AudioUpload.id == upload_id, AudioUpload.status == RECEIVING,
+               AudioUpload.claim_id == claim_id)
+        .values(upload_offset=new_offset, status=PROCESSING if complete else UPLOADING, claim_id=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return released == 1
+
+
+def discard_upload(db, upload):
+    _remove_file(upload.id)
+    db.delete(upload)
+    db.commit()
+
+
+def _remove_file(upload_id):
+    try:
+        os.remove(upload_path(upload_id))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Could not remove upload file {upload_id}: {e}")
+
+
+def _lease_expired(now):
+    """Processing uploads nobody holds a live lease on."""
+    cutoff = now - timedelta(seconds=PROCESSING_LEASE)
+    return and_(
+        AudioUpload.status == PROCESSING,
+        or_(AudioUpload.claimed_at < cutoff,
+            and_(AudioUpload.claimed_at.is_(None), AudioUpload.updated_at < cutoff)),
+    )
+
+
+def _claim_processing(db, upload_id):
+    """Take the processing lease of an upload that is unclaimed or whose lease expired;
+    returns the claim timestamp if we own it now, else None."""
+    now = datetime.utcnow()
+    claimed = db.execute(
+        update(AudioUpload)
+        .where(AudioUpload.id == upload_id, AudioUpload.status == PROCESSING,
+               or_(AudioUpload.claimed_at.is_(None), _lease_expired(now)))
+        .values(claimed_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return now if claimed == 1 else None
+
+
+def _finish_processing(db, upload_id, claimed_at, **values):
+    """Store the outcome unless the lease was taken over meanwhile; True if stored."""
+    finished = db.execute(
+        update(AudioUpload)
+        .where(AudioUpload.id == upload_id, AudioUpload.status == PROCESSING,
+               AudioUpload.claimed_at == claimed_at)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return finished == 1
+
+
+def process_upload(upload_id):
+    """Upload, evaluate and store a fully received recording.
+
+    A second worker reclaiming an expired lease at worst evaluates the recording twice:
+    ``store_answer`` keeps one answer per question, and only the lease holder updates the
+    upload and removes its temp file.
+    """
+    db = get_session()
+    try:
+        claimed_at = _claim_processing(db, upload_id)
+        if claimed_at is None:
+            return
+        upload = db.get(AudioUpload, upload_id)
+        question = db.get(InterviewQuestion, upload.question_id)
+        try:
+            audio_url, audio_meta, eval_json = process_answer_audio(
+                upload_path(upload_id), upload.session_id, upload.question_id,
+                question.content if question else '', filename=upload.filename, host_url=upload.host_url,
+            )
+            answer, _ = store_answer(db, upload.session_id, upload.question_id, eval_json, audio_url,
+                                     audio_meta)
+            finished = _finish_processing(db, upload_id, claimed_at, status=COMPLETED, answer_id=answer.id)
+            logger.info(f"✅ Processed upload {upload_id} into answer {answer.id}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ Processing upload {upload_id} failed: {e}")
+            finished = _finish_processing(db, upload_id, claimed_at, status=FAILED, error=str(e)[:1000])
+        if finished:
+            _remove_file(upload_id)
+        else:
+            logger.warning(f"Upload {upload_id} processing lease was taken over, leaving it to the new owner")
+    finally:
+        db.close()
+
+
+def _process_in_background(upload_id):
+    try:
+        process_upload(upload_id)
+    except Exception as e:
+        logger.error(f"Background processing of upload {upload_id} failed: {e}")
+
+
+def submit_upload(upload_id):
+    _answer_executor.submit(_process_in_background, upload_id)
+
+
+def resubmit_stalled_uploads(now=None):
+    """Submit again the processing uploads whose worker died (lease expired); returns how many."""
+    db = get_session()
+    try:
+        upload_ids = db.execute(
+            select(AudioUpload.id).where(_lease_expired(now or datetime.utcnow()))
+        ).scalars().all()
+    finally:
+        db.close()
+    for upload_id in upload_ids:
+        submit_upload(upload_id)
+    if upload_ids:
+        logger.info(f"Resubmitted {len(upload_ids)} stalled uploads")
+    return len(upload_ids)
+
+
+def purge_abandoned_uploads(now=None):
+    """Release stuck PATCHes and delete uploads (rows and temp files) past the expiry."""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=UPLOAD_EXPIRY)
+    db = get_session()
+    try:
+        db.execute(
+            update(AudioUpload)
+            .where(AudioUpload.status == RECEIVING,
+                   AudioUpload.updated_at < now - timedelta(seconds=RECEIVE_TIMEOUT))
+            .values(status=UPLOADING, claim_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        expired_ids = db.execute(
+            select(AudioUpload.id).where(AudioUpload.updated_at < cutoff)
+        ).scalars().all()
+        if expired_ids:
+            db.execute(
+                delete(AudioUpload).where(AudioUpload.id.in_(expired_ids))
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    for upload_id in expired_ids:
+        _remove_file(upload_id)
+    # Temp files whose row is already gone (e.g. the process died mid-creation)
+    orphans = 0
+    if os.path.isdir(UPLOAD_DIR):
+        for name in os.listdir(UPLOAD_DIR):
+            path = os.path.join(UPLOAD_DIR, name)
+            try:
+                if datetime.utcfromtimestamp(os.path.getmtime(path)) < cutoff:
+                    os.remove(path)
+                    orphans += 1
+            except OSError:
+                pass
+    if expired_ids or orphans:
+        logger.info(f"Removed {len(expired_ids)} abandoned uploads and {orphans} orphan files")
+    return len(expired_ids)
+
+
+def init_answer_uploads():
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    schedule('audio-upload-gc', UPLOAD_GC_INTERVAL, purge_abandoned_uploads, run_immediately=False)
+    schedule('audio-upload-reclaim', PROCESSING_LEASE / 2, resubmit_stalled_uploads)
@@ -1,8 +1,9 @@
-import os
 import logging
 import requests
 from flask import Blueprint, request, jsonify
 from app.utils import token_required
+from app.resilience import CircuitOpenError
+from app.gemini_router import get_gemini_router
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +20,8 @@ def chat_with_bot(current_user):
         return jsonify({'error': 'Missing question'}), 400
     previous_answer = data.get('previousAnswer')
 
-    api_key = os.getenv('GEMINI_API_KEY')
-    if not api_key:
+    router = get_gemini_router()
+    if not router.configured:
         logger.error('GEMINI_API_KEY not configured')
         return jsonify({'error': 'GEMINI_API_KEY not configured'}), 500
 
@@ -36,13 +37,9 @@ def chat_with_bot(current_user):
     prompt += f"Câu hỏi: {question}\nTrả lời bằng tiếng Việt, ngắn gọn và hữu ích."
 
     payload = {"contents": [{"parts": [{"text": prompt}]}]}
-    endpoint = (
-        "https://generativelanguage.googleapis.com/v1beta/models/"
-        "gemini-2.5-flash-lite:generateContent"
-    )
 
     try:
-        resp = requests.post(endpoint, params={"key": api_key}, json=payload, timeout=30)
+        resp = router.post("chat", payload, timeout=30)
         if not resp.ok:
             logger.error(f"Gemini API error: {resp.status_code} - {resp.text}")
             return jsonify({'error': 'Gemini API error'}), resp.status_code
@@ -50,6 +47,9 @@ def chat_with_bot(current_user):
         data = resp.json()
         answer = data["candidates"][0]["content"]["parts"][0]["text"]
         return jsonify({'answer': answer.strip()})
+    except CircuitOpenError:
+        logger.warning('Gemini circuit is open, rejecting chat request')
+        return jsonify({'error': 'Dịch vụ AI đang tạm thời gián đoạn'}), 503
     except requests.exceptions.RequestException as e:
         logger.error(f"Network error calling Gemini: {e}")
         return jsonify({'error': 'Không thể kết nối với dịch vụ AI'}), 503
@@ -1,14 +1,17 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 from flask import Blueprint, request, jsonify
 from app.database import get_session, InterviewSession, InterviewQuestion, InterviewAnswer
 from app.utils import token_required
+from app.conditional import conditional_get
+from .overview import session_aggregates, history_item, history_summary
 
 logger = logging.getLogger(__name__)
 history_bp = Blueprint('history', __name__)
 
 @history_bp.route('/history', methods=['GET'])
 @token_required
+@conditional_get('user', refresh_every=3600)
 def get_interview_history(current_user):
     """Get interview history for the current user. Return ALL sessions for this user.
     For each session compute:
@@ -18,69 +21,10 @@ def get_interview_history(current_user):
     """
     db = get_session()
     try:
-        # Get all sessions for the user (any status) and sort by created_at desc
-        sessions = db.query(InterviewSession).filter_by(
-            user_id=current_user.id
-        ).order_by(InterviewSession.created_at.desc()).all()
-
-        history_items = []
-        total_sessions = 0
-        total_score = 0
-        current_week_sessions = 0
-        
-        # Calculate current week (last 7 days)
-        week_ago = datetime.utcnow() - timedelta(days=7)
-
-        for session in sessions:
-            # Get answers for this session
-            answers = db.query(InterviewAnswer).filter_by(session_id=session.id).all()
-
-            # Calculate average score from answers
-            session_score = sum(a.score or 0 for a in answers) / len(answers) if answers else 0
-            total_score += session_score
-            total_sessions += 1
-
-            # Check if session is in current week
-            if session.created_at and session.created_at >= week_ago:
-                current_week_sessions += 1
-
-            # Calculate duration in minutes (estimate based on answers)
-            estimated_duration = max(1, len(answers) * 2)  # Fallback: 2 mins/question
-
-            # Format date
-            if session.created_at:
-                now = datetime.utcnow()
-                diff = now - session.created_at
-                if diff.days == 0:
-                    date_str = f"Hôm nay • {session.created_at.strftime('%H:%M')}"
-                elif diff.days == 1:
-                    date_str = f"Hôm qua • {session.created_at.strftime('%H:%M')}"
-                else:
-                    date_str = f"{diff.days} ngày trước • {session.created_at.strftime('%H:%M')}"
-            else:
-                date_str = "Không xác định"
-
-            history_items.append({
-                'id': str(session.id),
-                'date': date_str,
-                'title': f"Phỏng vấn {session.field}",
-                'score': round(session_score, 1),
-                'questions': len(answers),
-                'duration': estimated_duration,
-                'field': session.field,
-                'position': '',
-                'experience_level': session.experience_level,
-                'created_at': session.created_at.isoformat() if session.created_at else None
-            })
-
-        # Calculate overall stats
-        average_score = total_score / total_sessions if total_sessions > 0 else 0
-
-        stats = {
-            'totalSessions': total_sessions,
-            'averageScore': round(average_score, 1),
-            'currentWeekSessions': current_week_sessions
-        }
+        rows = session_aggregates(db, current_user.id)
+        now = datetime.utcnow()
+        history_items = [history_item(session, count, score, now) for session, count, score in rows]
+        stats = history_summary(rows, now)
 
         logger.info(f"📊 History stats for user {current_user.id}: {stats}")
         logger.info(f"📋 Found {len(history_items)} history items")
@@ -100,6 +44,7 @@ def get_interview_history(current_user):
 
 @history_bp.route('/history/<int:session_id>', methods=['GET'])
 @token_required
+@conditional_get('session')
 def get_interview_detail(current_user, session_id):
     """Get detailed information for a specific interview session."""
     db = get_session()
@@ -165,6 +110,7 @@ def get_interview_detail(current_user, session_id):
 
 @history_bp.route('/history/<int:session_id>/answers/<int:question_id>', methods=['GET'])
 @token_required
+@conditional_get('session')
 def get_answer_detail(current_user, session_id, question_id):
     """Get detailed information for a specific answer."""
     db = get_session()
@@ -1,5 +1,6 @@
 import logging
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
+from sqlalchemy import select, and_
 from app.database import (
     get_session,
     InterviewQuestion,
@@ -8,11 +9,16 @@ from app.database import (
     InterviewSession,
 )
 from app.utils import token_required
+from app.conditional import conditional_get
 
 logger = logging.getLogger(__name__)
 
 note_bp = Blueprint('note', __name__, url_prefix='/questions')
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+MAX_LOOKUP_IDS = 200
+
 @note_bp.route('/<int:question_id>/note', methods=['GET'])
 @token_required
 def check_note(current_user, question_id):
@@ -68,22 +74,73 @@ def delete_note(current_user, question_id):
         db.close()
 
 
+@note_bp.route('/notes/lookup', methods=['POST'])
+@token_required
+def lookup_notes(current_user):
+    """Saved state of many questions at once, for rendering bookmark icons.
+
+    Body: ``{"question_ids": [1, 2, 3]}`` (at most 200). Returns
+    ``{"saved": {"1": true, "2": false, "3": true}}``.
+    """
+    data = request.get_json(silent=True) or {}
+    question_ids = data.get('question_ids')
+    if not isinstance(question_ids, list) or len(question_ids) > MAX_LOOKUP_IDS:
+        return jsonify({'error': f'question_ids phải là danh sách tối đa {MAX_LOOKUP_IDS} phần tử'}), 400
+    try:
+        question_ids = {int(qid) for qid in question_ids}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'question_ids không hợp lệ'}), 400
+
+    db = get_session()
+    try:
+        saved = set()
+        if question_ids:
+            # Served by the (user_id, question_id) unique index
+            saved = set(db.execute(
+                select(QuestionNote.question_id)
+                .where(QuestionNote.user_id == current_user.id, QuestionNote.question_id.in_(question_ids))
+            ).scalars())
+        return jsonify({'saved': {str(qid): qid in saved for qid in sorted(question_ids)}})
+    except Exception as e:
+        logger.error(f"Error looking up notes: {e}")
+        return jsonify({'error': 'Không thể kiểm tra trạng thái'}), 500
+    finally:
+        db.close()
+
+
 @note_bp.route('/notes', methods=['GET'])
 @token_required
+@conditional_get('user')
 def list_notes(current_user):
-    """List all saved questions for current user"""
+    """List saved questions for current user, newest first.
+
+    Paginated when ``limit`` (default 50, max 100) or ``cursor`` (the ``next_cursor`` of
+    the previous page) is given; ``next_cursor`` is null on the last page. Without
+    either, every saved question is returned, as before pagination existed.
+    """
+    paginated = 'limit' in request.args or 'cursor' in request.args
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor', type=int)
     db = get_session()
     try:
         query = (
             db.query(QuestionNote, InterviewQuestion, InterviewAnswer, InterviewSession)
             .join(InterviewQuestion, QuestionNote.question_id == InterviewQuestion.id)
-            .outerjoin(InterviewAnswer, InterviewAnswer.question_id == InterviewQuestion.id)
             .join(InterviewSession, InterviewQuestion.session_id == InterviewSession.id)
+            # Matches uq_interview_answers_session_question, so at most one answer per question
+            .outerjoin(InterviewAnswer, and_(InterviewAnswer.session_id == InterviewQuestion.session_id,
+                                            InterviewAnswer.question_id == InterviewQuestion.id))
             .filter(QuestionNote.user_id == current_user.id)
-            .order_by(QuestionNote.created_at.desc())
         )
+        if cursor is not None:
+            query = query.filter(QuestionNote.id < cursor)
+        # Notes ids grow with created_at; paging on id avoids ties between equal timestamps
+        query = query.order_by(QuestionNote.id.desc())
+        rows = query.limit(limit + 1).all() if paginated else query.all()
+        if not paginated:
+            limit = len(rows)
         results = []
-        for note, question, answer, session in query.all():
+        for note, question, answer, session in rows[:limit]:
             results.append({
                 'id': question.id,
                 'question': question.content,
@@ -93,9 +150,10 @@ def list_notes(current_user):
                 'excerpt': (answer.transcript_text or '')[:200] if (answer and answer.transcript_text) else None,
                 'score': answer.score if answer else None,
             })
-        return jsonify({'saved': results})
+        next_cursor = str(rows[limit - 1][0].id) if len(rows) > limit else None
+        return jsonify({'saved': results, 'next_cursor': next_cursor})
     except Exception as e:
         logger.error(f"Error listing notes: {e}")
         return jsonify({'error': 'Không thể lấy danh sách câu hỏi đã lưu'}), 500
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,115 @@
+"""Per-user history and statistics built from one aggregate query.
+
+``session_aggregates`` returns every session of the user with its answer count and
+average score (unanswered scores count as 0), newest first. The history list, the
+history summary and the stats snapshot are all derived from those rows, so
+``/interviews/history``, ``/interviews/stats`` and ``/bootstrap`` need no per-session
+queries.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from app.database import InterviewSession, InterviewAnswer
+from app.analytics import trend_direction
+
+
+def session_aggregates(db, user_id):
+    """``[(session, answer_count, average_score)]`` for the user, newest first."""
+    rows = db.execute(
+        select(
+            InterviewSession,
+            func.count(InterviewAnswer.id),
+            func.avg(func.coalesce(InterviewAnswer.score, 0)),
+        )
+        .outerjoin(InterviewAnswer, InterviewAnswer.session_id == InterviewSession.id)
+        .where(InterviewSession.user_id == user_id)
+        .group_by(InterviewSession.id)
+        .order_by(InterviewSession.created_at.desc())
+    ).all()
+    return [(session, count, float(avg or 0)) for session, count, avg in rows]
+
+
+def format_session_date(created_at, now=None):
+    if not created_at:
+        return "Không xác định"
+    diff = (now or datetime.utcnow()) - created_at
+    if diff.days == 0:
+        return f"Hôm nay • {created_at.strftime('%H:%M')}"
+    if diff.days == 1:
+        return f"Hôm qua • {created_at.strftime('%H:%M')}"
+    return f"{diff.days} ngày trước • {created_at.strftime('%H:%M')}"
+
+
+def history_item(session, answer_count, score, now=None):
+    return {
+        'id': str(session.id),
+        'date': format_session_date(session.created_at, now),
+        'title': f"Phỏng vấn {session.field}",
+        'score': round(score, 1),
+        'questions': answer_count,
+        # Estimate: 2 mins/question
+        'duration': max(1, answer_count * 2),
+        'field': session.field,
+        'position': '',
+        'experience_level': session.experience_level,
+        'created_at': session.created_at.isoformat() if session.created_at else None
+    }
+
+
+def history_summary(rows, now=None):
+    """Totals shown above the history list: all sessions, any status."""
+    week_ago = (now or datetime.utcnow()) - timedelta(days=7)
+    total_sessions = len(rows)
+    average_score = sum(score for _, _, score in rows) / total_sessions if total_sessions > 0 else 0
+    return {
+        'totalSessions': total_sessions,
+        'averageScore': round(average_score, 1),
+        'currentWeekSessions': sum(1 for s, _, _ in rows if s.created_at and s.created_at >= week_ago),
+    }
+
+
+def _slope(values):
+    """Least-squares slope of ``values`` against their index; None below two values."""
+    n = len(values)
+    if n < 2:
+        return None
+    mean_x, mean_y = (n - 1) / 2, sum(values) / n
+    numerator = sum((i - mean_x) * (y - mean_y) for i, y in enumerate(values))
+    return numerator / sum((i - mean_x) ** 2 for i in range(n))
+
+
+def user_stats(rows):
+    """Statistics snapshot served by ``/interviews/stats``."""
+    completed = [(s, score) for s, _, score in rows if s.status == 'da_hoan_thanh']
+    total_sessions = len(rows)
+    total_completed = len(completed)
+    total_ongoing = sum(1 for s, _, _ in rows if s.status == 'dang_dien_ra')
+
+    total_score = sum(score for _, score in completed)
+    average_score = total_score / total_completed if total_completed > 0 else 0
+
+    field_stats = {}
+    for session, score in completed:
+        entry = field_stats.setdefault(session.field, {'count': 0, 'total_score': 0})
+        entry['count'] += 1
+        entry['total_score'] += score
+    for entry in field_stats.values():
+        entry['average_score'] = round(entry['total_score'] / entry['count'], 2)
+
+    # Recent performance (last 5 completed sessions, newest first)
+    recent_scores = [score for _, score in completed[:5]]
+    # Points gained per session, oldest to newest
+    trend = _slope(recent_scores[::-1])
+
+    return {
+        'total_sessions': total_sessions,
+        'completed_sessions': total_completed,
+        'ongoing_sessions': total_ongoing,
+        'completion_rate': round((total_completed / total_sessions * 100) if total_sessions > 0 else 0, 1),
+        'total_score': total_score,
+        'average_score': round(average_score, 2),
+        'field_distribution': field_stats,
+        'recent_performance': recent_scores,
+        'performance_trend': trend_direction(trend),
+    }
@@ -0,0 +1,55 @@
+import random
+
+# Câu hỏi dự phòng khi Gemini không khả dụng (circuit đang mở)
+GENERAL_QUESTIONS = [
+    "Hãy giới thiệu ngắn gọn về bản thân và kinh nghiệm làm việc liên quan đến vị trí này.",
+    "Bạn hãy kể về một dự án hoặc công việc mà bạn tự hào nhất. Vai trò của bạn trong đó là gì?",
+    "Hãy kể về một lần bạn gặp khó khăn lớn trong công việc và cách bạn vượt qua nó.",
+    "Bạn thường làm gì khi có bất đồng ý kiến với đồng nghiệp hoặc quản lý?",
+    "Bạn sắp xếp thứ tự ưu tiên như thế nào khi có nhiều việc gấp cùng lúc?",
+    "Điểm mạnh và điểm yếu lớn nhất của bạn là gì? Bạn đang cải thiện điểm yếu đó ra sao?",
+    "Vì sao bạn muốn ứng tuyển vào vị trí này và định hướng phát triển của bạn trong 2-3 năm tới là gì?",
+    "Hãy kể về một lần bạn mắc sai lầm trong công việc và bạn đã học được gì từ đó.",
+]
+
+FIELD_QUESTIONS = {
+    "IT": [
+        "Hãy mô tả kiến trúc của một hệ thống bạn từng xây dựng và lý do bạn chọn kiến trúc đó.",
+        "Bạn xử lý thế nào khi một tính năng đang chạy trên production đột nhiên chậm đi?",
+        "Bạn đảm bảo chất lượng mã nguồn trong nhóm bằng những cách nào?",
+        "Hãy kể về một lỗi khó nhất bạn từng debug và quy trình bạn đã áp dụng.",
+        "Bạn cập nhật kiến thức công nghệ mới như thế nào và áp dụng vào công việc ra sao?",
+    ],
+    "Business": [
+        "Hãy kể về một lần bạn thuyết phục khách hàng hoặc đối tác thay đổi quyết định.",
+        "Bạn thu thập và phân tích yêu cầu từ các bên liên quan như thế nào?",
+        "Bạn đo lường hiệu quả công việc của mình bằng những chỉ số nào?",
+        "Hãy mô tả cách bạn quản lý một dự án bị trễ tiến độ.",
+    ],
+    "Marketing": [
+        "Hãy kể về một chiến dịch marketing bạn đã thực hiện và kết quả đạt được.",
+        "Bạn xác định chân dung khách hàng mục tiêu cho một sản phẩm mới như thế nào?",
+        "Bạn đánh giá hiệu quả của một kênh quảng cáo bằng những chỉ số nào?",
+        "Nếu ngân sách marketing bị cắt giảm một nửa, bạn sẽ ưu tiên điều gì?",
+    ],
+    "Finance": [
+        "Hãy mô tả quy trình bạn dùng để kiểm tra tính chính xác của số liệu tài chính.",
+        "Bạn sẽ phân tích báo cáo tài chính của một doanh nghiệp như thế nào để đánh giá sức khỏe tài chính?",
+        "Hãy kể về một lần bạn phát hiện sai sót trong số liệu và cách bạn xử lý.",
+        "Bạn cân nhắc những yếu tố nào khi đánh giá một cơ hội đầu tư?",
+    ],
+    "HR": [
+        "Bạn xây dựng quy trình tuyển dụng cho một vị trí khó tuyển như thế nào?",
+        "Hãy kể về một lần bạn giải quyết mâu thuẫn giữa các nhân viên.",
+        "Bạn đánh giá hiệu quả của một chương trình đào tạo bằng cách nào?",
+        "Bạn làm gì để giữ chân nhân sự giỏi trong tổ chức?",
+    ],
+}
+
+
+def pick_fallback_question(field: str | None, asked: list[str] | None = None) -> str:
+    """Pick a local question for the session's field, avoiding ones already asked."""
+    asked_set = set(asked or [])
+    pool = FIELD_QUESTIONS.get(field or "", []) + GENERAL_QUESTIONS
+    remaining = [q for q in pool if q not in asked_set]
+    return random.choice(remaining or pool)
@@ -3,7 +3,9 @@ import logging
 from flask import Blueprint, request, jsonify
 from app.database import get_session, InterviewSession, InterviewQuestion
 from app.utils import token_required
+from app.resilience import CircuitOpenError
 from .utils import generate_question
+from .question_bank import pick_fallback_question
 
 logger = logging.getLogger(__name__)
 question_bp = Blueprint('question', __name__)
@@ -55,7 +57,11 @@ def get_question(current_user, session_id):
             context_prompt += f"\nCác câu hỏi đã hỏi: {' | '.join(history[:3])}"  # Chỉ lấy 3 câu gần nhất
 
         logger.info(f"Generating question with context: {context_prompt[:200]}...")
-        question_text = generate_question(context_prompt)
+        try:
+            question_text = generate_question(context_prompt)
+        except CircuitOpenError:
+            logger.warning(f"Gemini unavailable, using local question bank for session {session_id}")
+            question_text = pick_fallback_question(interview_session.field, history)
 
         # Save question to DB before returning
         question = InterviewQuestion(session_id=session_id, content=question_text)
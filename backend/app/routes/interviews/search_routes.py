@@ -0,0 +1,77 @@
+import logging
+from flask import Blueprint, request, jsonify
+from sqlalchemy import and_
+from app.database import get_session, InterviewQuestion, InterviewAnswer, InterviewSession, QuestionNote
+from app.utils import token_required
+from app.conditional import conditional_get
+from app.search import search, query_tokens, excerpt
+
+logger = logging.getLogger(__name__)
+search_bp = Blueprint('search', __name__)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+
+@search_bp.route('/search', methods=['GET'])
+@token_required
+@conditional_get('user')
+def search_interviews(current_user):
+    """Search the user's past questions and answers by keyword, best matches first.
+
+    Query params: ``q`` (accents optional: "phong van" matches "phỏng vấn"), ``limit``
+    (default 20, max 50), ``offset``, ``saved=1`` to search saved questions only.
+    """
+    query = request.args.get('q', '')
+    tokens = query_tokens(query)
+    if not tokens:
+        return jsonify({'error': 'Vui lòng nhập từ khóa tìm kiếm'}), 400
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    saved_only = request.args.get('saved', '').lower() in ('1', 'true')
+
+    db = get_session()
+    try:
+        hits = search(db, current_user.id, query, limit, offset, saved_only)
+        page = [question_id for question_id, _ in hits[:limit]]
+        details = {}
+        if page:
+            rows = (
+                db.query(InterviewQuestion, InterviewSession, InterviewAnswer, QuestionNote.id)
+                .join(InterviewSession, InterviewQuestion.session_id == InterviewSession.id)
+                .outerjoin(InterviewAnswer, and_(InterviewAnswer.session_id == InterviewQuestion.session_id,
+                                                InterviewAnswer.question_id == InterviewQuestion.id))
+                .outerjoin(QuestionNote, and_(QuestionNote.question_id == InterviewQuestion.id,
+                                              QuestionNote.user_id == current_user.id))
+                .filter(InterviewQuestion.id.in_(page))
+                .all()
+            )
+            details = {question.id: (question, session, answer, note_id) for question, session, answer, note_id in rows}
+
+        results = []
+        for question_id in page:
+            if question_id not in details:
+                # Document of a question deleted since it was indexed
+                continue
+            question, session, answer, note_id = details[question_id]
+            results.append({
+                'id': question.id,
+                'question': question.content,
+                'interview_id': session.id,
+                'category': session.field,
+                'excerpt': excerpt(answer.transcript_text, tokens) if answer else None,
+                'score': answer.score if answer else None,
+                'saved': note_id is not None,
+                'created_at': session.created_at.isoformat() if session.created_at else None,
+            })
+        has_more = len(hits) > limit
+        return jsonify({
+            'results': results,
+            'has_more': has_more,
+            'next_offset': offset + limit if has_more else None,
+        })
+    except Exception as e:
+        logger.error(f"❌ Error searching interviews for user {current_user.id}: {e}")
+        return jsonify({'error': 'Không thể tìm kiếm. Vui lòng thử lại.'}), 500
+    finally:
+        db.close()
@@ -1,9 +1,13 @@
 from datetime import datetime, timedelta
 import logging
 from flask import Blueprint, request, jsonify
-from app.database import get_session, InterviewSession
+from app.database import get_session, InterviewSession, InterviewQuestion, InterviewAnswer, SessionResult
 from app.utils import token_required
-from .utils import summarize_transcript
+from app.idempotency import idempotent
+from app.session_lifecycle import COMPLETED, ONGOING, build_transcript, transition, emit_transition
+from app.session_results import (
+    READY, generate_summary, get_or_create_result, serialize_result, submit_summary,
+)
 
 logger = logging.getLogger(__name__)
 session_bp = Blueprint('session', __name__)
@@ -11,6 +15,7 @@ session_bp = Blueprint('session', __name__)
 @session_bp.route('/session', methods=['POST'])
 @session_bp.route('/start', methods=['POST'])
 @token_required
+@idempotent
 def create_session(current_user):
     """Create a new interview practice session."""
     logger.info(f"Creating session for user {current_user.id}")
@@ -100,8 +105,18 @@ def create_session(current_user):
 
 @session_bp.route('/<int:session_id>/finish', methods=['POST'])
 @token_required
+@idempotent
 def finish_session(current_user, session_id):
-    """Finish interview practice session and generate comprehensive results."""
+    """Finish interview practice session and generate comprehensive results.
+
+    Idempotent: once the summary is stored, repeat calls return it without any AI call.
+    Pass ``?async=1`` (or ``Prefer: respond-async``) to get 202 right away while the
+    summary is generated in the background; poll ``GET /interviews/<id>/result``.
+    """
+    wants_async = (
+        request.args.get('async', '').lower() in ('1', 'true')
+        or 'respond-async' in request.headers.get('Prefer', '')
+    )
     db = get_session()
     try:
         # Validate session
@@ -109,71 +124,34 @@ def finish_session(current_user, session_id):
         if not interview_session or interview_session.user_id != current_user.id:
             return jsonify({'error': 'Phiên phỏng vấn không hợp lệ'}), 404
 
-        # Get all answers and questions from DB
-        answers = db.query(InterviewAnswer).filter_by(session_id=session_id).all()
-        if not answers:
-            return jsonify({'error': 'Không có câu trả lời nào để đánh giá'}), 400
-
-        # Calculate scores and statistics
-        total_score = sum(a.score or 0 for a in answers)
-        max_possible_score = len(answers) * 5
-        average_score = total_score / len(answers) if answers else 0
-        score_percentage = (total_score / max_possible_score) * 100 if max_possible_score > 0 else 0
-
         # Create detailed transcript from DB
-        transcript = []
-        for ans in answers:
-            question = db.get(InterviewQuestion, ans.question_id)
-            transcript.append({
-                'question_id': ans.question_id,
-                'question': question.content if question else '',
-                'answer': ans.answer,
-                'feedback': ans.feedback,
-                'score': ans.score,
-                'audio_url': ans.user_answer_audio_url,
-            })
-
-        # Generate comprehensive summary using AI
-        summary = summarize_transcript(transcript, interview_session)
-
-        # Determine performance level
-        if score_percentage >= 90:
-            performance_level = "Xuất sắc (A+)"
-        elif score_percentage >= 80:
-            performance_level = "Tốt (A)"
-        elif score_percentage >= 70:
-            performance_level = "Khá (B+)"
-        elif score_percentage >= 60:
-            performance_level = "Trung bình khá (B)"
-        elif score_percentage >= 50:
-            performance_level = "Trung bình (C)"
-        else:
-            performance_level = "Cần cải thiện (D)"
+        transcript = build_transcript(db, session_id)
+        result = db.get(SessionResult, session_id)
+        if result is None:
+            if not transcript:
+                return jsonify({'error': 'Không có câu trả lời nào để đánh giá'}), 400
+            result = get_or_create_result(db, session_id, transcript)
 
         # Update session in DB before returning
-        interview_session.status = 'da_hoan_thanh'
-        db.commit()
-
-        return jsonify({
-            'session_id': interview_session.id,
-            'summary': summary,
-            'total_score': total_score,
-            'max_possible_score': max_possible_score,
-            'average_score': round(average_score, 2),
-            'score_percentage': round(score_percentage, 1),
-            'performance_level': performance_level,
-            'transcript': transcript,
-            'session_stats': {
-                'total_questions': len(answers),
-                'questions_asked': interview_session.questions_asked,
-                'time_limit': interview_session.time_limit,
-                'field': interview_session.field,
-                'specialization': interview_session.specialization,
-                'experience_level': interview_session.experience_level,
-                'difficulty': interview_session.difficulty_setting
-            },
-            'message': 'Hoàn thành phiên phỏng vấn thành công'
-        })
+        if interview_session.status == ONGOING:
+            event = transition(interview_session, COMPLETED)
+            db.commit()
+            emit_transition(event, reason='finished')
+
+        if result.status != READY:
+            if wants_async:
+                submit_summary(session_id)
+            else:
+                # Generate comprehensive summary using AI (at most once per session)
+                generate_summary(session_id)
+            db.refresh(result)
+
+        payload = serialize_result(result, interview_session, transcript)
+        if result.status != READY:
+            payload['message'] = 'Đang tạo tóm tắt kết quả phỏng vấn'
+            return jsonify(payload), 202
+        payload['message'] = 'Hoàn thành phiên phỏng vấn thành công'
+        return jsonify(payload)
         
     except RuntimeError as e:
         db.rollback()
@@ -187,6 +165,34 @@ def finish_session(current_user, session_id):
         db.close()
 
 
+@session_bp.route('/<int:session_id>/result', methods=['GET'])
+@token_required
+def get_session_result(current_user, session_id):
+    """Return the stored result of a finished session (never calls the AI)."""
+    db = get_session()
+    try:
+        interview_session = db.get(InterviewSession, session_id)
+        if not interview_session or interview_session.user_id != current_user.id:
+            return jsonify({'error': 'Phiên phỏng vấn không hợp lệ'}), 404
+
+        result = db.get(SessionResult, session_id)
+        if result is None:
+            return jsonify({'error': 'Phiên phỏng vấn chưa có kết quả'}), 404
+
+        payload = serialize_result(result, interview_session, build_transcript(db, session_id))
+        if result.status != READY:
+            payload['message'] = 'Đang tạo tóm tắt kết quả phỏng vấn'
+            return jsonify(payload), 202
+        payload['message'] = 'Lấy kết quả phỏng vấn thành công'
+        return jsonify(payload)
+
+    except Exception as e:
+        logger.error(f"Error getting session result: {e}")
+        return jsonify({'error': 'Không thể lấy kết quả phỏng vấn. Vui lòng thử lại.'}), 500
+    finally:
+        db.close()
+
+
 @session_bp.route('/<int:session_id>', methods=['GET'])
 @token_required
 def get_session_details(current_user, session_id):
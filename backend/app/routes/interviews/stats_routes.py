@@ -1,74 +1,26 @@
 import logging
 from flask import Blueprint, request, jsonify
-from app.database import get_session, InterviewSession, InterviewAnswer
+from app.database import get_session, InterviewSession
 from app.utils import token_required
+from app.conditional import conditional_get
+from app import analytics, score_ranking
+from app.session_lifecycle import COMPLETED
+from .overview import session_aggregates, user_stats
 
 logger = logging.getLogger(__name__)
 stats_bp = Blueprint('stats', __name__)
 
+DEFAULT_PROGRESS_DAYS = 90
+MAX_PROGRESS_DAYS = 730
+
 @stats_bp.route('/stats', methods=['GET'])
 @token_required
+@conditional_get('user')
 def get_user_stats(current_user):
     """Get comprehensive statistics for the current user's interview practice from DB."""
     db = get_session()
     try:
-        # Get all sessions from DB
-        all_sessions = db.query(InterviewSession).filter(
-            InterviewSession.user_id == current_user.id
-        ).all()
-        
-        completed_sessions = [s for s in all_sessions if s.status == 'hoan_thanh']
-        ongoing_sessions = [s for s in all_sessions if s.status == 'dang_dien_ra']
-
-        # Calculate statistics
-        total_sessions = len(all_sessions)
-        total_completed = len(completed_sessions)
-        total_ongoing = len(ongoing_sessions)
-        
-        # Score statistics - calculate from answers
-        total_score = 0
-        for session in completed_sessions:
-            answers = db.query(InterviewAnswer).filter_by(session_id=session.id).all()
-            session_score = sum(a.score or 0 for a in answers) / len(answers) if answers else 0
-            total_score += session_score
-        average_score = total_score / total_completed if total_completed > 0 else 0
-        
-        # Field distribution
-        field_stats = {}
-        for session in completed_sessions:
-            field = session.field
-            if field not in field_stats:
-                field_stats[field] = {'count': 0, 'total_score': 0}
-            field_stats[field]['count'] += 1
-            # Calculate session score from answers
-            answers = db.query(InterviewAnswer).filter_by(session_id=session.id).all()
-            session_score = sum(a.score or 0 for a in answers) / len(answers) if answers else 0
-            field_stats[field]['total_score'] += session_score
-
-        # Calculate field averages
-        for field in field_stats:
-            field_stats[field]['average_score'] = round(
-                field_stats[field]['total_score'] / field_stats[field]['count'], 2
-            )
-
-        # Recent performance (last 5 sessions)
-        recent_scores = []
-        for session in completed_sessions[:5]:
-            answers = db.query(InterviewAnswer).filter_by(session_id=session.id).all()
-            session_score = sum(a.score or 0 for a in answers) / len(answers) if answers else 0
-            recent_scores.append(session_score)
-
-        stats = {
-            'total_sessions': total_sessions,
-            'completed_sessions': total_completed,
-            'ongoing_sessions': total_ongoing,
-            'completion_rate': round((total_completed / total_sessions * 100) if total_sessions > 0 else 0, 1),
-            'total_score': total_score,
-            'average_score': round(average_score, 2),
-            'field_distribution': field_stats,
-            'recent_performance': recent_scores,
-            'performance_trend': 'improving' if len(recent_scores) >= 2 and recent_scores[0] > recent_scores[-1] else 'stable'
-        }
+        stats = user_stats(session_aggregates(db, current_user.id))
 
         return jsonify({
             'stats': stats,
@@ -81,3 +33,70 @@ def get_user_stats(current_user):
     finally:
         db.close()
 
+
+
+@stats_bp.route('/stats/progress', methods=['GET'])
+@token_required
+@conditional_get('user', refresh_every=3600)
+def get_progress(current_user):
+    """Progress tab analytics: rolling average, per-dimension trends, per-field percentiles
+    and weekly buckets over the last ``days`` days (default 90, max 730)."""
+    if not analytics.available():
+        return jsonify({'error': 'Thống kê tiến độ tạm thời không khả dụng'}), 503
+    days = min(max(request.args.get('days', DEFAULT_PROGRESS_DAYS, type=int), 1), MAX_PROGRESS_DAYS)
+    db = get_session()
+    try:
+        return jsonify({
+            'progress': analytics.progress_report(db, current_user.id, days),
+            'message': 'Lấy thống kê tiến độ thành công'
+        })
+    except Exception as e:
+        logger.error(f"Error getting progress for user {current_user.id}: {e}")
+        return jsonify({'error': 'Không thể lấy thống kê tiến độ. Vui lòng thử lại.'}), 500
+    finally:
+        db.close()
+
+
+@stats_bp.route('/stats/percentile', methods=['GET'])
+@token_required
+def get_percentile(current_user):
+    """How a finished session ranks against all candidates of the same field, specialization
+    and experience level. Query param ``session_id`` (default: the latest completed session)."""
+    session_id = request.args.get('session_id', type=int)
+    db = get_session()
+    try:
+        query = db.query(InterviewSession).filter(
+            InterviewSession.user_id == current_user.id, InterviewSession.status == COMPLETED)
+        if session_id is not None:
+            interview_session = query.filter(InterviewSession.id == session_id).first()
+        else:
+            interview_session = query.order_by(InterviewSession.created_at.desc(), InterviewSession.id.desc()).first()
+        if interview_session is None:
+            return jsonify({'error': 'Không tìm thấy phiên phỏng vấn đã hoàn thành'}), 404
+        score = score_ranking.session_score(db, interview_session.id)
+        if score is None:
+            return jsonify({'error': 'Phiên phỏng vấn chưa có câu trả lời'}), 404
+
+        cohort = score_ranking.cohort_of(interview_session)
+        percent, cohort_size = score_ranking.percentile(cohort, score)
+        if cohort_size < score_ranking.MIN_COHORT_SIZE:
+            percent = None
+        return jsonify({
+            'session_id': interview_session.id,
+            'score': round(score, 2),
+            'percentile': percent,
+            'cohort': {
+                'field': interview_session.field,
+                'specialization': interview_session.specialization,
+                'experience_level': interview_session.experience_level,
+                'size': cohort_size,
+            },
+            'message': (f"Bạn làm tốt hơn {percent:g}% ứng viên {interview_session.specialization or interview_session.field}"
+                        f"/{interview_session.experience_level}" if percent is not None
+                        else 'Chưa đủ dữ liệu để so sánh với các ứng viên khác')
+        })
+    except Exception as e:
+        logger.error(f"Error getting percentile for user {current_user.id}: {e}")
+        return jsonify({'error': 'Không thể lấy xếp hạng. Vui lòng thử lại.'}), 500
+    finally:
+        db.close()
@@ -0,0 +1,202 @@
+"""Resumable answer audio upload (subset of the tus 1.0 core protocol).
+
+    POST   /interviews/<session_id>/answer/uploads   Upload-Length header, question_id in body
+    HEAD   /interviews/uploads/<upload_id>           -> Upload-Offset to resume from
+    PATCH  /interviews/uploads/<upload_id>           Upload-Offset header, raw bytes body
+    GET    /interviews/uploads/<upload_id>           status and, once processed, the evaluation
+    DELETE /interviews/uploads/<upload_id>           abandon the upload
+
+Processing (storage upload, transcription, scoring) starts when the final chunk arrives.
+"""
+import logging
+from flask import Blueprint, request, jsonify, make_response, url_for
+
+from app.database import get_session, InterviewSession, InterviewQuestion, InterviewAnswer, AudioUpload
+from app.utils import token_required
+from app.idempotency import idempotent
+from .answer_service import (
+    MAX_AUDIO_SIZE, UPLOADING, COMPLETED, answer_evaluation,
+    create_upload, claim_upload, write_chunk, release_upload, discard_upload, submit_upload,
+)
+
+logger = logging.getLogger(__name__)
+upload_bp = Blueprint('upload', __name__)
+
+TUS_VERSION = '1.0.0'
+CHUNK_CONTENT_TYPE = 'application/offset+octet-stream'
+
+
+def _tus_headers(response, upload):
+    response.headers['Tus-Resumable'] = TUS_VERSION
+    response.headers['Upload-Offset'] = str(upload.upload_offset)
+    response.headers['Upload-Length'] = str(upload.total_size)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def _int_header(name):
+    try:
+        value = int(request.headers.get(name, ''))
+    except ValueError:
+        return None
+    return value if value >= 0 else None
+
+
+def _get_upload(db, current_user, upload_id):
+    upload = db.get(AudioUpload, upload_id)
+    if not upload or upload.user_id != current_user.id:
+        return None
+    return upload
+
+
+@upload_bp.route('/<int:session_id>/answer/uploads', methods=['POST'])
+@token_required
+@idempotent
+def create_audio_upload(current_user, session_id):
+    """Start a resumable audio upload for one question."""
+    data = request.get_json(silent=True) or request.form or {}
+    question_id = int(data.get('question_id')) if str(data.get('question_id') or '').isdigit() else None
+    total_size = _int_header('Upload-Length')
+    if total_size is None and str(data.get('upload_length') or '').isdigit():
+        total_size = int(data.get('upload_length'))
+
+    if not question_id:
+        return jsonify({'error': 'Thiếu ID câu hỏi'}), 400
+    if not total_size:
+        return jsonify({'error': 'Thiếu kích thước file (Upload-Length)'}), 400
+    if total_size > MAX_AUDIO_SIZE:
+        return jsonify({'error': 'File audio quá lớn (tối đa 50MB)'}), 413
+
+    db = get_session()
+    try:
+        interview_session = db.get(InterviewSession, session_id)
+        if not interview_session or interview_session.user_id != current_user.id:
+            return jsonify({'error': 'Phiên phỏng vấn không hợp lệ'}), 404
+        if interview_session.status != 'dang_dien_ra':
+            return jsonify({'error': 'Phiên phỏng vấn đã kết thúc'}), 400
+
+        question = db.get(InterviewQuestion, question_id)
+        if not question or question.session_id != session_id:
+            return jsonify({'error': 'Câu hỏi không hợp lệ'}), 404
+        if db.query(InterviewAnswer.id).filter_by(session_id=session_id, question_id=question_id).first():
+            return jsonify({'error': 'Câu hỏi này đã được trả lời'}), 409
+
+        upload = create_upload(db, current_user.id, session_id, question_id, total_size,
+                               filename=data.get('filename'), host_url=request.host_url)
+        logger.info(f"📦 Created upload {upload.id} for session {session_id}, question {question_id} ({total_size} bytes)")
+
+        response = jsonify({
+            'upload_id': upload.id,
+            'offset': 0,
+            'length': total_size,
+            'message': 'Đã tạo phiên tải lên',
+        })
+        response.status_code = 201
+        response.headers['Location'] = url_for('.upload_status', upload_id=upload.id)
+        return _tus_headers(response, upload)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error creating audio upload: {e}")
+        return jsonify({'error': 'Không thể tạo phiên tải lên. Vui lòng thử lại.'}), 500
+    finally:
+        db.close()
+
+
+@upload_bp.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+@token_required
+def upload_status(current_user, upload_id):
+    """Current offset (HEAD) or status with the evaluation once processed (GET)."""
+    db = get_session()
+    try:
+        upload = _get_upload(db, current_user, upload_id)
+        if not upload:
+            return jsonify({'error': 'Không tìm thấy phiên tải lên'}), 404
+
+        payload = {
+            'upload_id': upload.id,
+            'status': upload.status,
+            'offset': upload.upload_offset,
+            'length': upload.total_size,
+        }
+        if upload.status == COMPLETED and upload.answer_id:
+            answer = db.get(InterviewAnswer, upload.answer_id)
+            if answer:
+                payload['audio_url'] = answer.user_answer_audio_url
+                payload['evaluation'] = answer_evaluation(answer)
+        if upload.error:
+            payload['error'] = 'Không thể xử lý file audio'
+        return _tus_headers(jsonify(payload), upload)
+    finally:
+        db.close()
+
+
+@upload_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+@token_required
+def upload_chunk(current_user, upload_id):
+    """Append a chunk at ``Upload-Offset``; the final chunk starts answer processing."""
+    if request.mimetype != CHUNK_CONTENT_TYPE:
+        return jsonify({'error': f'Content-Type phải là {CHUNK_CONTENT_TYPE}'}), 415
+    offset = _int_header('Upload-Offset')
+    if offset is None:
+        return jsonify({'error': 'Thiếu Upload-Offset'}), 400
+
+    db = get_session()
+    try:
+        upload = _get_upload(db, current_user, upload_id)
+        if not upload:
+            return jsonify({'error': 'Không tìm thấy phiên tải lên'}), 404
+        total_size = upload.total_size
+        remaining = total_size - offset
+        if request.content_length is not None and request.content_length > remaining:
+            return jsonify({'error': 'Dữ liệu vượt quá Upload-Length'}), 413
+        claim_id = claim_upload(db, upload_id, offset)
+        if claim_id is None:
+            db.refresh(upload)
+            response = jsonify({'error': 'Upload-Offset không khớp hoặc phiên tải lên đang bận'})
+            response.status_code = 409
+            return _tus_headers(response, upload)
+    finally:
+        # Do not hold a pooled connection while a slow client streams the body
+        db.close()
+
+    written = write_chunk(upload_id, claim_id, offset, request.stream, remaining)
+    new_offset = offset + written
+    complete = new_offset == total_size
+
+    db = get_session()
+    try:
+        released = release_upload(db, upload_id, claim_id, new_offset, complete)
+        upload = db.get(AudioUpload, upload_id)
+    finally:
+        db.close()
+    if not released:
+        # Timed out and released meanwhile; the client must HEAD and resume
+        response = jsonify({'error': 'Phiên tải lên đã hết hạn, vui lòng tiếp tục từ Upload-Offset hiện tại'})
+        response.status_code = 409
+        return _tus_headers(response, upload) if upload else response
+
+    if complete:
+        logger.info(f"📥 Upload {upload_id} complete, starting processing")
+        submit_upload(upload_id)
+    return _tus_headers(make_response('', 204), upload)
+
+
+@upload_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@token_required
+def delete_upload(current_user, upload_id):
+    """Abandon an upload that is not being processed."""
+    db = get_session()
+    try:
+        upload = _get_upload(db, current_user, upload_id)
+        if not upload:
+            return jsonify({'error': 'Không tìm thấy phiên tải lên'}), 404
+        if upload.status != UPLOADING:
+            return jsonify({'error': 'Phiên tải lên đang bận hoặc đã xử lý'}), 409
+        discard_upload(db, upload)
+        return '', 204
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error deleting upload {upload_id}: {e}")
+        return jsonify({'error': 'Không thể hủy phiên tải lên'}), 500
+    finally:
+        db.close()
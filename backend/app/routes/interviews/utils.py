@@ -5,21 +5,27 @@ import time
 import logging
 from datetime import datetime, timedelta
 from app.database import InterviewSession, InterviewQuestion, InterviewAnswer
+from app.resilience import CircuitOpenError, resilient_request
+from app.gemini_router import get_gemini_router
+from app.metrics import evaluation_parse_failures
 
 logger = logging.getLogger(__name__)
 
+ASSEMBLYAI_BASE_URL = os.getenv("ASSEMBLYAI_BASE_URL", "https://api.assemblyai.com").rstrip("/")
+
+# Upper bound for polling a transcript so a stuck job cannot hold a worker forever
+ASSEMBLYAI_MAX_WAIT = float(os.getenv("ASSEMBLYAI_MAX_WAIT", "120"))
+# Send local audio bytes to AssemblyAI instead of having it fetch the stored URL
+ASSEMBLYAI_DIRECT_UPLOAD = os.getenv("ASSEMBLYAI_DIRECT_UPLOAD", "1") != "0"
+
 def generate_question(prompt: str) -> str:
     """Generate interview question using Gemini API, optimized for interview practice."""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    router = get_gemini_router()
+    if not router.configured:
         logger.error("GEMINI_API_KEY not found in environment variables")
         raise ValueError("GEMINI_API_KEY not found in environment variables")
 
     try:
-        endpoint = (
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent"
-        )
-        
         # Prompt được tối ưu cho luyện phỏng vấn
         enhanced_prompt = f"""
 Bạn là một chuyên gia phỏng vấn giàu kinh nghiệm. Hãy tạo ra một câu hỏi phỏng vấn phù hợp với ngữ cảnh sau:
@@ -39,9 +45,8 @@ Chỉ trả về câu hỏi, không cần giải thích thêm.
         payload = {"contents": [{"parts": [{"text": enhanced_prompt}]}]}
         
         logger.info(f"Calling Gemini API with prompt length: {len(enhanced_prompt)}")
-        logger.info(f"API Endpoint: {endpoint}")
         
-        resp = requests.post(endpoint, params={"key": api_key}, json=payload, timeout=30)
+        resp = router.post("question", payload, timeout=30)
         
         logger.info(f"Gemini API response status: {resp.status_code}")
         
@@ -66,6 +71,9 @@ Chỉ trả về câu hỏi, không cần giải thích thêm.
         logger.info(f"Generated question: {question_text[:100]}...")
         return question_text
         
+    except CircuitOpenError:
+        logger.warning("Gemini circuit is open, skipping question generation")
+        raise
     except requests.exceptions.Timeout:
         logger.error("Gemini API request timed out")
         raise RuntimeError("Request to Gemini API timed out. Please try again.")
@@ -86,14 +94,57 @@ Chỉ trả về câu hỏi, không cần giải thích thêm.
         raise RuntimeError(f"Error generating question: {e}")
 
 
-def evaluate_audio_answer(question_text: str, audio_url: str) -> dict:
-    """Transcribe audio with AssemblyAI then evaluate using Gemini."""
+def _parse_evaluation_json(text: str, mode: str) -> dict:
+    """Strip markdown fences from Gemini's evaluation and parse it, counting failures."""
+    cleaned_text = text.strip()
+    if cleaned_text.startswith("```json"):
+        cleaned_text = cleaned_text.replace("```json", "").replace("```", "").strip()
+    elif cleaned_text.startswith("```"):
+        cleaned_text = cleaned_text.replace("```", "").strip()
+
+    logger.info(f"🧹 Cleaned text for JSON parsing: {cleaned_text[:200]}...")
+    try:
+        return json.loads(cleaned_text)
+    except json.JSONDecodeError:
+        evaluation_parse_failures.inc(mode=mode)
+        raise
+
+
+def upload_audio_to_assemblyai(audio_file, assembly_key: str) -> str:
+    """Send audio bytes (path or file object) to AssemblyAI's upload endpoint; returns its upload_url."""
+    if isinstance(audio_file, str):
+        with open(audio_file, "rb") as fh:
+            data = fh.read()
+    else:
+        audio_file.seek(0)
+        data = audio_file.read()
+        audio_file.seek(0)
+    resp = resilient_request(
+        "assemblyai", "POST", f"{ASSEMBLYAI_BASE_URL}/v2/upload", data=data,
+        headers={"authorization": assembly_key, "content-type": "application/octet-stream"}, timeout=60
+    )
+    if not resp.ok:
+        logger.error(f"❌ AssemblyAI upload error: {resp.status_code} - {resp.text}")
+        raise RuntimeError(f"AssemblyAI upload returned {resp.status_code}: {resp.text}")
+    return resp.json()["upload_url"]
+
+
+def evaluate_audio_answer(question_text: str, audio_url: str, audio_file=None) -> dict:
+    """Transcribe audio with AssemblyAI then evaluate using Gemini.
+
+    When the local ``audio_file`` is given it is uploaded to AssemblyAI directly, so
+    transcription does not wait for (or depend on) the storage upload of ``audio_url``.
+    """
     assembly_key = os.getenv("ASSEMBLYAI_API_KEY")
     if not assembly_key:
         raise RuntimeError("ASSEMBLYAI_API_KEY not configured")
 
     headers = {"authorization": assembly_key, "content-type": "application/json"}
-    transcript_endpoint = "https://api.assemblyai.com/v2/transcript"
+    transcript_endpoint = f"{ASSEMBLYAI_BASE_URL}/v2/transcript"
+
+    if audio_file is not None and ASSEMBLYAI_DIRECT_UPLOAD:
+        logger.info("📤 Uploading audio bytes to AssemblyAI")
+        audio_url = upload_audio_to_assemblyai(audio_file, assembly_key)
 
     # Start transcription
     logger.info("📤 Sending audio to AssemblyAI for transcription")
@@ -101,7 +152,9 @@ def evaluate_audio_answer(question_text: str, audio_url: str) -> dict:
         "audio_url": audio_url,
         "language_code": "vi",  # Force Vietnamese transcription
     }
-    start_resp = requests.post(transcript_endpoint, json=start_payload, headers=headers)
+    start_resp = resilient_request(
+        "assemblyai", "POST", transcript_endpoint, json=start_payload, headers=headers, timeout=30
+    )
     if not start_resp.ok:
         logger.error(f"❌ AssemblyAI error: {start_resp.status_code} - {start_resp.text}")
         raise RuntimeError(f"AssemblyAI returned {start_resp.status_code}: {start_resp.text}")
@@ -110,8 +163,11 @@ def evaluate_audio_answer(question_text: str, audio_url: str) -> dict:
 
     # Poll for completion
     logger.info(f"⌛ Waiting for AssemblyAI transcript {transcript_id}")
+    deadline = time.monotonic() + ASSEMBLYAI_MAX_WAIT
     while True:
-        poll_resp = requests.get(f"{transcript_endpoint}/{transcript_id}", headers=headers)
+        poll_resp = resilient_request(
+            "assemblyai", "GET", f"{transcript_endpoint}/{transcript_id}", headers=headers, timeout=30
+        )
         if not poll_resp.ok:
             logger.error(f"❌ AssemblyAI polling error: {poll_resp.status_code} - {poll_resp.text}")
             raise RuntimeError(f"AssemblyAI polling returned {poll_resp.status_code}: {poll_resp.text}")
@@ -125,11 +181,14 @@ def evaluate_audio_answer(question_text: str, audio_url: str) -> dict:
             error_msg = poll_data.get("error", "unknown error")
             logger.error(f"❌ AssemblyAI transcription failed: {error_msg}")
             raise RuntimeError(f"AssemblyAI transcription failed: {error_msg}")
+        if time.monotonic() > deadline:
+            logger.error(f"❌ AssemblyAI transcript {transcript_id} not ready after {ASSEMBLYAI_MAX_WAIT}s")
+            raise RuntimeError("AssemblyAI transcription timed out")
         time.sleep(3)
 
     # Evaluate transcript with Gemini
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    router = get_gemini_router()
+    if not router.configured:
         logger.warning("GEMINI_API_KEY not configured; returning fallback with transcript only")
         return {
             "transcript_text": transcript_text,
@@ -140,10 +199,6 @@ def evaluate_audio_answer(question_text: str, audio_url: str) -> dict:
             "improvements": [],
         }
 
-    endpoint = (
-        "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent"
-    )
-
     prompt = f"""
 Bạn là một chuyên gia phỏng vấn. Đánh giá câu trả lời của ứng viên dựa trên câu hỏi.
 
@@ -176,7 +231,7 @@ Lưu ý: Chỉ trả về JSON thuần túy, không bọc trong markdown code bl
     payload = {"contents": [{"parts": [{"text": prompt}]}]}
     logger.info("📤 Sending evaluation request to Gemini")
     try:
-        resp = requests.post(endpoint, params={"key": api_key}, json=payload, timeout=60)
+        resp = router.post("evaluation", payload, timeout=60)
         if not resp.ok:
             logger.error(f"❌ Gemini API error: {resp.status_code} - {resp.text}")
             raise RuntimeError(f"Gemini API returned {resp.status_code}: {resp.text}")
@@ -187,14 +242,7 @@ Lưu ý: Chỉ trả về JSON thuần túy, không bọc trong markdown code bl
             raise RuntimeError("No candidates in Gemini response")
 
         text = data["candidates"][0]["content"]["parts"][0]["text"]
-        cleaned_text = text.strip()
-        if cleaned_text.startswith("```json"):
-            cleaned_text = cleaned_text.replace("```json", "").replace("```", "").strip()
-        elif cleaned_text.startswith("```"):
-            cleaned_text = cleaned_text.replace("```", "").strip()
-
-        logger.info(f"🧹 Cleaned text for JSON parsing: {cleaned_text[:200]}...")
-        parsed = json.loads(cleaned_text)
+        parsed = _parse_evaluation_json(text, "audio")
         logger.info(
             f"✅ Gemini evaluation JSON: {json.dumps(parsed, indent=2, ensure_ascii=False)}"
         )
@@ -212,14 +260,10 @@ Lưu ý: Chỉ trả về JSON thuần túy, không bọc trong markdown code bl
 
 def evaluate_text_answer(question_text: str, transcript_text: str) -> dict:
     """Evaluate a text answer directly using Gemini API."""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    router = get_gemini_router()
+    if not router.configured:
         raise RuntimeError("GEMINI_API_KEY not configured")
 
-    endpoint = (
-        "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent"
-    )
-
     prompt = f"""
 Bạn là một chuyên gia phỏng vấn. Đánh giá câu trả lời của ứng viên dựa trên câu hỏi.
 
@@ -251,7 +295,7 @@ Lưu ý: Chỉ trả về JSON thuần túy, không bọc trong markdown code bl
 
     payload = {"contents": [{"parts": [{"text": prompt}]}]}
     logger.info("📤 Sending evaluation request to Gemini (text)")
-    resp = requests.post(endpoint, params={"key": api_key}, json=payload, timeout=60)
+    resp = router.post("evaluation", payload, timeout=60)
 
     if not resp.ok:
         logger.error(f"❌ Gemini API error: {resp.status_code} - {resp.text}")
@@ -263,14 +307,7 @@ Lưu ý: Chỉ trả về JSON thuần túy, không bọc trong markdown code bl
         raise RuntimeError("No candidates in Gemini response")
 
     text = data["candidates"][0]["content"]["parts"][0]["text"]
-    cleaned_text = text.strip()
-    if cleaned_text.startswith("```json"):
-        cleaned_text = cleaned_text.replace("```json", "").replace("```", "").strip()
-    elif cleaned_text.startswith("```"):
-        cleaned_text = cleaned_text.replace("```", "").strip()
-
-    logger.info(f"🧹 Cleaned text for JSON parsing: {cleaned_text[:200]}...")
-    parsed = json.loads(cleaned_text)
+    parsed = _parse_evaluation_json(text, "text")
     logger.info(
         f"✅ Gemini evaluation JSON: {json.dumps(parsed, indent=2, ensure_ascii=False)}"
     )
@@ -279,18 +316,14 @@ Lưu ý: Chỉ trả về JSON thuần túy, không bọc trong markdown code bl
 
 def summarize_transcript(transcript: list[dict], session: InterviewSession | None = None) -> str:
     """Summarize the interview transcript using Gemini API with focus on learning outcomes."""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    router = get_gemini_router()
+    if not router.configured:
         logger.error("GEMINI_API_KEY not found in environment variables")
         raise ValueError("GEMINI_API_KEY not found in environment variables")
 
     try:
-        endpoint = (
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent"
-        )
-        
         conversation = "\n".join(
-            f"Câu hỏi {i+1}: {t['question']}\nTrả lời: {t['answer']}\nĐiểm: {t['score']}/5\nPhản hồi: {t['feedback']}\n" 
+            f"Câu hỏi {i+1}: {t['question']}\nTrả lời: {t['answer']}\nĐiểm: {t['score']}/10\nPhản hồi: {t['feedback']}\n" 
             for i, t in enumerate(transcript)
         )
         
@@ -299,7 +332,6 @@ def summarize_transcript(transcript: list[dict], session: InterviewSession | Non
 Bạn là một chuyên gia tư vấn nghề nghiệp. Hãy tóm tắt buổi phỏng vấn luyện tập này:
 
 Thông tin phiên phỏng vấn:
-- Vị trí: {session.role if session else 'N/A'} - {session.position if session else 'N/A'}
 - Lĩnh vực: {session.field if session else 'N/A'} / {session.specialization if session else 'N/A'}
 - Kinh nghiệm: {session.experience_level if session else 'N/A'}
 
@@ -317,7 +349,7 @@ Trả về tóm tắt bằng tiếng Việt, ngắn gọn nhưng đầy đủ th
 """
         
         payload = {"contents": [{"parts": [{"text": summary_prompt}]}]}
-        resp = requests.post(endpoint, params={"key": api_key}, json=payload, timeout=30)
+        resp = router.post("summary", payload, timeout=30)
         
         logger.info(f"Gemini API summary response status: {resp.status_code}")
         
@@ -1,41 +1,24 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.utils import secure_filename
 
 import os
+import time
 import uuid
 import logging
 
-try:
-    import cloudinary
-    import cloudinary.uploader
-except Exception as e:  # pragma: no cover - environment specific
-    logging.warning(f"Cloudinary not available: {e}")
-    cloudinary = None
-
 from app.database import get_session, User
 from app.utils import token_required
+from app.passwords import hash_password, verify_password
+from app.tokens import issue_tokens, revoke_user_tokens
+from app.storage import get_storage
+from app.avatars import (
+    AVATAR_FOLDER, MAX_AVATAR_BYTES, processing_available, submit_avatar, set_avatar,
+)
+from app.routes.auth import avatar_variants
 
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
 
-# Cloudinary configuration for avatar uploads
-Cloud_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
-Cloud_API_KEY = os.getenv("CLOUDINARY_API_KEY")
-Cloud_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
-AVATAR_FOLDER = os.getenv("CLOUDINARY_AVATAR_FOLDER")
-
-if cloudinary and Cloud_NAME and Cloud_API_KEY and Cloud_API_SECRET:
-    try:  # pragma: no cover - just configuration
-        cloudinary.config(
-            cloud_name=Cloud_NAME,
-            api_key=Cloud_API_KEY,
-            api_secret=Cloud_API_SECRET,
-            secure=True,
-        )
-    except Exception as e:  # pragma: no cover
-        logging.error(f"Failed to configure Cloudinary: {e}")
-
-
 @users_bp.route('/profile', methods=['PUT'])
 @token_required
 def update_profile(current_user):
@@ -97,14 +80,17 @@ def change_password(current_user):
     new_password = data.get('new_password') or data.get('newPassword')
     if not current_password or not new_password:
         return jsonify({'error': 'Missing current or new password'}), 400
-    if not check_password_hash(current_user.password_hash, current_password):
+    ok, _ = verify_password(current_user.password_hash, current_password)
+    if not ok:
         return jsonify({'error': 'Current password is incorrect'}), 400
     session = get_session()
     try:
-        current_user.password_hash = generate_password_hash(new_password)
+        current_user.password_hash = hash_password(new_password)
         session.merge(current_user)
+        # Sign out other devices; this one continues with the new pair
+        revoke_user_tokens(session, current_user.id)
         session.commit()
-        return jsonify({'message': 'Password changed'}), 200
+        return jsonify({'message': 'Password changed', **issue_tokens(session, current_user.id)}), 200
     finally:
         session.close()
 
@@ -112,30 +98,42 @@ def change_password(current_user):
 @users_bp.route('/avatar', methods=['POST'])
 @token_required
 def update_avatar(current_user):
-    """Upload and update the user's avatar on Cloudinary."""
-    if not cloudinary or not Cloud_NAME:
-        return jsonify({'error': 'Cloudinary not configured'}), 500
-
+    """Upload the user's avatar; resized WebP variants are generated in the background."""
     avatar_file = request.files.get('avatar')
     if not avatar_file:
         return jsonify({'error': 'Missing avatar file'}), 400
 
+    avatar_file.seek(0, 2)
+    size = avatar_file.tell()
+    avatar_file.seek(0)
+    if size == 0:
+        return jsonify({'error': 'Empty avatar file'}), 400
+    if size > MAX_AVATAR_BYTES:
+        return jsonify({'error': 'Avatar file too large'}), 413
+
+    if processing_available():
+        try:
+            submit_avatar(current_user.id, avatar_file)
+        except ValueError:
+            return jsonify({'error': 'Invalid image file'}), 400
+        except Exception:
+            logging.exception('Error queueing avatar')
+            return jsonify({'error': 'Failed to upload avatar'}), 500
+        # The current avatar stays until the new variants are stored; poll /auth/me
+        return jsonify({
+            'avatar_url': current_user.avatar_url,
+            'avatar_variants': avatar_variants(current_user),
+            'status': 'processing',
+            'message': 'Avatar is being processed',
+        }), 202
+
     session = get_session()
     try:
-        public_id = f"avatar_{current_user.id}_{uuid.uuid4().hex[:8]}"
-        upload_result = cloudinary.uploader.upload(
-            avatar_file,
-            folder=AVATAR_FOLDER,
-            public_id=public_id,
-            overwrite=True,
-        )
-        avatar_url = upload_result.get('secure_url') or upload_result.get('url')
-        if not avatar_url:
-            return jsonify({'error': 'Upload failed'}), 500
-
-        current_user.avatar_url = avatar_url
-        session.merge(current_user)
-        session.commit()
+        ext = os.path.splitext(secure_filename(avatar_file.filename or ''))[1].lower() or '.jpg'
+        key = f"{AVATAR_FOLDER}/avatar_{current_user.id}_{uuid.uuid4().hex[:8]}{ext}"
+        avatar_url = get_storage().save(key, avatar_file, wait=True)
+
+        set_avatar(session, current_user.id, time.time_ns(), avatar_url, None)
         return jsonify({'avatar_url': avatar_url, 'message': 'Avatar updated'}), 200
     except Exception:
         session.rollback()
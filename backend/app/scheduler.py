@@ -0,0 +1,62 @@
+"""Minimal in-process scheduler for periodic background jobs (daemon threads)."""
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_JOBS_ENABLED = os.getenv("BACKGROUND_JOBS", "1") != "0"
+
+
+class PeriodicJob(threading.Thread):
+    """Run ``fn`` every ``interval`` seconds until stopped; errors are logged, not raised."""
+
+    def __init__(self, name, interval, fn, run_immediately=True):
+        super().__init__(name=f"job-{name}", daemon=True)
+        self.job_name = name
+        self.interval = interval
+        self.fn = fn
+        self.run_immediately = run_immediately
+        self._stop_event = threading.Event()
+
+    def run(self):
+        if not self.run_immediately and self._stop_event.wait(self.interval):
+            return
+        while True:
+            try:
+                self.fn()
+            except Exception as e:
+                logger.error(f"Background job {self.job_name} failed: {e}")
+            if self._stop_event.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def schedule(name, interval, fn, run_immediately=True):
+    """Start ``fn`` as a periodic job unless one with the same name is already running."""
+    if not BACKGROUND_JOBS_ENABLED:
+        logger.info(f"Background jobs disabled, not scheduling {name}")
+        return None
+    with _jobs_lock:
+        job = _jobs.get(name)
+        if job is not None and job.is_alive():
+            return job
+        job = PeriodicJob(name, interval, fn, run_immediately=run_immediately)
+        _jobs[name] = job
+        job.start()
+        logger.info(f"Scheduled background job {name} every {interval}s")
+        return job
+
+
+def stop_all():
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+        _jobs.clear()
+    for job in jobs:
+        job.stop()
@@ -0,0 +1,195 @@
+"""Cross-user percentile of a session score within its cohort.
+
+A cohort is ``(field, specialization, experience_level)``. ``score_histogram_bins``
+holds, per cohort, how many completed sessions have an average score in each
+``BIN_WIDTH``-wide bin (empty bins are not stored, so a cohort is at most 101 rows).
+
+- A background job rebuilds the table from all completed sessions every
+  ``REFRESH_INTERVAL`` seconds. Every worker schedules it, but one rebuild runs at a time
+  (a Postgres advisory lock) and a worker skips it when another rebuilt the table less
+  than half an interval ago.
+- Between rebuilds, every transition to ``da_hoan_thanh`` adds its session to its bin
+  (``events.SESSION_STATUS_CHANGED``). The next rebuild corrects any drift, e.g. a
+  completion that committed while a rebuild was running.
+- ``percentile`` reads a cohort once per ``CACHE_TTL`` seconds into sorted bins and
+  prefix sums. After that, each lookup is a bisect: O(log bins).
+"""
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete, insert, func, text
+from sqlalchemy.exc import IntegrityError
+
+from app import events
+from app.database import engine, get_session, InterviewSession, InterviewAnswer, ScoreHistogramBin
+from app.scheduler import schedule
+from app.session_lifecycle import COMPLETED
+from app.session_results import SCORE_SCALE
+
+logger = logging.getLogger(__name__)
+
+BIN_WIDTH = float(os.getenv("SCORE_HISTOGRAM_BIN_WIDTH", "0.1"))
+REFRESH_INTERVAL = float(os.getenv("SCORE_HISTOGRAM_REFRESH_INTERVAL", "3600"))
+CACHE_TTL = float(os.getenv("SCORE_HISTOGRAM_CACHE_TTL", "60"))
+# Below this many sessions a percentile says little; the endpoint reports none
+MIN_COHORT_SIZE = int(os.getenv("SCORE_RANK_MIN_COHORT", "20"))
+MAX_BIN = int(round(SCORE_SCALE / BIN_WIDTH))
+# Arbitrary key of the Postgres advisory lock serializing rebuilds
+REFRESH_LOCK_ID = 500_050
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def cohort_of(interview_session):
+    return (interview_session.field or '', interview_session.specialization or '',
+            interview_session.experience_level or '')
+
+
+def bin_of(score):
+    # The epsilon keeps 0.3 / 0.1 = 2.999... in bin 3
+    return min(max(int(score / BIN_WIDTH + 1e-9), 0), MAX_BIN)
+
+
+def _session_scores():
+    """Per completed session: cohort columns and average score (unanswered count as 0)."""
+    return (
+        select(
+            InterviewSession.field,
+            InterviewSession.specialization,
+            InterviewSession.experience_level,
+            func.avg(func.coalesce(InterviewAnswer.score, 0)),
+        )
+        .join(InterviewAnswer, InterviewAnswer.session_id == InterviewSession.id)
+        .where(InterviewSession.status == COMPLETED)
+        .group_by(InterviewSession.id)
+    )
+
+
+def session_score(db, session_id):
+    """Average answer score of one session, as in the history list; None without answers."""
+    avg = db.execute(
+        select(func.avg(func.coalesce(InterviewAnswer.score, 0)))
+        .where(InterviewAnswer.session_id == session_id)
+    ).scalar()
+    return float(avg) if avg is not None else None
+
+
+def refresh_score_histograms(force=False):
+    """Rebuild every cohort's histogram from the completed sessions; returns the session count,
+    or None when skipped (another worker is rebuilding or just did)."""
+    counts = Counter()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            # Held until commit; a concurrent rebuild would not see our inserted rows
+            if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {'id': REFRESH_LOCK_ID}).scalar():
+                return None
+        if not force:
+            last = conn.execute(select(func.max(ScoreHistogramBin.refreshed_at))).scalar()
+            if last is not None and last > now - timedelta(seconds=REFRESH_INTERVAL / 2):
+                return None
+        for field, specialization, level, avg in conn.execute(_session_scores()).yield_per(5000):
+            counts[(field or '', specialization or '', level or '', bin_of(float(avg)))] += 1
+        conn.execute(delete(ScoreHistogramBin))
+        if counts:
+            conn.execute(insert(ScoreHistogramBin), [
+                {'field': f, 'specialization': s, 'experience_level': lvl, 'bin': b, 'count': n,
+                 'refreshed_at': now}
+                for (f, s, lvl, b), n in counts.items()
+            ])
+    with _cache_lock:
+        _cache.clear()
+    total = sum(counts.values())
+    logger.info(f"Rebuilt score histograms: {total} sessions in {len({k[:3] for k in counts})} cohorts")
+    return total
+
+
+def add_score(db, cohort, score):
+    """Count one more session with ``score`` in ``cohort``; commits."""
+    field, specialization, level = cohort
+    key = (ScoreHistogramBin.field == field, ScoreHistogramBin.specialization == specialization,
+           ScoreHistogramBin.experience_level == level, ScoreHistogramBin.bin == bin_of(score))
+    increment = update(ScoreHistogramBin).where(*key).values(count=ScoreHistogramBin.count + 1)
+    if db.execute(increment).rowcount == 0:
+        try:
+            db.add(ScoreHistogramBin(field=field, specialization=specialization, experience_level=level,
+                                     bin=bin_of(score), count=1))
+            db.commit()
+        except IntegrityError:
+            # A concurrent completion created the bin first
+            db.rollback()
+            db.execute(increment)
+            db.commit()
+    else:
+        db.commit()
+    with _cache_lock:
+        _cache.pop(cohort, None)
+
+
+def _on_session_completed(session_id, to_status, **_):
+    if to_status != COMPLETED:
+        return
+    db = get_session()
+    try:
+        interview_session = db.get(InterviewSession, session_id)
+        score = session_score(db, session_id)
+        if interview_session is not None and score is not None:
+            add_score(db, cohort_of(interview_session), score)
+    finally:
+        db.close()
+
+
+def _load_cohort(cohort):
+    field, specialization, level = cohort
+    db = get_session()
+    try:
+        rows = db.execute(
+            select(ScoreHistogramBin.bin, ScoreHistogramBin.count)
+            .where(ScoreHistogramBin.field == field, ScoreHistogramBin.specialization == specialization,
+                   ScoreHistogramBin.experience_level == level)
+            .order_by(ScoreHistogramBin.bin)
+        ).all()
+    finally:
+        db.close()
+    bins, counts, below = [], [], [0]
+    for b, n in rows:
+        bins.append(b)
+        counts.append(n)
+        below.append(below[-1] + n)
+    return bins, counts, below
+
+
+def _cohort_histogram(cohort):
+    """``(bins, counts, below)``: sorted bins, their counts and prefix sums (``below[i]`` = sessions in bins before ``bins[i]``)."""
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(cohort)
+    if cached is not None and now - cached[0] < CACHE_TTL:
+        return cached[1]
+    histogram = _load_cohort(cohort)
+    with _cache_lock:
+        _cache[cohort] = (now, histogram)
+    return histogram
+
+
+def percentile(cohort, score):
+    """``(percent of the cohort scoring below score, cohort size)``; ties within a bin count half."""
+    bins, counts, below = _cohort_histogram(cohort)
+    total = below[-1]
+    if not total:
+        return None, 0
+    b = bin_of(score)
+    i = bisect_left(bins, b)
+    same = counts[i] if i < len(bins) and bins[i] == b else 0
+    return round((below[i] + same / 2) / total * 100, 1), total
+
+
+def init_score_ranking():
+    events.subscribe(events.SESSION_STATUS_CHANGED, _on_session_completed)
+    schedule('score-histograms', REFRESH_INTERVAL, refresh_score_histograms)
@@ -0,0 +1,227 @@
+"""Full-text search over a user's interview questions and answers.
+
+Each question has one ``search_documents`` row holding the question, the answer
+transcript and the feedback, lowercased and folded to ASCII (Vietnamese diacritics
+and ``đ`` removed) so "phong van" finds "Phỏng vấn". Queries are folded the same way
+and every word must match as a prefix.
+
+The row is rewritten in the same transaction as any ORM insert or update of the
+question or its answer (a flush listener on ``SessionLocal``); a background job
+backfills questions that have no document yet (existing data, bulk inserts).
+
+Backends: Postgres uses a GIN index on ``to_tsvector('simple', document)`` ranked
+with ``ts_rank``; SQLite mirrors the documents into an FTS5 table ranked with
+``bm25``; anything else falls back to ``LIKE`` without ranking.
+"""
+import os
+import re
+import logging
+import unicodedata
+
+from sqlalchemy import (
+    event, select, insert, delete, func, text, and_, literal_column, bindparam,
+)
+
+from app.database import (
+    engine, SessionLocal, SearchDocument, InterviewSession, InterviewQuestion, InterviewAnswer,
+    QuestionNote,
+)
+from app.scheduler import schedule
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_INTERVAL = float(os.getenv("SEARCH_BACKFILL_INTERVAL", "3600"))
+BACKFILL_BATCH_SIZE = int(os.getenv("SEARCH_BACKFILL_BATCH_SIZE", "500"))
+MAX_QUERY_TOKENS = 8
+FTS_TABLE = "search_documents_fts"
+
+POSTGRES = 'postgresql'
+FTS5 = 'fts5'
+LIKE = 'like'
+
+_backend = None
+_TSCONFIG = literal_column("'simple'::regconfig")
+
+
+def fold(value):
+    """Lowercase and strip diacritics: ``"Đánh giá"`` -> ``"danh gia"``."""
+    value = unicodedata.normalize('NFD', (value or '').lower().replace('đ', 'd'))
+    return unicodedata.normalize('NFC', ''.join(ch for ch in value if not unicodedata.combining(ch)))
+
+
+def query_tokens(query):
+    return re.findall(r"\w+", fold(query))[:MAX_QUERY_TOKENS]
+
+
+def excerpt(value, tokens, width=160):
+    """A ``width``-character window of ``value`` around the first matching token."""
+    value = unicodedata.normalize('NFC', value or '')
+    if len(value) <= width:
+        return value or None
+    # Folding keeps NFC text the same length, so positions carry over
+    folded = fold(value)
+    positions = [p for p in (folded.find(t) for t in tokens) if p >= 0]
+    start = max(0, min(positions) - width // 3) if positions else 0
+    snippet = value[start:start + width]
+    return ('…' if start > 0 else '') + snippet + ('…' if start + width < len(value) else '')
+
+
+def get_backend():
+    return _backend or LIKE
+
+
+def _document_rows(conn, question_ids):
+    rows = conn.execute(
+        select(InterviewQuestion.id, InterviewQuestion.session_id, InterviewSession.user_id,
+               InterviewQuestion.content, InterviewAnswer.transcript_text, InterviewAnswer.feedback)
+        .join(InterviewSession, InterviewSession.id == InterviewQuestion.session_id)
+        .outerjoin(InterviewAnswer, and_(InterviewAnswer.session_id == InterviewQuestion.session_id,
+                                         InterviewAnswer.question_id == InterviewQuestion.id))
+        .where(InterviewQuestion.id.in_(question_ids), InterviewSession.user_id.isnot(None))
+    ).all()
+    return [
+        {
+            'question_id': qid,
+            'session_id': session_id,
+            'user_id': user_id,
+            'document': fold(' '.join(part for part in (content, transcript, feedback) if part)),
+        }
+        for qid, session_id, user_id, content, transcript, feedback in rows
+    ]
+
+
+def index_questions(conn, question_ids):
+    """(Re)write the documents of ``question_ids`` on ``conn``, inside the caller's transaction."""
+    question_ids = list(question_ids)
+    rows = _document_rows(conn, question_ids)
+    conn.execute(delete(SearchDocument).where(SearchDocument.question_id.in_(question_ids)))
+    if rows:
+        conn.execute(insert(SearchDocument), rows)
+    if get_backend() == FTS5:
+        conn.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(bindparam('ids', expanding=True)),
+            {'ids': question_ids},
+        )
+        if rows:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, document) VALUES (:question_id, :document)"),
+                         [{'question_id': r['question_id'], 'document': r['document']} for r in rows])
+    return len(rows)
+
+
+def _index_on_flush(db, flush_context):
+    question_ids = set()
+    for obj in list(db.new) + list(db.dirty) + list(db.deleted):
+        if isinstance(obj, InterviewQuestion) and obj not in db.deleted:
+            question_ids.add(obj.id)
+        elif isinstance(obj, InterviewAnswer):
+            question_ids.add(obj.question_id)
+    question_ids.discard(None)
+    if question_ids:
+        index_questions(db.connection(), question_ids)
+
+
+def backfill_search_index(batch_size=BACKFILL_BATCH_SIZE):
+    """Index questions that have no document yet; returns how many were indexed.
+
+    Pages on question id: questions that cannot be indexed (session without a user,
+    orphaned rows) stay missing and must not be selected again.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            missing = conn.execute(
+                select(InterviewQuestion.id)
+                .outerjoin(SearchDocument, SearchDocument.question_id == InterviewQuestion.id)
+                .where(SearchDocument.question_id.is_(None), InterviewQuestion.id > last_id)
+                .order_by(InterviewQuestion.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if missing:
+                total += index_questions(conn, missing)
+        if len(missing) < batch_size:
+            break
+        last_id = missing[-1]
+    if total:
+        logger.info(f"Indexed {total} questions for search")
+    return total
+
+
+def search(db, user_id, query, limit, offset=0, saved_only=False):
+    """Return ``[(question_id, rank)]`` best first (at most ``limit + 1`` rows, for paging)."""
+    tokens = query_tokens(query)
+    if not tokens:
+        return []
+    saved = select(QuestionNote.question_id).where(QuestionNote.user_id == user_id)
+    backend = get_backend()
+
+    if backend == POSTGRES:
+        tsquery = func.to_tsquery(_TSCONFIG, ' & '.join(f"{t}:*" for t in tokens))
+        vector = func.to_tsvector(_TSCONFIG, SearchDocument.document)
+        rank = func.ts_rank(vector, tsquery)
+        stmt = (
+            select(SearchDocument.question_id, rank)
+            .where(SearchDocument.user_id == user_id, vector.op('@@')(tsquery))
+            .order_by(rank.desc(), SearchDocument.question_id.desc())
+        )
+    elif backend == FTS5:
+        # Quoted prefix terms: user input never reaches the FTS5 query syntax
+        stmt = text(
+            f"SELECT d.question_id, bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} "
+            f"JOIN search_documents d ON d.question_id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :match AND d.user_id = :user_id "
+            + ("AND d.question_id IN (SELECT question_id FROM question_notes WHERE user_id = :user_id) "
+               if saved_only else "")
+            # bm25 is lower for better matches
+            + "ORDER BY rank, d.question_id DESC LIMIT :limit OFFSET :offset"
+        )
+        return db.execute(stmt, {
+            'match': ' '.join(f'"{t}"*' for t in tokens), 'user_id': user_id,
+            'limit': limit + 1, 'offset': offset,
+        }).all()
+    else:
+        stmt = (
+            select(SearchDocument.question_id, literal_column("0"))
+            .where(SearchDocument.user_id == user_id,
+                   *[SearchDocument.document.like(f"%{t.replace('_', '!_')}%", escape='!') for t in tokens])
+            .order_by(SearchDocument.question_id.desc())
+        )
+    if saved_only:
+        stmt = stmt.where(SearchDocument.question_id.in_(saved))
+    return db.execute(stmt.limit(limit + 1).offset(offset)).all()
+
+
+def _setup_backend():
+    dialect = engine.dialect.name
+    if dialect == 'postgresql':
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_search_documents_tsv ON search_documents "
+                "USING GIN (to_tsvector('simple'::regconfig, document))"
+            ))
+        return POSTGRES
+    if dialect == 'sqlite':
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                                      {'name': FTS_TABLE}).first()
+                if not exists:
+                    conn.execute(text(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document)"))
+                    conn.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, document) "
+                                      "SELECT question_id, document FROM search_documents"))
+            return FTS5
+        except Exception as e:
+            logger.warning(f"SQLite FTS5 unavailable, search falls back to LIKE: {e}")
+    return LIKE
+
+
+def init_search():
+    global _backend
+    try:
+        _backend = _setup_backend()
+    except Exception as e:
+        logger.error(f"Setting up the search index failed, falling back to LIKE: {e}")
+        _backend = LIKE
+    if not event.contains(SessionLocal, 'after_flush', _index_on_flush):
+        event.listen(SessionLocal, 'after_flush', _index_on_flush)
+    schedule('search-backfill', BACKFILL_INTERVAL, backfill_search_index)
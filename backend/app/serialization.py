@@ -0,0 +1,125 @@
+"""Fast JSON provider and response compression.
+
+``JSON_PROVIDER=orjson`` (the default when orjson is installed) swaps Flask's JSON
+provider for one that encodes with orjson straight to UTF-8 bytes. Output stays
+compatible with the default provider: keys are sorted, datetimes use the same HTTP
+date format, and anything orjson cannot encode (Decimal, very large ints, pretty
+printing in debug) falls back to the standard encoder.
+
+Responses of a compressible type larger than ``COMPRESS_MIN_SIZE`` bytes are
+compressed with brotli (if installed) or gzip, whichever the client prefers.
+Streamed and file responses are left alone.
+"""
+import os
+import gzip
+import time
+import logging
+
+from flask import request
+
+try:
+    import orjson
+except Exception as e:
+    logging.warning(f"orjson not available, using the standard JSON encoder: {e}")
+    orjson = None
+
+try:
+    import brotli
+except Exception:  # pragma: no cover - optional dependency
+    brotli = None
+
+from app.profiling import TimedJSONProvider, record_timing
+from app.metrics import response_bytes
+
+logger = logging.getLogger(__name__)
+
+JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")
+COMPRESS_ENABLED = os.getenv("COMPRESS_RESPONSES", "1") != "0"
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+# Dynamic responses: low brotli qualities are already smaller than gzip -6 and much faster
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+}
+
+
+class OrjsonProvider(TimedJSONProvider):
+    """``TimedJSONProvider`` encoding with orjson; same output contract as the default."""
+
+    option = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+              if orjson is not None else 0)
+
+    def _encode(self, obj):
+        """UTF-8 bytes, or None when orjson cannot encode ``obj``."""
+        started = time.perf_counter()
+        try:
+            return orjson.dumps(obj, default=self.default, option=self.option)
+        except TypeError:
+            return None
+        finally:
+            record_timing('ser', time.perf_counter() - started)
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            data = self._encode(obj)
+            if data is not None:
+                return data.decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if not (self.compact is None and self._app.debug) and self.compact is not False:
+            data = self._encode(obj)
+            if data is not None:
+                return self._app.response_class(data + b"\n", mimetype=self.mimetype)
+        return super().response(obj)
+
+
+def _choose_encoding():
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def _compress(response):
+    if (not COMPRESS_ENABLED or response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype in COMPRESSIBLE_TYPES or (response.mimetype or '').startswith('text/'))):
+        return response
+    # Vary even when this response is too small: the same URL may be large next time
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    started = time.perf_counter()
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    record_timing('compress', time.perf_counter() - started)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # A strong ETag must differ per encoding; the weak form stays valid for revalidation
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    response_bytes.inc(len(data), encoding='identity')
+    response_bytes.inc(len(compressed), encoding=encoding)
+    return response
+
+
+def init_serialization(app):
+    if JSON_PROVIDER == 'orjson' and orjson is not None:
+        app.json = OrjsonProvider(app)
+    app.after_request(_compress)
@@ -0,0 +1,149 @@
+"""Interview session state machine and the background session-expiry sweeper.
+
+    dang_dien_ra --finish / expired with answers--> da_hoan_thanh
+    dang_dien_ra --expired without answers--------> da_huy
+
+Every transition emits ``events.SESSION_STATUS_CHANGED`` with
+``session_id, user_id, from_status, to_status, reason`` once it is committed.
+"""
+import os
+import logging
+from datetime import datetime
+
+from sqlalchemy import update, select, exists, case, cast
+
+from app import events
+from app.database import get_session, InterviewSession, InterviewQuestion, InterviewAnswer
+from app.conditional import bump_versions
+from app.scheduler import schedule
+
+logger = logging.getLogger(__name__)
+
+ONGOING = 'dang_dien_ra'
+COMPLETED = 'da_hoan_thanh'
+CANCELLED = 'da_huy'
+
+TRANSITIONS = {
+    ONGOING: {COMPLETED, CANCELLED},
+    COMPLETED: set(),
+    CANCELLED: set(),
+}
+
+SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+SWEEP_BATCH_SIZE = int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "500"))
+# Generate the AI summary in the background for sessions the sweeper completes
+SWEEP_SUMMARIZE = os.getenv("SESSION_SWEEP_SUMMARIZE", "0") == "1"
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def can_transition(from_status, to_status):
+    return to_status in TRANSITIONS.get(from_status, set())
+
+
+def transition(interview_session, to_status):
+    """Move an ORM session to ``to_status``; returns the event payload to emit after commit."""
+    from_status = interview_session.status
+    if not can_transition(from_status, to_status):
+        raise InvalidTransition(f"Cannot move session {interview_session.id} from {from_status} to {to_status}")
+    interview_session.status = to_status
+    return {
+        'session_id': interview_session.id,
+        'user_id': interview_session.user_id,
+        'from_status': from_status,
+        'to_status': to_status,
+    }
+
+
+def emit_transition(payload, reason):
+    events.emit(events.SESSION_STATUS_CHANGED, reason=reason, **payload)
+
+
+def build_transcript(db, session_id):
+    """Question / answer pairs of a session, in answer order, loaded with one join."""
+    rows = (
+        db.query(InterviewAnswer, InterviewQuestion.content)
+        .outerjoin(InterviewQuestion, InterviewQuestion.id == InterviewAnswer.question_id)
+        .filter(InterviewAnswer.session_id == session_id)
+        .order_by(InterviewAnswer.id)
+        .all()
+    )
+    return [
+        {
+            'question_id': ans.question_id,
+            'question': content or '',
+            'answer': ans.transcript_text,
+            'feedback': ans.feedback,
+            'score': ans.score,
+            'audio_url': ans.user_answer_audio_url,
+        }
+        for ans, content in rows
+    ]
+
+
+def sweep_expired_sessions(batch_size=SWEEP_BATCH_SIZE, now=None):
+    """Close ongoing sessions past ``expires_at``, one bulk UPDATE per batch.
+
+    Sessions with at least one answer become ``da_hoan_thanh``, the rest ``da_huy``.
+    Returns the number of sessions transitioned.
+    """
+    now = now or datetime.utcnow()
+    has_answers = exists().where(InterviewAnswer.session_id == InterviewSession.id)
+    total = 0
+    while True:
+        expired_ids = (
+            select(InterviewSession.id)
+            .where(InterviewSession.status == ONGOING, InterviewSession.expires_at < now)
+            .order_by(InterviewSession.expires_at)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(InterviewSession)
+            .where(InterviewSession.id.in_(expired_ids), InterviewSession.status == ONGOING)
+            .values(status=cast(case((has_answers, COMPLETED), else_=CANCELLED), InterviewSession.status.type),
+                    content_version=InterviewSession.content_version + 1)
+            .returning(InterviewSession.id, InterviewSession.user_id, InterviewSession.status)
+            .execution_options(synchronize_session=False)
+        )
+        db = get_session()
+        try:
+            rows = db.execute(stmt).all()
+            # Bulk UPDATE skips the flush listener; invalidate the owners' cached history
+            if rows:
+                bump_versions(db, user_ids={user_id for _, user_id, _ in rows})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        for session_id, user_id, status in rows:
+            emit_transition({
+                'session_id': session_id,
+                'user_id': user_id,
+                'from_status': ONGOING,
+                'to_status': status,
+            }, reason='expired')
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    if total:
+        logger.info(f"Session sweeper closed {total} expired sessions")
+    return total
+
+
+def _summarize_expired(session_id, to_status, reason, **_):
+    if reason == 'expired' and to_status == COMPLETED:
+        from app.session_results import summarize_finished_session
+        summarize_finished_session(session_id)
+
+
+def init_session_lifecycle():
+    if SWEEP_SUMMARIZE:
+        events.subscribe(events.SESSION_STATUS_CHANGED, _summarize_expired)
+    schedule('session-sweeper', SWEEP_INTERVAL, sweep_expired_sessions)
@@ -0,0 +1,188 @@
+"""Score aggregates and AI summary of finished sessions, persisted in ``session_results``.
+
+The aggregates are computed once when a session is finished. The summary is generated
+at most once per session: callers claim the row by moving it to ``generating`` with a
+conditional UPDATE, so concurrent finishes or the sweeper never call Gemini twice. The
+claim is a lease: a worker that dies mid-generation leaves the row reclaimable after
+``SUMMARY_LEASE_SECONDS``.
+"""
+import os
+import logging
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import update, and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from app.database import get_session, InterviewSession, SessionResult
+from app.session_lifecycle import build_transcript
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+GENERATING = 'generating'
+READY = 'ready'
+FAILED = 'failed'
+
+# A generating row not finished after this long belongs to a dead worker and may be reclaimed
+SUMMARY_LEASE_SECONDS = float(os.getenv("SUMMARY_LEASE_SECONDS", "300"))
+
+# Answers are scored 0-10 by the evaluation prompt
+SCORE_SCALE = 10
+
+_summary_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SUMMARY_WORKERS", "2")),
+                                       thread_name_prefix="summary")
+
+
+def performance_level(score_percentage):
+    if score_percentage >= 90:
+        return "Xuất sắc (A+)"
+    if score_percentage >= 80:
+        return "Tốt (A)"
+    if score_percentage >= 70:
+        return "Khá (B+)"
+    if score_percentage >= 60:
+        return "Trung bình khá (B)"
+    if score_percentage >= 50:
+        return "Trung bình (C)"
+    return "Cần cải thiện (D)"
+
+
+def compute_aggregates(transcript):
+    total_score = sum(t['score'] or 0 for t in transcript)
+    max_possible_score = len(transcript) * SCORE_SCALE
+    average_score = total_score / len(transcript) if transcript else 0
+    score_percentage = (total_score / max_possible_score) * 100 if max_possible_score > 0 else 0
+    return {
+        'total_score': total_score,
+        'max_possible_score': max_possible_score,
+        'average_score': round(average_score, 2),
+        'score_percentage': round(score_percentage, 1),
+        'performance_level': performance_level(score_percentage),
+        'total_questions': len(transcript),
+    }
+
+
+def get_or_create_result(db, session_id, transcript):
+    """Return the session's result row, creating it (status pending) from ``transcript``."""
+    result = db.get(SessionResult, session_id)
+    if result is not None:
+        return result
+    result = SessionResult(session_id=session_id, status=PENDING, **compute_aggregates(transcript))
+    db.add(result)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent finish created it first
+        db.rollback()
+        result = db.get(SessionResult, session_id)
+    return result
+
+
+def _claim(db, session_id):
+    """Atomically move a pending/failed result, or one whose generation lease expired, to
+    generating; returns the claim timestamp if we own it now, else None."""
+    now = datetime.utcnow()
+    lease_expired = and_(
+        SessionResult.status == GENERATING,
+        or_(SessionResult.claimed_at.is_(None),
+            SessionResult.claimed_at < now - timedelta(seconds=SUMMARY_LEASE_SECONDS)),
+    )
+    claimed = db.execute(
+        update(SessionResult)
+        .where(SessionResult.session_id == session_id,
+               or_(SessionResult.status.in_((PENDING, FAILED)), lease_expired))
+        .values(status=GENERATING, error=None, claimed_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return now if claimed == 1 else None
+
+
+def _finish_claim(db, session_id, claimed_at, **values):
+    """Store the outcome unless the lease was taken over by another worker meanwhile."""
+    db.execute(
+        update(SessionResult)
+        .where(SessionResult.session_id == session_id, SessionResult.status == GENERATING,
+               SessionResult.claimed_at == claimed_at)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def generate_summary(session_id):
+    """Generate and store the summary unless another worker already did or is doing it.
+
+    Returns the result status afterwards. Raises ``RuntimeError`` when generation fails
+    (the row is left ``failed`` so a later finish can retry). A worker that dies mid-way
+    leaves the row ``generating``; it is claimable again after ``SUMMARY_LEASE_SECONDS``.
+    """
+    from app.routes.interviews.utils import summarize_transcript
+
+    db = get_session()
+    try:
+        claimed_at = _claim(db, session_id)
+        if claimed_at is None:
+            result = db.get(SessionResult, session_id)
+            return result.status if result else None
+        try:
+            interview_session = db.get(InterviewSession, session_id)
+            transcript = build_transcript(db, session_id)
+            summary = summarize_transcript(transcript, interview_session)
+        except Exception as e:
+            db.rollback()
+            _finish_claim(db, session_id, claimed_at, status=FAILED, error=str(e)[:1000])
+            raise RuntimeError(f"Summary generation failed: {e}")
+        _finish_claim(db, session_id, claimed_at, status=READY, summary=summary)
+        logger.info(f"Stored summary for session {session_id}")
+        return READY
+    finally:
+        db.close()
+
+
+def _generate_in_background(session_id):
+    try:
+        generate_summary(session_id)
+    except Exception as e:
+        logger.error(f"Background summary for session {session_id} failed: {e}")
+
+
+def submit_summary(session_id):
+    _summary_executor.submit(_generate_in_background, session_id)
+
+
+def summarize_finished_session(session_id):
+    """Create the result row for a session finished outside the API (e.g. the sweeper) and queue its summary."""
+    db = get_session()
+    try:
+        transcript = build_transcript(db, session_id)
+        if not transcript:
+            return
+        get_or_create_result(db, session_id, transcript)
+    finally:
+        db.close()
+    submit_summary(session_id)
+
+
+def serialize_result(result, interview_session, transcript):
+    return {
+        'session_id': interview_session.id,
+        'status': result.status,
+        'summary': result.summary,
+        'total_score': result.total_score,
+        'max_possible_score': result.max_possible_score,
+        'average_score': result.average_score,
+        'score_percentage': result.score_percentage,
+        'performance_level': result.performance_level,
+        'transcript': transcript,
+        'session_stats': {
+            'total_questions': result.total_questions,
+            'questions_asked': interview_session.questions_asked,
+            'time_limit': interview_session.time_limit,
+            'field': interview_session.field,
+            'specialization': interview_session.specialization,
+            'experience_level': interview_session.experience_level,
+            'difficulty': interview_session.difficulty_setting
+        },
+    }
@@ -0,0 +1,402 @@
+"""Pluggable object storage for answer audio and avatars.
+
+Drivers (``STORAGE_BACKEND``):
+
+* ``cloudinary`` – the default when Cloudinary credentials are configured
+* ``s3``         – any S3-compatible bucket (needs boto3)
+* ``local``      – files under ``STORAGE_LOCAL_DIR``, served by ``/media/<key>?sig=...``
+  (the signature is an HMAC of the key, so stored URLs cannot be guessed from the key)
+
+URLs are deterministic per key, so ``save`` returns the final URL immediately and the
+actual upload runs on a background queue (``STORAGE_ASYNC_UPLOADS=0`` to upload inline).
+Queued files are spooled to ``STORAGE_SPOOL_DIR`` with a JSON sidecar named
+``<entry>.<claim>.inflight``: the spooling process owns the entry and keeps retrying it
+until the upload succeeds, touching the sidecar on every attempt. Claims untouched for
+``STORAGE_INFLIGHT_TIMEOUT`` (their process died) are taken over, by renaming the sidecar
+to a new claim, in the periodic spool scan of any worker, so pending uploads survive
+restarts and are uploaded by one process at a time.
+"""
+import os
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import shutil
+import logging
+import tempfile
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import cloudinary
+    import cloudinary.uploader
+    import cloudinary.utils
+except Exception as e:
+    logging.warning(f"Cloudinary not available: {e}")
+    cloudinary = None
+
+try:
+    import boto3
+except Exception:
+    boto3 = None
+
+from flask import request, has_request_context, send_from_directory, abort
+
+from app.resilience import get_breaker, backoff_delay
+from app.metrics import storage_uploads, storage_queue_depth
+from app.scheduler import schedule
+
+logger = logging.getLogger(__name__)
+
+# Cloudinary configuration
+Cloud_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
+Cloud_API_KEY = os.getenv("CLOUDINARY_API_KEY")
+Cloud_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
+# Override to point uploads at a local stand-in (e.g. benchmarks/provider_stub.py)
+Cloud_UPLOAD_PREFIX = os.getenv("CLOUDINARY_UPLOAD_PREFIX") or None
+
+if cloudinary and Cloud_NAME and Cloud_API_KEY and Cloud_API_SECRET:
+    try:
+        cloudinary.config(
+            cloud_name=Cloud_NAME,
+            api_key=Cloud_API_KEY,
+            api_secret=Cloud_API_SECRET,
+            secure=True,
+            upload_prefix=Cloud_UPLOAD_PREFIX,
+        )
+        logger.info("Cloudinary configured successfully")
+    except Exception as e:
+        logger.error(f"Failed to configure Cloudinary: {e}")
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "").lower()
+LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR") or os.path.join(os.getcwd(), "media")
+# Absolute base for local media URLs (e.g. https://api.example.com); defaults to the request host,
+# or to the host_url a background job captured from its request
+PUBLIC_BASE_URL = os.getenv("STORAGE_PUBLIC_BASE_URL", "").rstrip("/")
+MEDIA_MAX_AGE = int(os.getenv("STORAGE_MEDIA_MAX_AGE", "86400"))
+# Signs local media URLs; defaults to the app secret
+MEDIA_URL_SECRET = os.getenv("STORAGE_URL_SECRET") or os.getenv("SECRET_KEY", "dev-secret")
+
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION") or None
+S3_PUBLIC_BASE_URL = os.getenv("S3_PUBLIC_BASE_URL", "").rstrip("/")
+
+ASYNC_UPLOADS = os.getenv("STORAGE_ASYNC_UPLOADS", "1") != "0"
+UPLOAD_WORKERS = int(os.getenv("STORAGE_UPLOAD_WORKERS", "4"))
+UPLOAD_RETRIES = int(os.getenv("STORAGE_UPLOAD_RETRIES", "5"))
+SPOOL_DIR = os.getenv("STORAGE_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "storage-spool")
+# After UPLOAD_RETRIES quick attempts, keep retrying at this interval until the upload succeeds
+UPLOAD_PARK_DELAY = float(os.getenv("STORAGE_UPLOAD_PARK_DELAY", "60"))
+# A claimed spool entry untouched this long belongs to a dead process and may be taken over
+INFLIGHT_TIMEOUT = float(os.getenv("STORAGE_INFLIGHT_TIMEOUT", "600"))
+SPOOL_SCAN_INTERVAL = float(os.getenv("STORAGE_SPOOL_SCAN_INTERVAL", "300"))
+INFLIGHT_SUFFIX = '.inflight'
+
+
+def content_type_for(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+class CloudinaryStorage:
+    name = 'cloudinary'
+
+    @staticmethod
+    def _resource(key, content_type):
+        public_id, ext = os.path.splitext(key)
+        kind = (content_type or content_type_for(key)).split('/')[0]
+        # Cloudinary stores audio under the "video" resource type
+        resource_type = 'image' if kind == 'image' else 'video' if kind in ('audio', 'video') else 'raw'
+        return public_id, ext.lstrip('.') or None, resource_type
+
+    def url_for(self, key, content_type=None, host_url=None):
+        public_id, fmt, resource_type = self._resource(key, content_type)
+        url, _ = cloudinary.utils.cloudinary_url(public_id, resource_type=resource_type, format=fmt, secure=True)
+        return url
+
+    def put(self, key, path, content_type=None):
+        public_id, _, resource_type = self._resource(key, content_type)
+        get_breaker("cloudinary").call(
+            cloudinary.uploader.upload,
+            path,
+            resource_type=resource_type,
+            public_id=public_id,
+            overwrite=True,
+        )
+
+    def delete(self, key, content_type=None):
+        public_id, _, resource_type = self._resource(key, content_type)
+        get_breaker("cloudinary").call(cloudinary.uploader.destroy, public_id, resource_type=resource_type)
+
+
+class S3Storage:
+    name = 's3'
+
+    def __init__(self):
+        self.client = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL, region_name=S3_REGION)
+        if S3_PUBLIC_BASE_URL:
+            self.base_url = S3_PUBLIC_BASE_URL
+        elif S3_ENDPOINT_URL:
+            self.base_url = f"{S3_ENDPOINT_URL.rstrip('/')}/{S3_BUCKET}"
+        else:
+            self.base_url = f"https://{S3_BUCKET}.s3.{S3_REGION or 'us-east-1'}.amazonaws.com"
+
+    def url_for(self, key, content_type=None, host_url=None):
+        return f"{self.base_url}/{key}"
+
+    def put(self, key, path, content_type=None):
+        self.client.upload_file(path, S3_BUCKET, key,
+                                ExtraArgs={'ContentType': content_type or content_type_for(key)})
+
+    def delete(self, key, content_type=None):
+        self.client.delete_object(Bucket=S3_BUCKET, Key=key)
+
+
+class LocalStorage:
+    name = 'local'
+
+    def __init__(self, root=LOCAL_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    @staticmethod
+    def signature(key):
+        return hmac.new(MEDIA_URL_SECRET.encode(), key.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def url_for(self, key, content_type=None, host_url=None):
+        base = PUBLIC_BASE_URL
+        if not base and not host_url and has_request_context():
+            host_url = request.host_url
+        if not base and host_url:
+            base = host_url.rstrip('/')
+        return f"{base}/media/{key}?sig={self.signature(key)}"
+
+    def put(self, key, path, content_type=None):
+        target = self.path_for(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(path, tmp)
+        # Readers never see a partially written file
+        os.replace(tmp, target)
+
+    def delete(self, key, content_type=None):
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+
+def _create_backend():
+    backend = STORAGE_BACKEND
+    if not backend:
+        backend = 'cloudinary' if cloudinary and Cloud_NAME else 'local'
+    if backend == 'cloudinary':
+        if not (cloudinary and Cloud_NAME):
+            raise RuntimeError("STORAGE_BACKEND=cloudinary but Cloudinary is not configured")
+        return CloudinaryStorage()
+    if backend == 's3':
+        if boto3 is None or not S3_BUCKET:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3 and S3_BUCKET")
+        return S3Storage()
+    if backend == 'local':
+        return LocalStorage()
+    raise RuntimeError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+class UploadQueue:
+    """Uploads spooled files on a worker pool, retrying with backoff until they succeed."""
+
+    def __init__(self, backend, spool_dir=SPOOL_DIR, workers=UPLOAD_WORKERS):
+        self.backend = backend
+        self.spool_dir = spool_dir
+        os.makedirs(spool_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage")
+
+    @staticmethod
+    def _claim_path(spool_path):
+        return f"{spool_path}.{uuid.uuid4().hex[:12]}{INFLIGHT_SUFFIX}"
+
+    def spool(self, key, source, content_type):
+        """Copy ``source`` (path or file object) into the spool, claimed by this process;
+        returns ``(spool_path, claim_path)``."""
+        spool_path = os.path.join(self.spool_dir, uuid.uuid4().hex)
+        if isinstance(source, str):
+            shutil.copyfile(source, spool_path)
+        else:
+            source.seek(0)
+            with open(spool_path, 'wb') as fh:
+                shutil.copyfileobj(source, fh)
+            source.seek(0)
+        claim_path = self._claim_path(spool_path)
+        with open(claim_path, 'w') as fh:
+            json.dump({'key': key, 'content_type': content_type}, fh)
+        return spool_path, claim_path
+
+    def submit(self, spool_path, claim_path, key, content_type):
+        storage_queue_depth.inc(backend=self.backend.name)
+        self._executor.submit(self._upload, spool_path, claim_path, key, content_type)
+
+    def _resubmit_later(self, spool_path, claim_path, key, content_type):
+        timer = threading.Timer(UPLOAD_PARK_DELAY, self.submit, (spool_path, claim_path, key, content_type))
+        timer.daemon = True
+        timer.start()
+
+    def _upload(self, spool_path, claim_path, key, content_type):
+        try:
+            for attempt in range(1, UPLOAD_RETRIES + 1):
+                try:
+                    # Still ours? Touching also keeps other processes from taking the entry over
+                    os.utime(claim_path)
+                except FileNotFoundError:
+                    logger.warning(f"Spooled upload of {key} was taken over by another process")
+                    return
+                try:
+                    self.backend.put(key, spool_path, content_type)
+                    storage_uploads.inc(backend=self.backend.name, outcome='ok')
+                    break
+                except Exception as e:
+                    storage_uploads.inc(backend=self.backend.name, outcome='error')
+                    if attempt == UPLOAD_RETRIES:
+                        # The URL is already stored; keep trying rather than leave it dangling
+                        logger.error(f"Storage upload of {key} failed after {attempt} attempts, "
+                                     f"retrying in {UPLOAD_PARK_DELAY:.0f}s: {e}")
+                        self._resubmit_later(spool_path, claim_path, key, content_type)
+                        return
+                    logger.warning(f"Storage upload of {key} failed (attempt {attempt}): {e}")
+                    time.sleep(backoff_delay(attempt))
+            for path in (claim_path, spool_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        finally:
+            storage_queue_depth.dec(backend=self.backend.name)
+
+    def resume(self):
+        """Claim and queue entries left by a previous or dead process; returns how many."""
+        resumed = 0
+        stale_before = time.time() - INFLIGHT_TIMEOUT
+        for name in os.listdir(self.spool_dir):
+            if not name.endswith(INFLIGHT_SUFFIX):
+                continue
+            meta_path = os.path.join(self.spool_dir, name)
+            try:
+                if os.path.getmtime(meta_path) >= stale_before:
+                    continue
+            except FileNotFoundError:
+                continue
+            spool_path = os.path.join(self.spool_dir, name.split('.', 1)[0])
+            if not os.path.exists(spool_path):
+                continue
+            claim_path = self._claim_path(spool_path)
+            try:
+                # Atomic: exactly one process wins each entry
+                os.rename(meta_path, claim_path)
+                # rename keeps the old mtime; a stale claim must look fresh once taken
+                os.utime(claim_path)
+            except FileNotFoundError:
+                continue
+            try:
+                with open(claim_path) as fh:
+                    meta = json.load(fh)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable spool entry {name}: {e}")
+                continue
+            self.submit(spool_path, claim_path, meta['key'], meta.get('content_type'))
+            resumed += 1
+        if resumed:
+            logger.info(f"Re-queued {resumed} pending storage uploads")
+        return resumed
+
+
+class Storage:
+    """Facade used by the routes: deterministic URL now, upload now or in the background."""
+
+    def __init__(self, backend, asynchronous=ASYNC_UPLOADS):
+        self.backend = backend
+        self.queue = UploadQueue(backend) if asynchronous else None
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def url_for(self, key, content_type=None, host_url=None):
+        return self.backend.url_for(key, content_type or content_type_for(key), host_url=host_url)
+
+    def save(self, key, source, content_type=None, wait=False, host_url=None):
+        """Store ``source`` (path or file object) under ``key`` and return its public URL.
+
+        Outside a request, ``host_url`` is the base for local media URLs.
+        """
+        content_type = content_type or content_type_for(key)
+        url = self.url_for(key, content_type, host_url=host_url)
+        if self.queue is not None and not wait:
+            spool_path, claim_path = self.queue.spool(key, source, content_type)
+            self.queue.submit(spool_path, claim_path, key, content_type)
+            return url
+        if isinstance(source, str):
+            self.backend.put(key, source, content_type)
+        else:
+            with tempfile.NamedTemporaryFile(delete=False) as tmp:
+                source.seek(0)
+                shutil.copyfileobj(source, tmp)
+                source.seek(0)
+            try:
+                self.backend.put(key, tmp.name, content_type)
+            finally:
+                os.remove(tmp.name)
+        storage_uploads.inc(backend=self.backend.name, outcome='ok')
+        return url
+
+    def delete(self, key, content_type=None):
+        self.backend.delete(key, content_type or content_type_for(key))
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = Storage(_create_backend())
+                logger.info(f"Using {_storage.name} storage backend")
+    return _storage
+
+
+def init_storage(app):
+    """Pick the backend, resume spooled uploads and serve local media."""
+    storage = get_storage()
+    if storage.queue is not None:
+        if schedule('storage-spool', SPOOL_SCAN_INTERVAL, storage.queue.resume) is None:
+            storage.queue.resume()
+    if not isinstance(storage.backend, LocalStorage):
+        return
+
+    root = storage.backend.root
+
+    @app.route("/media/<path:key>")
+    def media(key):
+        """Serve locally stored media; conditional requests and byte ranges for audio seeking.
+
+        Only URLs issued by ``url_for`` work: ``sig`` must be the key's HMAC.
+        """
+        try:
+            storage.backend.path_for(key)
+        except ValueError:
+            abort(404)
+        if not hmac.compare_digest(request.args.get('sig', ''), storage.backend.signature(key)):
+            abort(404)
+        # send_file streams through wsgi.file_wrapper (sendfile(2) under gunicorn) or
+        # X-Sendfile when USE_X_SENDFILE is set behind a proxy
+        return send_from_directory(root, key, conditional=True, max_age=MEDIA_MAX_AGE)
@@ -0,0 +1,211 @@
+"""Short-lived access tokens plus rotating refresh tokens.
+
+Access tokens are HS256 JWTs valid for ``ACCESS_TOKEN_TTL_MINUTES``. Refresh tokens are
+HS256 JWTs too (``type: refresh``), so a forged or expired one is rejected by the HMAC
+check alone; a valid one is then looked up by its ``jti`` in ``refresh_tokens``.
+Each refresh revokes the presented token and issues a new one in the same family; if a
+token that was already rotated is presented again, it has leaked and the whole family
+is revoked. Within ``REFRESH_REUSE_GRACE_SECONDS`` of its rotation a token is instead
+answered with its still-valid successor, so parallel refreshes and a client retrying
+after a lost response do not sign the user out. Expired rows are purged by a background
+job.
+"""
+import os
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
+
+import jwt
+from flask import current_app
+from sqlalchemy import select, update, delete
+
+from app.database import get_session, RefreshToken
+from app.scheduler import schedule
+
+logger = logging.getLogger(__name__)
+
+# The mobile client does not refresh yet and logs in again on expiry: keep the pre-rotation hour
+ACCESS_TOKEN_TTL = timedelta(minutes=float(os.getenv("ACCESS_TOKEN_TTL_MINUTES", "60")))
+REFRESH_TOKEN_TTL = timedelta(days=float(os.getenv("REFRESH_TOKEN_TTL_DAYS", "30")))
+# A just-rotated token presented again within this window gets its successor back
+REUSE_GRACE = timedelta(seconds=float(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "30")))
+GC_INTERVAL = float(os.getenv("REFRESH_TOKEN_GC_INTERVAL", "3600"))
+GC_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_GC_BATCH_SIZE", "1000"))
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+def _encode(payload):
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+
+def create_access_token(user_id):
+    return _encode({
+        'id': user_id,
+        'type': ACCESS,
+        'exp': datetime.now(timezone.utc) + ACCESS_TOKEN_TTL,
+    })
+
+
+def _encode_refresh(user_id, jti, expires_at):
+    return _encode({
+        'id': user_id,
+        'type': REFRESH,
+        'jti': jti,
+        'exp': expires_at.replace(tzinfo=timezone.utc),
+    })
+
+
+def _new_refresh_token(db, user_id, family_id, jti=None):
+    jti = jti or uuid.uuid4().hex
+    expires_at = datetime.utcnow() + REFRESH_TOKEN_TTL
+    db.add(RefreshToken(jti=jti, family_id=family_id, user_id=user_id, expires_at=expires_at))
+    return _encode_refresh(user_id, jti, expires_at)
+
+
+def _successor_in_grace(db, jti, now):
+    """The valid successor of a token rotated less than ``REUSE_GRACE`` ago, else None."""
+    row = db.get(RefreshToken, jti)
+    if row is None or not row.replaced_by or row.revoked_at is None or row.revoked_at < now - REUSE_GRACE:
+        return None
+    successor = db.get(RefreshToken, row.replaced_by)
+    if successor is None or successor.revoked_at is not None or successor.expires_at <= now:
+        return None
+    return successor
+
+
+def token_pair(user_id, refresh_token):
+    return {
+        'token': create_access_token(user_id),
+        'refresh_token': refresh_token,
+        'expires_in': int(ACCESS_TOKEN_TTL.total_seconds()),
+    }
+
+
+def issue_tokens(db, user_id):
+    """Start a new refresh-token family (a sign-in) and return the token pair."""
+    refresh_token = _new_refresh_token(db, user_id, uuid.uuid4().hex)
+    db.commit()
+    return token_pair(user_id, refresh_token)
+
+
+def decode_refresh_token(token):
+    try:
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.PyJWTError as e:
+        raise InvalidRefreshToken(str(e))
+    if payload.get('type') != REFRESH or not payload.get('jti'):
+        raise InvalidRefreshToken("Not a refresh token")
+    return payload
+
+
+def rotate_refresh_token(db, token):
+    """Exchange a refresh token for a new pair; raises InvalidRefreshToken."""
+    payload = decode_refresh_token(token)
+    now = datetime.utcnow()
+    row = db.get(RefreshToken, payload['jti'])
+    if row is None or row.user_id != payload['id']:
+        raise InvalidRefreshToken("Unknown refresh token")
+    family_id = row.family_id
+
+    new_jti = uuid.uuid4().hex
+    # Conditional update so two concurrent refreshes cannot both rotate the same token
+    rotated = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.jti == row.jti, RefreshToken.revoked_at.is_(None),
+               RefreshToken.expires_at > now)
+        .values(revoked_at=now, replaced_by=new_jti)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if rotated != 1:
+        db.rollback()
+        # Reload: a concurrent refresh may have rotated it after our read
+        db.expire_all()
+        successor = _successor_in_grace(db, payload['jti'], now)
+        if successor is not None:
+            return token_pair(payload['id'], _encode_refresh(payload['id'], successor.jti, successor.expires_at))
+        row = db.get(RefreshToken, payload['jti'])
+        if row is not None and row.replaced_by and row.revoked_at >= now - REUSE_GRACE:
+            # Rotated again meanwhile (a retry storm), not a leak: reject without revoking
+            raise InvalidRefreshToken("Refresh token already rotated")
+        if row is not None and row.replaced_by:
+            revoke_family(db, family_id)
+            logger.warning(f"Refresh token reuse for user {payload['id']}, revoked family {family_id}")
+        raise InvalidRefreshToken("Refresh token revoked or expired")
+
+    refresh_token = _new_refresh_token(db, payload['id'], family_id, jti=new_jti)
+    db.commit()
+    return token_pair(payload['id'], refresh_token)
+
+
+def revoke_family(db, family_id):
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def revoke_refresh_token(db, token):
+    """Log out one device: revoke the family of ``token``. Returns False if it is invalid."""
+    try:
+        payload = decode_refresh_token(token)
+    except InvalidRefreshToken:
+        return False
+    row = db.get(RefreshToken, payload['jti'])
+    if row is None:
+        return False
+    revoke_family(db, row.family_id)
+    return True
+
+
+def revoke_user_tokens(db, user_id):
+    """Sign the user out everywhere (after a password change or reset)."""
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def purge_expired_refresh_tokens(batch_size=GC_BATCH_SIZE):
+    """Delete expired refresh tokens in batches; returns the number removed."""
+    now = datetime.utcnow()
+    total = 0
+    while True:
+        expired_ids = (
+            select(RefreshToken.jti)
+            .where(RefreshToken.expires_at < now)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        db = get_session()
+        try:
+            removed = db.execute(
+                delete(RefreshToken).where(RefreshToken.jti.in_(expired_ids))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        total += removed
+        if removed < batch_size:
+            break
+    if total:
+        logger.info(f"Purged {total} expired refresh tokens")
+    return total
+
+
+def init_tokens():
+    schedule('refresh-token-gc', GC_INTERVAL, purge_expired_refresh_tokens, run_immediately=False)
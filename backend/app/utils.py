@@ -1,8 +1,16 @@
+import os
+import hmac
 from functools import wraps
 from flask import request, jsonify, current_app
 import jwt
 from app.database import get_session, User
 
+# Operational endpoints (/metrics, /ai/usage): callers presenting OPS_TOKEN as a bearer
+# token, or connecting from one of OPS_ALLOWED_IPS. The list is empty by default: behind a
+# same-host reverse proxy every request arrives from loopback
+OPS_TOKEN = os.getenv("OPS_TOKEN", "")
+OPS_ALLOWED_IPS = {ip.strip() for ip in os.getenv("OPS_ALLOWED_IPS", "").split(",") if ip.strip()}
+
 
 def token_required(f):
     @wraps(f)
@@ -16,6 +24,8 @@ def token_required(f):
             return jsonify({'error': 'Token is missing'}), 401
         try:
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+            if data.get('type') == 'refresh':
+                return jsonify({'error': 'Token is invalid'}), 401
             session = get_session()
             current_user = session.get(User, data['id'])
         except Exception:
@@ -26,4 +36,18 @@ def token_required(f):
             if 'session' in locals():
                 session.close()
         return result
-    return decorated
\ No newline at end of file
+    return decorated
+
+def ops_only(f):
+    """Restrict an operational endpoint to ``OPS_TOKEN`` holders or ``OPS_ALLOWED_IPS``."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        parts = request.headers.get('Authorization', '').split()
+        token = parts[1] if len(parts) == 2 and parts[0].lower() == 'bearer' else ''
+        # Compared as bytes: compare_digest rejects non-ASCII str
+        if OPS_TOKEN and hmac.compare_digest(token.encode(), OPS_TOKEN.encode()):
+            return f(*args, **kwargs)
+        if request.remote_addr in OPS_ALLOWED_IPS:
+            return f(*args, **kwargs)
+        return jsonify({'error': 'Forbidden'}), 403
+    return decorated
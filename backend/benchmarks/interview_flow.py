@@ -0,0 +1,253 @@
+"""End-to-end load benchmark for the interview flow, fully offline.
+
+Each virtual user runs the mobile journey: register, login, start a session,
+N x (next-question + answer), finish, then history and stats. Provider calls go
+to the local stand-in from ``provider_stub``, so no quota is used.
+
+    python -m benchmarks.interview_flow --users 20 --journeys 3 --questions 5
+    python -m benchmarks.interview_flow --database-url postgresql://localhost/interview_bench
+
+Reports throughput, latency percentiles per endpoint, SQL statements per request
+and connection-pool wait times. Without ``--database-url`` a throwaway SQLite file
+is used. Against Postgres, point it at a dedicated database: tables are created and
+benchmark users are left behind.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.provider_stub import StubConfig, StubServer  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Collects per-endpoint latency, status, SQL count and pool wait samples."""
+
+    def __init__(self):
+        self.samples = {}
+        self.pool_waits = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # -- instrumentation hooks, called from the request thread --
+    def current(self):
+        return getattr(self._local, 'stats', None)
+
+    def on_query(self):
+        stats = self.current()
+        if stats is not None:
+            stats['queries'] += 1
+
+    def on_pool_wait(self, seconds):
+        stats = self.current()
+        if stats is not None:
+            stats['pool_wait'] += seconds
+        with self._lock:
+            self.pool_waits.append(seconds)
+
+    def request(self, client, label, method, url, **kwargs):
+        self._local.stats = {'queries': 0, 'pool_wait': 0.0}
+        started = time.perf_counter()
+        resp = client.open(url, method=method, **kwargs)
+        elapsed = time.perf_counter() - started
+        stats, self._local.stats = self._local.stats, None
+        with self._lock:
+            entry = self.samples.setdefault(label, {'latency': [], 'queries': [], 'pool_wait': [], 'status': {}})
+            entry['latency'].append(elapsed)
+            entry['queries'].append(stats['queries'])
+            entry['pool_wait'].append(stats['pool_wait'])
+            entry['status'][resp.status_code] = entry['status'].get(resp.status_code, 0) + 1
+        return resp
+
+    def report(self, wall_time, journeys):
+        endpoints = {}
+        total_requests = 0
+        total_errors = 0
+        for label, entry in sorted(self.samples.items()):
+            latency = sorted(entry['latency'])
+            count = len(latency)
+            errors = sum(n for code, n in entry['status'].items() if code >= 500)
+            total_requests += count
+            total_errors += errors
+            endpoints[label] = {
+                'count': count,
+                'errors_5xx': errors,
+                'status': {str(k): v for k, v in sorted(entry['status'].items())},
+                'p50_ms': round(percentile(latency, 50) * 1000, 1),
+                'p90_ms': round(percentile(latency, 90) * 1000, 1),
+                'p99_ms': round(percentile(latency, 99) * 1000, 1),
+                'max_ms': round(latency[-1] * 1000, 1),
+                'queries_per_request': round(sum(entry['queries']) / count, 1),
+                'pool_wait_ms_avg': round(sum(entry['pool_wait']) / count * 1000, 2),
+            }
+        waits = sorted(self.pool_waits)
+        return {
+            'wall_time_s': round(wall_time, 2),
+            'journeys': journeys,
+            'requests': total_requests,
+            'errors_5xx': total_errors,
+            'throughput_rps': round(total_requests / wall_time, 1) if wall_time else 0,
+            'journeys_per_s': round(journeys / wall_time, 2) if wall_time else 0,
+            'pool': {
+                'checkouts': len(waits),
+                'wait_p50_ms': round(percentile(waits, 50) * 1000, 2),
+                'wait_p99_ms': round(percentile(waits, 99) * 1000, 2),
+                'wait_max_ms': round((waits[-1] if waits else 0) * 1000, 2),
+                'wait_total_s': round(sum(waits), 3),
+            },
+            'endpoints': endpoints,
+        }
+
+
+def instrument_engine(engine, recorder):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        recorder.on_query()
+
+    pool = engine.pool
+    original_connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return original_connect()
+        finally:
+            recorder.on_pool_wait(time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+
+def run_journey(app, recorder, questions, audio_bytes):
+    client = app.test_client()
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    recorder.request(client, 'POST /auth/register', 'POST', '/auth/register',
+                     json={'name': 'Bench User', 'email': email, 'password': 'bench-password'})
+    resp = recorder.request(client, 'POST /auth/login', 'POST', '/auth/login',
+                            json={'email': email, 'password': 'bench-password'})
+    if resp.status_code != 200:
+        return False
+    headers = {'Authorization': f"Bearer {resp.get_json()['token']}"}
+
+    resp = recorder.request(client, 'POST /interviews/start', 'POST', '/interviews/start', headers=headers, json={
+        'field': 'IT', 'specialization': 'Backend', 'experience_level': 'junior',
+        'time_limit': 30, 'question_limit': questions,
+    })
+    if resp.status_code != 201:
+        return False
+    session_id = resp.get_json()['session_id']
+
+    for _ in range(questions):
+        resp = recorder.request(client, 'GET /interviews/<id>/next-question', 'GET',
+                                f"/interviews/{session_id}/next-question", headers=headers)
+        if resp.status_code != 200:
+            return False
+        form = {'question_id': str(resp.get_json()['question_id'])}
+        if audio_bytes is not None:
+            form['audio'] = (io.BytesIO(audio_bytes), 'answer.m4a')
+        else:
+            form['text_answer'] = 'Tôi đã xây dựng REST API với Flask và PostgreSQL, tối ưu truy vấn bằng index.'
+        recorder.request(client, 'POST /interviews/<id>/answer', 'POST', f"/interviews/{session_id}/answer",
+                         headers=headers, data=form, content_type='multipart/form-data')
+
+    recorder.request(client, 'POST /interviews/<id>/finish', 'POST', f"/interviews/{session_id}/finish",
+                     headers=headers)
+    recorder.request(client, 'GET /interviews/history', 'GET', '/interviews/history', headers=headers)
+    recorder.request(client, 'GET /interviews/stats', 'GET', '/interviews/stats', headers=headers)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline end-to-end benchmark of the interview flow')
+    parser.add_argument('--users', type=int, default=10, help='concurrent virtual users')
+    parser.add_argument('--journeys', type=int, default=2, help='journeys per virtual user')
+    parser.add_argument('--questions', type=int, default=3, help='questions answered per session')
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--gemini-latency', default='lognormal:300:0.3')
+    parser.add_argument('--assemblyai-latency', default='fixed:20')
+    parser.add_argument('--cloudinary-latency', default='fixed:50')
+    parser.add_argument('--transcript-delay', default='fixed:500')
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--audio', help='answer with this audio file instead of text (needs cloudinary installed)')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    stub = StubServer(StubConfig(
+        latency={'gemini': args.gemini_latency, 'assemblyai': args.assemblyai_latency,
+                 'cloudinary': args.cloudinary_latency},
+        error_rate={'gemini': args.gemini_error_rate},
+        transcript_delay=args.transcript_delay,
+    )).start()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    tmp_db = None
+    database_url = args.database_url
+    if not database_url:
+        tmp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        database_url = f"sqlite:///{tmp_db.name}"
+
+    # Must be set before the app modules are imported: they read the env at import time
+    os.environ.update(stub.env())
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key-with-enough-length')
+    os.environ['GEMINI_API_KEY'] = 'stub-key'
+    os.environ.pop('GEMINI_API_KEYS', None)
+    os.environ['ASSEMBLYAI_API_KEY'] = 'stub-key'
+    os.environ.setdefault('CLOUDINARY_CLOUD_NAME', 'stub')
+    os.environ.setdefault('CLOUDINARY_API_KEY', 'stub')
+    os.environ.setdefault('CLOUDINARY_API_SECRET', 'stub')
+
+    from app import create_app
+    from app.database import engine
+
+    app = create_app()
+    recorder = Recorder()
+    instrument_engine(engine, recorder)
+
+    audio_bytes = None
+    if args.audio:
+        with open(args.audio, 'rb') as f:
+            audio_bytes = f.read()
+
+    total = args.users * args.journeys
+    print(f"Running {total} journeys with {args.users} concurrent users against {engine.url.render_as_string()}")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [pool.submit(run_journey, app, recorder, args.questions, audio_bytes) for _ in range(total)]
+        completed = sum(1 for f in futures if f.result())
+    wall_time = time.perf_counter() - started
+
+    report = recorder.report(wall_time, completed)
+    report['config'] = {
+        'users': args.users, 'journeys': total, 'questions': args.questions,
+        'database': engine.url.get_backend_name(), 'pool_size': engine.pool.size() if hasattr(engine.pool, 'size') else None,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    stub.stop()
+    if tmp_db is not None:
+        os.unlink(tmp_db.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Login throughput benchmark: how many logins per second the hashing pool sustains.
+
+Registers ``--accounts`` users, then hammers ``POST /auth/login`` from ``--concurrency``
+client threads for ``--duration`` seconds per level, in-process via the Flask test
+client. Run it once per hash setting to pick a cost for the deployment's CPU budget:
+
+    python -m benchmarks.login_throughput --concurrency 1,4,16,64
+    PASSWORD_HASH_METHOD=pbkdf2:sha256:600000 PASSWORD_HASH_WORKERS=4 python -m benchmarks.login_throughput
+
+Reports logins/sec, latency percentiles and how many requests were shed with 503.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.interview_flow import percentile  # noqa: E402
+
+
+def run_level(app, accounts, password, concurrency, duration):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        client = app.test_client()
+        n = index
+        while time.perf_counter() < deadline:
+            email = accounts[n % len(accounts)]
+            n += concurrency
+            started = time.perf_counter()
+            resp = client.post('/auth/login', json={'email': email, 'password': password})
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall_time = time.perf_counter() - started
+
+    latencies.sort()
+    ok = statuses.get(200, 0)
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'logins_per_sec': round(ok / wall_time, 1) if wall_time else 0.0,
+        'statuses': {str(k): v for k, v in sorted(statuses.items())},
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p95': round(percentile(latencies, 95) * 1000, 1),
+            'p99': round(percentile(latencies, 99) * 1000, 1),
+            'max': round((latencies[-1] if latencies else 0.0) * 1000, 1),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login throughput of the password hashing pool')
+    parser.add_argument('--accounts', type=int, default=20, help='users registered before the run')
+    parser.add_argument('--concurrency', default='1,4,16', help='comma-separated client thread counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per concurrency level')
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    tmp_db = None
+    database_url = args.database_url
+    if not database_url:
+        tmp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        database_url = f"sqlite:///{tmp_db.name}"
+
+    # Must be set before the app modules are imported: they read the env at import time
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key-with-enough-length')
+
+    from app import create_app
+    from app import passwords
+
+    app = create_app()
+    client = app.test_client()
+    password = 'benchmark-password'
+    run_id = uuid.uuid4().hex[:8]
+    accounts = []
+    for i in range(args.accounts):
+        email = f"login-bench-{run_id}-{i}@example.com"
+        resp = client.post('/auth/register', json={'name': 'Login Bench', 'email': email, 'password': password})
+        if resp.status_code != 201:
+            sys.exit(f"Registering {email} failed: {resp.status_code} {resp.get_data(as_text=True)}")
+        accounts.append(email)
+
+    pool = passwords.hash_pool
+    print(f"Hash method {passwords.method_prefix()} on {pool.workers} {pool.kind} workers, "
+          f"{args.accounts} accounts, {args.duration:g}s per level")
+    levels = [run_level(app, accounts, password, int(c), args.duration)
+              for c in args.concurrency.split(',') if c.strip()]
+    report = {
+        'config': {
+            'method': passwords.method_prefix(), 'workers': pool.workers, 'pool': pool.kind,
+            'max_pending': passwords.HASH_MAX_PENDING, 'queue_timeout': passwords.HASH_QUEUE_TIMEOUT,
+        },
+        'levels': levels,
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if tmp_db is not None:
+        os.unlink(tmp_db.name)
+
+
+if __name__ == '__main__':
+    main()
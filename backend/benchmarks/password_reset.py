@@ -0,0 +1,136 @@
+"""Password reset flow latency against a large ``password_resets`` table.
+
+Seeds ``--rows`` pending codes (``--expired-ratio`` of them already expired), then runs
+``--iterations`` forgot-password + reset-password round trips and wrong-code attempts,
+and finally times one full purge of the expired rows:
+
+    python -m benchmarks.password_reset --rows 500000
+    python -m benchmarks.password_reset --database-url postgresql://localhost/reset_bench
+
+Mail is not sent: the code is captured from the route instead of being queued.
+Password hashing uses a cheap method (override with ``PASSWORD_HASH_METHOD``) so the
+numbers reflect the database path rather than the hash cost.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.interview_flow import percentile  # noqa: E402
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 95) * 1000, 2),
+        'p99_ms': round(percentile(samples, 99) * 1000, 2),
+        'max_ms': round((samples[-1] if samples else 0.0) * 1000, 2),
+    }
+
+
+def seed(engine, table, rows, expired_ratio, chunk=10000):
+    now = datetime.utcnow()
+    expired = int(rows * expired_ratio)
+    run_id = uuid.uuid4().hex[:8]
+    with engine.begin() as conn:
+        for start in range(0, rows, chunk):
+            batch = []
+            for i in range(start, min(rows, start + chunk)):
+                offset = timedelta(minutes=-5) if i < expired else timedelta(minutes=30)
+                batch.append({'email': f"seed-{run_id}-{i}@example.com", 'token': f"{i % 1000000:06d}",
+                              'created_at': now, 'expires_at': now + offset})
+            conn.execute(table.insert(), batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Password reset latency at a large table size')
+    parser.add_argument('--rows', type=int, default=200000, help='reset codes seeded before the run')
+    parser.add_argument('--expired-ratio', type=float, default=0.9)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    tmp_db = None
+    database_url = args.database_url
+    if not database_url:
+        tmp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        database_url = f"sqlite:///{tmp_db.name}"
+
+    # Must be set before the app modules are imported: they read the env at import time
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key-with-enough-length')
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+
+    from app import create_app
+    from app.database import engine, PasswordReset
+    from app.password_resets import purge_expired_resets
+    import app.routes.auth as auth_routes
+
+    app = create_app()
+    sent = {}
+    auth_routes.send_reset_code_email = lambda email, code, minutes=None: sent.__setitem__(email, code) or True
+
+    started = time.perf_counter()
+    seed(engine, PasswordReset.__table__, args.rows, args.expired_ratio)
+    print(f"Seeded {args.rows} reset codes in {time.perf_counter() - started:.1f}s "
+          f"against {engine.url.render_as_string()}")
+
+    client = app.test_client()
+    email = f"reset-bench-{uuid.uuid4().hex[:8]}@example.com"
+    resp = client.post('/auth/register', json={'name': 'Reset Bench', 'email': email, 'password': 'initial'})
+    if resp.status_code != 201:
+        sys.exit(f"Registering {email} failed: {resp.status_code} {resp.get_data(as_text=True)}")
+
+    forgot, reset, wrong = [], [], []
+    for i in range(args.iterations):
+        t0 = time.perf_counter()
+        resp = client.post('/auth/forgot-password', json={'email': email})
+        forgot.append(time.perf_counter() - t0)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+
+        code = sent[email]
+        bad = f"{(int(code) + 1) % 1000000:06d}"
+        t0 = time.perf_counter()
+        resp = client.post('/auth/reset-password', json={'email': email, 'token': bad, 'password': 'x'})
+        wrong.append(time.perf_counter() - t0)
+        assert resp.status_code == 400, resp.get_data(as_text=True)
+
+        t0 = time.perf_counter()
+        resp = client.post('/auth/reset-password', json={'email': email, 'token': code, 'password': f"pw-{i}"})
+        reset.append(time.perf_counter() - t0)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+
+    started = time.perf_counter()
+    purged = purge_expired_resets()
+    purge_seconds = time.perf_counter() - started
+
+    report = {
+        'config': {'rows': args.rows, 'expired_ratio': args.expired_ratio,
+                   'database': engine.url.get_backend_name()},
+        'forgot_password': summarize(forgot),
+        'reset_password': summarize(reset),
+        'reset_password_wrong_code': summarize(wrong),
+        'purge': {'rows': purged, 'seconds': round(purge_seconds, 2)},
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if tmp_db is not None:
+        os.unlink(tmp_db.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""Local stand-in for Gemini, AssemblyAI and Cloudinary, for load tests and CI.
+
+Run it and point the backend at it::
+
+    python -m benchmarks.provider_stub --port 8090 \\
+        --latency gemini=lognormal:600:0.4 --latency assemblyai=fixed:50 \\
+        --transcript-delay lognormal:2000:0.3 --error-rate gemini=0.02
+
+    GEMINI_BASE_URL=http://127.0.0.1:8090/v1beta
+    ASSEMBLYAI_BASE_URL=http://127.0.0.1:8090
+    CLOUDINARY_UPLOAD_PREFIX=http://127.0.0.1:8090
+
+Latency specs are ``fixed:<ms>``, ``uniform:<min_ms>:<max_ms>``, ``normal:<mean_ms>:<stddev_ms>``
+or ``lognormal:<median_ms>:<sigma>``. Failing calls answer 503, throttled ones 429.
+Canned payloads can be overridden with ``--payloads file.json`` using the keys of
+``DEFAULT_PAYLOADS``.
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import uuid
+
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+
+DEFAULT_PAYLOADS = {
+    'question': "Hãy kể về một dự án bạn đã tham gia và vai trò của bạn trong dự án đó.",
+    'evaluation': {
+        'transcript': "Tôi đã tham gia xây dựng hệ thống quản lý đơn hàng cho một công ty bán lẻ.",
+        'score': 7.5,
+        'breakdown': {'speaking': 7.0, 'content': 8.0, 'relevance': 7.5},
+        'feedback': "Câu trả lời rõ ràng, nên bổ sung số liệu cụ thể.",
+        'strengths': ["Trình bày mạch lạc", "Có ví dụ thực tế"],
+        'improvements': ["Nêu kết quả định lượng", "Nói chậm hơn"],
+    },
+    'summary': "**Tổng quan**: Ứng viên trả lời tốt.\n**Đánh giá tổng thể**: B+",
+    'chat': "Bạn nên chuẩn bị ví dụ cụ thể theo mô hình STAR.",
+    'transcript': "Tôi đã tham gia xây dựng hệ thống quản lý đơn hàng cho một công ty bán lẻ.",
+}
+
+PROVIDERS = ('gemini', 'assemblyai', 'cloudinary')
+
+
+def parse_latency(spec):
+    """Return a callable giving a delay in seconds for a latency spec string."""
+    kind, *params = spec.split(':')
+    values = [float(p) for p in params]
+    if kind == 'fixed':
+        return lambda: values[0] / 1000
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(values[0], values[1])) / 1000
+    if kind == 'lognormal':
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class StubConfig:
+    def __init__(self, latency=None, error_rate=None, throttle_rate=None, transcript_delay='fixed:0',
+                 payloads=None):
+        self.latency = {p: parse_latency((latency or {}).get(p, 'fixed:0')) for p in PROVIDERS}
+        self.error_rate = {p: float((error_rate or {}).get(p, 0)) for p in PROVIDERS}
+        self.throttle_rate = {p: float((throttle_rate or {}).get(p, 0)) for p in PROVIDERS}
+        self.transcript_delay = parse_latency(transcript_delay)
+        self.payloads = {**DEFAULT_PAYLOADS, **(payloads or {})}
+
+
+def _gemini_task(prompt):
+    if 'BẮT BUỘC TRẢ VỀ JSON' in prompt:
+        return 'evaluation'
+    if 'tóm tắt buổi phỏng vấn' in prompt:
+        return 'summary'
+    if 'tạo ra một câu hỏi phỏng vấn' in prompt:
+        return 'question'
+    return 'chat'
+
+
+def create_stub_app(config=None):
+    config = config or StubConfig()
+    app = Flask(__name__)
+    transcripts = {}
+    lock = threading.Lock()
+    counter = itertools.count(1)
+    calls = {p: 0 for p in PROVIDERS}
+
+    def simulate(provider):
+        """Apply latency and injected failures; return an error response or None."""
+        with lock:
+            calls[provider] += 1
+        time.sleep(config.latency[provider]())
+        roll = random.random()
+        if roll < config.throttle_rate[provider]:
+            return jsonify({'error': {'code': 429, 'message': 'Resource exhausted (stub)'}}), 429
+        if roll < config.throttle_rate[provider] + config.error_rate[provider]:
+            return jsonify({'error': {'code': 503, 'message': 'Unavailable (stub)'}}), 503
+        return None
+
+    @app.route('/v1beta/models/<model>', methods=['GET'])
+    def gemini_model(model):
+        return jsonify({'name': f"models/{model}"})
+
+    @app.route('/v1beta/models/<path:model_action>', methods=['POST'])
+    def gemini_generate(model_action):
+        if not model_action.endswith(':generateContent'):
+            return jsonify({'error': 'unsupported'}), 404
+        error = simulate('gemini')
+        if error:
+            return error
+        body = request.get_json(silent=True) or {}
+        try:
+            prompt = body['contents'][0]['parts'][0]['text']
+        except (KeyError, IndexError, TypeError):
+            return jsonify({'error': {'code': 400, 'message': 'Invalid payload'}}), 400
+        payload = config.payloads[_gemini_task(prompt)]
+        text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+        return jsonify({
+            'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 'STOP'}],
+            'usageMetadata': {'promptTokenCount': len(prompt) // 4, 'candidatesTokenCount': len(text) // 4},
+        })
+
+    @app.route('/v2/transcript', methods=['POST'])
+    def transcript_create():
+        error = simulate('assemblyai')
+        if error:
+            return error
+        transcript_id = f"stub-{next(counter)}"
+        with lock:
+            transcripts[transcript_id] = time.monotonic() + config.transcript_delay()
+        return jsonify({'id': transcript_id, 'status': 'queued'})
+
+    @app.route('/v2/upload', methods=['POST'])
+    def assemblyai_upload():
+        error = simulate('assemblyai')
+        if error:
+            return error
+        size = len(request.get_data())
+        return jsonify({'upload_url': f"{request.host_url}media/assemblyai/{uuid.uuid4().hex}", 'bytes': size})
+
+    @app.route('/v2/transcript/<transcript_id>', methods=['GET'])
+    def transcript_poll(transcript_id):
+        error = simulate('assemblyai')
+        if error:
+            return error
+        with lock:
+            ready_at = transcripts.get(transcript_id)
+        if ready_at is None:
+            return jsonify({'error': 'Transcript not found'}), 404
+        if time.monotonic() < ready_at:
+            return jsonify({'id': transcript_id, 'status': 'processing'})
+        return jsonify({'id': transcript_id, 'status': 'completed', 'text': config.payloads['transcript']})
+
+    @app.route('/v1_1/<cloud>/<resource_type>/upload', methods=['POST'])
+    def cloudinary_upload(cloud, resource_type):
+        error = simulate('cloudinary')
+        if error:
+            return error
+        upload = request.files.get('file')
+        size = len(upload.read()) if upload else 0
+        folder = request.form.get('folder')
+        public_id = request.form.get('public_id') or uuid.uuid4().hex
+        if folder:
+            public_id = f"{folder}/{public_id}"
+        url = f"{request.host_url}media/{cloud}/{resource_type}/{public_id}"
+        return jsonify({
+            'public_id': public_id,
+            'resource_type': resource_type,
+            'bytes': size,
+            'format': 'm4a' if resource_type == 'video' else 'jpg',
+            'duration': 12.5 if resource_type == 'video' else None,
+            'url': url,
+            'secure_url': url,
+        })
+
+    @app.route('/media/<path:path>', methods=['GET'])
+    def media(path):
+        return b'', 200, {'Content-Type': 'application/octet-stream'}
+
+    @app.route('/_stub/stats', methods=['GET'])
+    def stats():
+        with lock:
+            return jsonify({'calls': dict(calls), 'transcripts': len(transcripts)})
+
+    return app
+
+
+class StubServer:
+    """Serve the stub from a background thread (used by the benchmarks)."""
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.server = make_server(host, port, create_stub_app(config), threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://{self.server.host}:{self.server.port}"
+
+    def env(self):
+        """Environment overrides that point the backend at this stub."""
+        return {
+            'GEMINI_BASE_URL': f"{self.base_url}/v1beta",
+            'ASSEMBLYAI_BASE_URL': self.base_url,
+            'CLOUDINARY_UPLOAD_PREFIX': self.base_url,
+        }
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def _parse_pairs(values):
+    result = {}
+    for value in values or []:
+        provider, _, spec = value.partition('=')
+        if provider not in PROVIDERS:
+            raise SystemExit(f"Unknown provider '{provider}', expected one of {', '.join(PROVIDERS)}")
+        result[provider] = spec
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', action='append', help='provider=distribution, e.g. gemini=lognormal:600:0.4')
+    parser.add_argument('--error-rate', action='append', help='provider=fraction answered with 503')
+    parser.add_argument('--throttle-rate', action='append', help='provider=fraction answered with 429')
+    parser.add_argument('--transcript-delay', default='fixed:0', help='time until a transcript completes')
+    parser.add_argument('--payloads', help='JSON file overriding the canned payloads')
+    args = parser.parse_args()
+
+    payloads = None
+    if args.payloads:
+        with open(args.payloads, encoding='utf-8') as f:
+            payloads = json.load(f)
+    config = StubConfig(
+        latency=_parse_pairs(args.latency),
+        error_rate=_parse_pairs(args.error_rate),
+        throttle_rate=_parse_pairs(args.throttle_rate),
+        transcript_delay=args.transcript_delay,
+        payloads=payloads,
+    )
+    server = StubServer(config, host=args.host, port=args.port)
+    print(f"Provider stub listening on {server.base_url}")
+    for key, value in server.env().items():
+        print(f"  {key}={value}")
+    server.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
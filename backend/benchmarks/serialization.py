@@ -0,0 +1,146 @@
+"""Serialization time and compressed size of the largest JSON responses.
+
+Seeds one user with ``--sessions`` finished sessions of ``--questions`` answered
+questions each (Vietnamese feedback and transcripts of realistic length), all saved
+as notes, then fetches the heaviest endpoints once to capture their payloads:
+
+    python -m benchmarks.serialization --sessions 100 --questions 10
+
+For each payload it reports encode time with the standard provider and with orjson
+(when installed), and the body size as sent by the standard provider, as UTF-8 from
+orjson, and after gzip / brotli compression with the configured levels.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.interview_flow import percentile  # noqa: E402
+
+FEEDBACK = ("Câu trả lời có cấu trúc rõ ràng, nêu được bối cảnh dự án và vai trò của bạn. "
+            "Nên bổ sung số liệu cụ thể về kết quả đạt được và giải thích lý do chọn giải pháp. ")
+TRANSCRIPT = ("Trong dự án gần nhất tôi phụ trách xây dựng dịch vụ thanh toán, thiết kế cơ sở dữ liệu, "
+              "viết API và phối hợp với nhóm di động để tối ưu thời gian phản hồi. ")
+
+
+def seed(user_id, sessions, questions):
+    from app.database import get_session, InterviewSession, InterviewQuestion, InterviewAnswer, QuestionNote
+
+    db = get_session()
+    try:
+        for s in range(sessions):
+            session = InterviewSession(user_id=user_id, field='IT', specialization='Backend',
+                                       experience_level='junior', time_limit=30, question_limit=questions,
+                                       status='da_hoan_thanh', questions_asked=questions)
+            db.add(session)
+            db.flush()
+            for q in range(questions):
+                question = InterviewQuestion(session_id=session.id,
+                                             content=f"Câu hỏi {q + 1}: hãy mô tả một thử thách kỹ thuật bạn đã giải quyết?")
+                db.add(question)
+                db.flush()
+                db.add(InterviewAnswer(
+                    session_id=session.id, question_id=question.id, score=6 + (q % 4),
+                    feedback=FEEDBACK * 3, transcript_text=TRANSCRIPT * 4,
+                    speaking_score=7, content_score=6, relevance_score=8,
+                    strengths=["Trình bày mạch lạc", "Ví dụ thực tế"],
+                    improvements=["Thêm số liệu", "Nói chậm hơn"],
+                ))
+                db.add(QuestionNote(user_id=user_id, question_id=question.id))
+            db.commit()
+        return session.id
+    finally:
+        db.close()
+
+
+def time_encode(fn, obj, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn(obj)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return round(percentile(samples, 50) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON serialization and compression of large responses')
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=50, help='encode runs per payload')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    tmp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    # Must be set before the app modules are imported: they read the env at import time
+    os.environ['DATABASE_URL'] = f"sqlite:///{tmp_db.name}"
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key-with-enough-length')
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    os.environ['COMPRESS_RESPONSES'] = '0'
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import create_app
+    from app import serialization
+
+    app = create_app()
+    client = app.test_client()
+    resp = client.post('/auth/register', json={'name': 'Bench', 'email': 'bench@example.com', 'password': 'x'})
+    token = resp.get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    last_session = seed(resp.get_json()['user']['id'], args.sessions, args.questions)
+
+    endpoints = [
+        '/interviews/history',
+        '/interviews/questions/notes',
+        '/bootstrap?history_limit=50',
+        f'/interviews/history/{last_session}',
+    ]
+    standard = DefaultJSONProvider(app)
+    fast = serialization.OrjsonProvider(app) if serialization.orjson is not None else None
+    report = {'config': {'sessions': args.sessions, 'questions': args.questions,
+                         'orjson': fast is not None, 'brotli': serialization.brotli is not None,
+                         'gzip_level': serialization.GZIP_LEVEL,
+                         'brotli_quality': serialization.BROTLI_QUALITY},
+              'endpoints': {}}
+    with app.app_context():
+        for url in endpoints:
+            resp = client.get(url, headers=headers)
+            if resp.status_code != 200:
+                print(f"Skipping {url}: {resp.status_code}")
+                continue
+            payload = resp.get_json()
+            body = standard.dumps(payload).encode('utf-8')
+            row = {
+                'standard_ms': time_encode(standard.dumps, payload, args.iterations),
+                'standard_bytes': len(body),
+            }
+            if fast is not None:
+                utf8 = fast.dumps(payload).encode('utf-8')
+                row['orjson_ms'] = time_encode(fast._encode, payload, args.iterations)
+                row['orjson_bytes'] = len(utf8)
+                body = utf8
+            started = time.perf_counter()
+            row['gzip_bytes'] = len(gzip.compress(body, compresslevel=serialization.GZIP_LEVEL, mtime=0))
+            row['gzip_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            if serialization.brotli is not None:
+                started = time.perf_counter()
+                row['brotli_bytes'] = len(serialization.brotli.compress(body, quality=serialization.BROTLI_QUALITY))
+                row['brotli_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            report['endpoints'][url] = row
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    os.unlink(tmp_db.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -140,28 +140,46 @@ export async function removeSavedQuestion(questionId: string | number) {
   return handleResponse(res);
 }
 
-export async function checkQuestionSaved(questionId: string | number) {
+// Saved state of many questions in one request: { saved: { [questionId]: boolean } }
+export async function lookupSavedQuestions(questionIds: (string | number)[]) {
   const token = await AsyncStorage.getItem('@preptalk_token');
-  const res = await fetch(`${API_URL}/interviews/questions/${questionId}/note`, {
-    method: 'GET',
+  const res = await fetch(`${API_URL}/interviews/questions/notes/lookup`, {
+    method: 'POST',
     headers: {
       'Content-Type': 'application/json',
       ...(token ? { Authorization: `Bearer ${token}` } : {}),
     },
+    body: JSON.stringify({ question_ids: questionIds.map(Number) }),
   });
   return handleResponse(res);
 }
 
+export async function checkQuestionSaved(questionId: string | number) {
+  const data = await lookupSavedQuestions([questionId]);
+  return { saved: Boolean(data?.saved?.[String(Number(questionId))]) };
+}
+
+const SAVED_PAGE_SIZE = 100;
+
+// Follows next_cursor until the last page, so every saved question is returned
 export async function getSavedQuestions() {
   const token = await AsyncStorage.getItem('@preptalk_token');
-  const res = await fetch(`${API_URL}/interviews/questions/notes`, {
-    method: 'GET',
-    headers: {
-      'Content-Type': 'application/json',
-      ...(token ? { Authorization: `Bearer ${token}` } : {}),
-    },
-  });
-  return handleResponse(res);
+  const saved: any[] = [];
+  let cursor: string | null = null;
+  do {
+    const query: string = `limit=${SAVED_PAGE_SIZE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+    const res = await fetch(`${API_URL}/interviews/questions/notes?${query}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+    });
+    const page = await handleResponse(res);
+    saved.push(...(page?.saved ?? []));
+    cursor = page?.next_cursor ?? null;
+  } while (cursor);
+  return { saved };
 }
 
 